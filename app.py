@@ -1,21 +1,59 @@
-from flask import Flask
+import click
+import hmac
+from flask import Flask, request
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from config import Config
 from models import db
+from dbpool import init_db_pool
+from replicas import init_replicas
+from revocation import init_revocation_store
+from serializers import init_json
+from versions import init_version_store
+from entity_cache import init_entity_cache
+from tenancy import init_tenancy, token_matches_tenant
+from grade_stats import init_grade_stats
+from report_cache import init_report_cache
+from mailer import init_mailer
+from fairshare import init_fair_share
+from task_events import init_task_events
+from hashing import HashingBusyError, init_hashing
 from tasks import celery
 import os
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
+init_json(app)
 
 # Initialize extensions
+init_db_pool(app)
+init_replicas(app)
 db.init_app(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, render_as_batch=True)
 jwt = JWTManager(app)
 CORS(app)
+init_revocation_store(app)
+init_version_store(app)
+init_entity_cache(app)
+init_tenancy(app)
+init_grade_stats(app)
+init_report_cache(app)
+init_mailer(app)
+init_fair_share(app)
+init_task_events(app)
+init_hashing(app)
+
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    from services import AuthService
+    return AuthService.is_token_blacklisted(jwt_payload['jti'])
+
+@jwt.token_verification_loader
+def check_token_tenant(jwt_header, jwt_payload):
+    return token_matches_tenant(jwt_payload)
 
 # Register blueprints
 from routes import (
@@ -55,6 +93,14 @@ def not_found(error):
     from utils import error_response
     return error_response('Resource not found', 404)
 
+@app.errorhandler(HashingBusyError)
+def hashing_busy(error):
+    """Logins, registrations and password changes while the hashing queue is full."""
+    from utils import error_response
+    db.session.rollback()
+    body, status = error_response('Too many password operations in progress, please retry', 503)
+    return body, status, {'Retry-After': '1'}
+
 @app.errorhandler(500)
 def internal_error(error):
     from utils import error_response
@@ -67,6 +113,31 @@ def health():
     from utils import success_response
     return success_response({'status': 'healthy', 'message': 'School SaaS API is running'})
 
+# Per-worker runtime counters for monitoring; only for a scraper holding
+# METRICS_TOKEN, since pool and cache figures describe the whole deployment
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    from utils import success_response, error_response
+    from entity_cache import cache_stats
+    from dbpool import pool_stats
+    token = app.config.get('METRICS_TOKEN')
+    if not token:
+        return error_response('Resource not found', 404)
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        body, status = error_response('Metrics token required', 401)
+        return body, status, {'WWW-Authenticate': 'Bearer'}
+    return success_response({'entity_cache': cache_stats(), 'db_pool': pool_stats()})
+
+@app.cli.command('rebuild-attendance-rollups')
+@click.option('--since', type=click.DateTime(['%Y-%m']), help='First month to rebuild (YYYY-MM); default: oldest attendance')
+@click.option('--until', type=click.DateTime(['%Y-%m']), help='Month to stop before (YYYY-MM); default: no limit')
+def rebuild_attendance_rollups_command(since, until):
+    """Recompute attendance rollups from the attendance table."""
+    from rollups import rebuild_attendance_rollups
+    written = rebuild_attendance_rollups(since and since.date(), until and until.date())
+    click.echo(f"Rebuilt attendance rollups ({written} student-month rows)")
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()  # Ensure tables exist on startup
@@ -0,0 +1,310 @@
+"""School-year partitioning and cold archival of attendance.
+
+On Postgres the attendance table is range-partitioned on `date`, one
+partition per school year (migration 0003); SQLite keeps a single table. A
+school year starts on the first day of SCHOOL_YEAR_START_MONTH and is named
+after the calendar year it starts in.
+
+`archive_closed_years` (run by tasks.cleanup_expired_data) moves school
+years older than the last ATTENDANCE_HOT_YEARS into compressed files under
+ARCHIVE_FOLDER, Parquet when pyarrow is installed and gzipped CSV otherwise,
+then deletes the archived rows in batches of one transaction each and drops
+Postgres partitions left empty. Files are laid out as
+
+    attendance/tenant=<id>/year=<year>/part-<first id>-<last id>.<ext>
+
+with rows in id order; a year gains another part if rows are added to it
+after it was archived. `read_archived_attendance` reads them back.
+"""
+import csv
+import gzip
+import heapq
+import logging
+import os
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import delete, func, select, text
+from models import db, Attendance
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = ('id', 'tenant_id', 'student_id', 'class_id', 'date', 'status', 'created_at')
+# Fields returned by the read path; the same shape as AttendanceService.export_attendance.
+READ_FIELDS = ('id', 'student_id', 'class_id', 'date', 'status')
+# Rows per Parquet row group / CSV flush, and rows removed per DELETE transaction.
+ARCHIVE_BATCH_SIZE = 50000
+ARCHIVE_DELETE_BATCH_SIZE = 5000
+
+
+def school_year_of(day, start_month=None):
+    start_month = start_month or current_app.config.get('SCHOOL_YEAR_START_MONTH', 8)
+    return day.year if day.month >= start_month else day.year - 1
+
+
+def school_year_bounds(year, start_month=None):
+    """[start, end) dates of school year `year`."""
+    start_month = start_month or current_app.config.get('SCHOOL_YEAR_START_MONTH', 8)
+    return date(year, start_month, 1), date(year + 1, start_month, 1)
+
+
+def first_hot_year(today=None):
+    """Oldest school year kept in the attendance table; older ones are archived."""
+    today = today or date.today()
+    return school_year_of(today) - current_app.config.get('ATTENDANCE_HOT_YEARS', 2) + 1
+
+
+def hot_cutoff(today=None):
+    """First day of `first_hot_year`: attendance before it may only exist in the archive."""
+    return school_year_bounds(first_hot_year(today))[0]
+
+
+def partition_name(year):
+    return f'attendance_y{year}'
+
+
+def _is_postgres():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def ensure_attendance_partitions(years):
+    """Create missing Postgres partitions for `years`; a no-op elsewhere.
+
+    Run ahead of time so new rows never land in the default partition, which
+    would block creating the partition for their year later.
+    """
+    if not _is_postgres():
+        return
+    for year in years:
+        start, end = school_year_bounds(year)
+        try:
+            db.session.execute(text(
+                f'CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF attendance '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not create attendance partition for {year}: {e}")
+
+
+def _year_dir(tenant_id, year):
+    tenant = tenant_id if tenant_id is not None else 'none'
+    return os.path.join(current_app.config['ARCHIVE_FOLDER'], 'attendance', f'tenant={tenant}', f'year={year}')
+
+
+def _tenant_filter(tenant_id):
+    return Attendance.tenant_id.is_(None) if tenant_id is None else Attendance.tenant_id == tenant_id
+
+
+class _PartWriter:
+    """Streams rows into one archive part, written under a temporary name."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.extension = 'parquet' if pq is not None else 'csv.gz'
+        self.tmp_path = os.path.join(directory, f'.part-incomplete.{self.extension}')
+        self.first_id = self.last_id = None
+        self.count = 0
+        if pq is not None:
+            schema = pa.schema([
+                ('id', pa.int64()), ('tenant_id', pa.int64()), ('student_id', pa.int64()),
+                ('class_id', pa.int64()), ('date', pa.date32()), ('status', pa.string()),
+                ('created_at', pa.timestamp('us')),
+            ])
+            self._writer = pq.ParquetWriter(self.tmp_path, schema, compression='zstd')
+            self._schema = schema
+        else:
+            self._file = gzip.open(self.tmp_path, 'wt', newline='', encoding='utf-8')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(ARCHIVE_FIELDS)
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.first_id is None:
+            self.first_id = rows[0][0]
+        self.last_id = rows[-1][0]
+        self.count += len(rows)
+        if pq is not None:
+            columns = list(zip(*rows))
+            self._writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, self._schema)],
+                schema=self._schema,
+            ))
+        else:
+            self._csv.writerows(rows)
+
+    def close(self):
+        """Finish the file and give it its final name; returns the path or None if empty."""
+        if pq is not None:
+            self._writer.close()
+        else:
+            self._file.close()
+        if not self.count:
+            os.remove(self.tmp_path)
+            return None
+        path = os.path.join(self.directory, f'part-{self.first_id}-{self.last_id}.{self.extension}')
+        os.replace(self.tmp_path, path)
+        return path
+
+    def discard(self):
+        if pq is not None:
+            self._writer.close()
+        else:
+            self._file.close()
+        os.remove(self.tmp_path)
+
+
+def _archive_tenant_year(tenant_id, year):
+    start, end = school_year_bounds(year)
+    in_year = (_tenant_filter(tenant_id), Attendance.date >= start, Attendance.date < end)
+    columns = [getattr(Attendance, field) for field in ARCHIVE_FIELDS]
+    stmt = select(*columns).where(*in_year).order_by(Attendance.id)
+
+    writer = _PartWriter(_year_dir(tenant_id, year))
+    try:
+        result = db.session.execute(stmt.execution_options(yield_per=ARCHIVE_BATCH_SIZE))
+        for batch in result.partitions():
+            writer.write([tuple(row) for row in batch])
+    except Exception:
+        writer.discard()
+        raise
+    path = writer.close()
+    db.session.commit()
+    if path is None:
+        return 0, None
+
+    # Only rows that made it into the file are deleted; rows added meanwhile
+    # have higher ids and are picked up by the next run.
+    while True:
+        batch_ids = select(Attendance.id).where(*in_year, Attendance.id <= writer.last_id) \
+            .limit(ARCHIVE_DELETE_BATCH_SIZE)
+        deleted = db.session.execute(
+            delete(Attendance).where(Attendance.id.in_(batch_ids.scalar_subquery())),
+            execution_options={'synchronize_session': False},
+        ).rowcount
+        db.session.commit()
+        if deleted < ARCHIVE_DELETE_BATCH_SIZE:
+            break
+    logger.info(f"Archived {writer.count} attendance rows for tenant {tenant_id}, school year {year} to {path}")
+    return writer.count, path
+
+
+def _drop_empty_partition(year):
+    if not _is_postgres():
+        return
+    name = partition_name(year)
+    exists = db.session.execute(text('SELECT to_regclass(:name)'), {'name': name}).scalar()
+    if exists and db.session.execute(text(f'SELECT NOT EXISTS (SELECT 1 FROM {name})')).scalar():
+        db.session.execute(text(f'DROP TABLE {name}'))
+        db.session.commit()
+        logger.info(f"Dropped empty attendance partition {name}")
+
+
+def archive_closed_years(today=None):
+    """Archive and delete attendance from school years that are no longer hot."""
+    today = today or date.today()
+    current_year = school_year_of(today)
+    ensure_attendance_partitions([current_year, current_year + 1])
+
+    hot_year = first_hot_year(today)
+    cutoff = hot_cutoff(today)
+    oldest = db.session.execute(
+        select(Attendance.tenant_id, func.min(Attendance.date))
+        .where(Attendance.date < cutoff)
+        .group_by(Attendance.tenant_id)
+    ).all()
+
+    archived = 0
+    files = []
+    years = set()
+    for tenant_id, oldest_date in oldest:
+        for year in range(school_year_of(oldest_date), hot_year):
+            count, path = _archive_tenant_year(tenant_id, year)
+            if path:
+                archived += count
+                files.append(path)
+                years.add(year)
+    for year in sorted(years):
+        _drop_empty_partition(year)
+    return {'archived_rows': archived, 'school_years': sorted(years), 'files': files}
+
+
+def archived_years(tenant_id=None, all_tenants=False):
+    """School years with archived attendance for `tenant_id` (or every tenant)."""
+    root = os.path.join(current_app.config['ARCHIVE_FOLDER'], 'attendance')
+    if all_tenants:
+        tenant_dirs = [d for d in _listdir(root) if d.startswith('tenant=')]
+    else:
+        tenant_dirs = [f"tenant={tenant_id if tenant_id is not None else 'none'}"]
+    return sorted({
+        int(d.split('=', 1)[1])
+        for tenant_dir in tenant_dirs
+        for d in _listdir(os.path.join(root, tenant_dir)) if d.startswith('year=')
+    })
+
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except FileNotFoundError:
+        return []
+
+
+def _read_part(path, class_id, student_id, date_from, date_to):
+    if path.endswith('.parquet'):
+        if pq is None:
+            raise RuntimeError('pyarrow is required to read Parquet attendance archives')
+        filters = []
+        if class_id is not None:
+            filters.append(('class_id', '=', class_id))
+        if student_id is not None:
+            filters.append(('student_id', '=', student_id))
+        if date_from is not None:
+            filters.append(('date', '>=', date_from))
+        if date_to is not None:
+            filters.append(('date', '<=', date_to))
+        table = pq.read_table(path, columns=list(READ_FIELDS), filters=filters or None)
+        for batch in table.to_batches(ARCHIVE_BATCH_SIZE):
+            yield from zip(*(column.to_pylist() for column in batch.columns))
+        return
+
+    with gzip.open(path, 'rt', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            day = datetime.strptime(row['date'], '%Y-%m-%d').date()
+            if class_id is not None and int(row['class_id'] or 0) != class_id:
+                continue
+            if student_id is not None and int(row['student_id'] or 0) != student_id:
+                continue
+            if (date_from is not None and day < date_from) or (date_to is not None and day > date_to):
+                continue
+            yield (int(row['id']), _int_or_none(row['student_id']), _int_or_none(row['class_id']),
+                   day, row['status'] or None)
+
+
+def _int_or_none(value):
+    return int(value) if value else None
+
+
+def read_archived_attendance(year, tenant_id=None, all_tenants=False, class_id=None, student_id=None,
+                             date_from=None, date_to=None):
+    """Yield archived (id, student_id, class_id, date, status) tuples for one school year, in id order."""
+    root = os.path.join(current_app.config['ARCHIVE_FOLDER'], 'attendance')
+    if all_tenants:
+        year_dirs = [os.path.join(root, d, f'year={year}') for d in _listdir(root) if d.startswith('tenant=')]
+    else:
+        year_dirs = [_year_dir(tenant_id, year)]
+    parts = [
+        os.path.join(year_dir, name)
+        for year_dir in year_dirs
+        for name in _listdir(year_dir) if name.startswith('part-')
+    ]
+    readers = [_read_part(path, class_id, student_id, date_from, date_to) for path in parts]
+    return heapq.merge(*readers, key=lambda row: row[0])
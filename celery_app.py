@@ -1,4 +1,5 @@
 from celery import Celery
+from kombu import Queue
 from config import Config
 
 # Create Celery instance (the core object; configuration may be expanded later)
@@ -19,8 +20,45 @@ celery.conf.update(
     enable_utc=True,
 )
 
+# Queue topology: latency-sensitive work never waits behind bulk jobs.
+#   email   - single transactional emails (password resets, notifications)
+#   default - anything not routed below
+#   bulk    - imports, reports, email blasts and maintenance
+# Run separate workers per group (see docker-compose.yml):
+#   celery -A celery_app worker -Q email,default --prefetch-multiplier=8
+#   celery -A celery_app worker -Q bulk --prefetch-multiplier=1 --concurrency=2
+# Priorities order tasks within a queue; on the Redis transport 0 is the
+# highest priority.
+celery.conf.update(
+    task_queues=(Queue('email'), Queue('default'), Queue('bulk')),
+    task_default_queue='default',
+    task_routes={
+        'tasks.send_email_notification': {'queue': 'email', 'priority': 0},
+        'tasks.generate_report': {'queue': 'bulk', 'priority': 3},
+        'tasks.send_email_batch': {'queue': 'bulk', 'priority': 3},
+        'tasks.process_bulk_data_import': {'queue': 'bulk', 'priority': 6},
+        'tasks.cleanup_expired_data': {'queue': 'bulk', 'priority': 9},
+    },
+    task_default_priority=5,
+    broker_transport_options={
+        'priority_steps': list(range(10)),
+        'sep': ':',
+        'queue_order_strategy': 'priority',
+        # Unacked (late-ack) bulk jobs are redelivered after this long, so it
+        # must exceed the longest import or report
+        'visibility_timeout': 4 * 3600,
+    },
+    # One reserved message per process, so a long bulk job does not hold
+    # others in its prefetch buffer; email workers raise it on the command line
+    worker_prefetch_multiplier=1,
+)
+
 # Optional: Configure Celery Beat for periodic tasks
 celery.conf.beat_schedule = {
+    'cleanup-expired-data': {
+        'task': 'tasks.cleanup_expired_data',
+        'schedule': 86400.0,  # daily
+    },
     # Example periodic task - runs every 10 minutes
     # 'check-system-health': {
     #     'task': 'tasks.check_system_health',
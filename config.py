@@ -27,12 +27,91 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Connection pool sizing (see dbpool.py): gunicorn workers and threads per
+    # pod, the most pods the HPA may run, and the server's connection limit
+    # (PgBouncer's max_client_conn with DB_POOL_MODE=pgbouncer), of which
+    # DB_RESERVED_CONNECTIONS are left for Celery workers, migrations and admin
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 16))
+    DB_MAX_REPLICAS = int(os.getenv('DB_MAX_REPLICAS', 1))
+    DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', 100))
+    DB_RESERVED_CONNECTIONS = int(os.getenv('DB_RESERVED_CONNECTIONS', 10))
+    DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'direct')  # direct | pgbouncer
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_WARN_UTILIZATION = float(os.getenv('DB_POOL_WARN_UTILIZATION', 0.8))
+    # Bearer token the scraper sends to GET /metrics; unset disables the endpoint
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+    # Read replicas (see replicas.py): comma-separated URIs that serve reads
+    # of GET requests, and seconds a client that wrote reads from the primary
+    SQLALCHEMY_REPLICA_URIS = os.getenv('SQLALCHEMY_REPLICA_URIS', '')
+    REPLICA_PIN_SECONDS = float(os.getenv('REPLICA_PIN_SECONDS', 5))
+
     # JWT (JSON Web Tokens)
     JWT_SECRET_KEY = os.getenv(
         'JWT_SECRET_KEY', 
         os.getenv('SECRET_KEY', 'dev-jwt-secret-key-change-in-production')
     )
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))  # 1 hour
+    # Seconds a worker may serve a cached role/active flag before re-reading it
+    ROLE_CACHE_TTL = int(os.getenv('ROLE_CACHE_TTL', 60))
+    # Seconds a worker may trust a "not revoked" answer from the shared store
+    REVOCATION_NEGATIVE_CACHE_TTL = int(os.getenv('REVOCATION_NEGATIVE_CACHE_TTL', 5))
+
+    # Password hashing (see hashing.py). Workers and queue depth are per pod and
+    # split across WEB_CONCURRENCY; workers <= 0 hashes on the request thread.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 4 * (os.cpu_count() or 1)))
+
+    # Shared storage for files handed from the API to Celery workers
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', os.path.join(os.getcwd(), 'uploads'))
+
+    # Attendance partitioning/archival (see archive.py): school years start on
+    # the 1st of this month; years older than the last ATTENDANCE_HOT_YEARS are
+    # moved to ARCHIVE_FOLDER by the cleanup_expired_data task
+    SCHOOL_YEAR_START_MONTH = int(os.getenv('SCHOOL_YEAR_START_MONTH', 8))
+    ATTENDANCE_HOT_YEARS = int(os.getenv('ATTENDANCE_HOT_YEARS', 2))
+    ARCHIVE_FOLDER = os.getenv('ARCHIVE_FOLDER', os.path.join(os.getcwd(), 'archive'))
+
+    # Generated reports (see reports.py), one subdirectory per tenant
+    REPORT_FOLDER = os.getenv('REPORT_FOLDER', os.path.join(os.getcwd(), 'reports'))
+    # Report result cache (see report_cache.py): total size of REPORT_FOLDER
+    # before least recently used reports are evicted, seconds a finished
+    # report is served to identical requests, and seconds an in-flight claim
+    # deduplicates them
+    REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', 1 << 30))
+    REPORT_CACHE_MAX_AGE = int(os.getenv('REPORT_CACHE_MAX_AGE', 86400))
+    REPORT_INFLIGHT_TTL = int(os.getenv('REPORT_INFLIGHT_TTL', 3600))
+
+    # Per-process cache of grade statistics (see grade_stats.py)
+    GRADE_STATS_CACHE_SIZE = int(os.getenv('GRADE_STATS_CACHE_SIZE', 1024))
+    GRADE_STATS_CACHE_TTL = int(os.getenv('GRADE_STATS_CACHE_TTL', 3600))
+
+    # Read-through entity cache (see entity_cache.py)
+    ENTITY_CACHE_ENABLED = os.getenv('ENTITY_CACHE_ENABLED', 'true').lower() == 'true'
+    ENTITY_CACHE_LOCAL_SIZE = int(os.getenv('ENTITY_CACHE_LOCAL_SIZE', 10000))
+    ENTITY_CACHE_LOCAL_TTL = int(os.getenv('ENTITY_CACHE_LOCAL_TTL', 30))
+    ENTITY_CACHE_TTL = int(os.getenv('ENTITY_CACHE_TTL', 300))
+
+    # Multi-tenancy (see tenancy.py): seconds a worker caches the tenant map,
+    # and whether /api requests must carry X-Tenant-ID
+    TENANT_CACHE_TTL = int(os.getenv('TENANT_CACHE_TTL', 60))
+    TENANT_REQUIRED = os.getenv('TENANT_REQUIRED', 'false').lower() == 'true'
+
+    # Task event streams (see task_events.py): seconds between keep-alives
+    # (and result-backend re-checks), longest stream before the client
+    # reconnects, streams one gunicorn worker holds open at once (each pins
+    # one of its GUNICORN_THREADS; by default half are left for other
+    # requests), and seconds the latest event of a task is kept
+    TASK_EVENTS_HEARTBEAT = int(os.getenv('TASK_EVENTS_HEARTBEAT', 15))
+    TASK_EVENTS_MAX_STREAM = int(os.getenv('TASK_EVENTS_MAX_STREAM', 300))
+    TASK_EVENTS_MAX_STREAMS = int(os.getenv('TASK_EVENTS_MAX_STREAMS', max(GUNICORN_THREADS // 2, 1)))
+    TASK_EVENTS_TTL = int(os.getenv('TASK_EVENTS_TTL', 3600))
+
+    # Redis (shared state across API workers; in-process fallbacks when unset)
+    REDIS_URL = os.getenv('REDIS_URL', '')
 
     # CORS (Cross-Origin Resource Sharing)
     CORS_HEADERS = 'Content-Type'
@@ -41,6 +120,29 @@ class Config:
         'http://localhost:3000,http://localhost:5000,http://localhost:8000'
     )
 
+    # Outgoing mail (see mailer.py); messages are only logged without MAIL_SERVER.
+    # MAIL_DOMAIN_RATE is messages/second per recipient domain (0 = unlimited),
+    # MAIL_DOMAIN_RATE_OVERRIDES e.g. 'gmail.com=20,yahoo.com=10'
+    MAIL_SERVER = os.getenv('MAIL_SERVER', '')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME', '')
+    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
+    MAIL_USE_SSL = os.getenv('MAIL_USE_SSL', 'false').lower() == 'true'
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'no-reply@localhost')
+    MAIL_POOL_SIZE = int(os.getenv('MAIL_POOL_SIZE', 4))
+    MAIL_BURST_SIZE = int(os.getenv('MAIL_BURST_SIZE', 100))
+    MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 500))
+    MAIL_DOMAIN_RATE = float(os.getenv('MAIL_DOMAIN_RATE', 50))
+    MAIL_DOMAIN_RATE_OVERRIDES = os.getenv('MAIL_DOMAIN_RATE_OVERRIDES', '')
+
+    # Per-tenant fair share of the bulk queue (see fairshare.py): heavy jobs a
+    # tenant may run at once, seconds before a job over the cap is retried,
+    # and seconds a crashed worker's slot stays taken
+    FAIR_SHARE_MAX_JOBS = int(os.getenv('FAIR_SHARE_MAX_JOBS', 2))
+    FAIR_SHARE_DEFER_DELAY = int(os.getenv('FAIR_SHARE_DEFER_DELAY', 30))
+    FAIR_SHARE_LEASE_TTL = int(os.getenv('FAIR_SHARE_LEASE_TTL', 7200))
+
     # Celery Configuration (async task queue - optional)
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', '')
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', '')
@@ -0,0 +1,175 @@
+"""Database connection pool sizing and pool metrics.
+
+The engine's pool is sized from the deployment topology rather than library
+defaults. Every gunicorn worker process of every pod has its own pool, so
+with W workers per pod and up to R pods (the HPA's maxReplicas) the pools
+together must fit in the server's connection budget:
+
+    per process = (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS) // (R * W)
+
+A process never needs more connections than it has request threads, so
+pool_size is the smaller of the thread count and that share, and
+max_overflow takes whatever is left of the share (at most pool_size
+again). Connections are recycled after DB_POOL_RECYCLE seconds and
+pre-pinged on checkout so server or proxy restarts cost no failed request.
+
+With DB_POOL_MODE=pgbouncer the app connects to PgBouncer in transaction
+pooling mode: DB_MAX_CONNECTIONS is PgBouncer's max_client_conn, and the
+app keeps only the connections its threads can use at once, since
+PgBouncer does the real pooling. Transaction pooling forbids session state
+across transactions; this app sets none (tenancy is row-level, and
+server-side cursors from `yield_per` live inside one transaction).
+
+Read replicas (see replicas.py) are sized the same way against their own
+server's limit. Checkout wait time, checked-out connections and overflow in
+use are recorded per process and pool, named by `pool_logging_name`, and
+served by /metrics; a warning is logged when a pool nears exhaustion.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Recent checkout waits kept for percentiles
+WAIT_SAMPLES = 1000
+# Minimum seconds between "pool nearly exhausted" warnings
+WARN_INTERVAL = 60
+
+
+class PoolMetrics:
+    def __init__(self, name, warn_utilization=0.8):
+        self.name = name
+        self.warn_utilization = warn_utilization
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._lock = threading.Lock()
+        self._warned_at = 0.0
+        self.pool = None
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._waits.append(seconds)
+
+    def check_utilization(self, pool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        if not capacity or pool.checkedout() / capacity < self.warn_utilization:
+            return
+        now = time.monotonic()
+        if now - self._warned_at >= WARN_INTERVAL:
+            self._warned_at = now
+            logger.warning(f"Database pool {self.name} nearly exhausted: {pool.checkedout()}/{capacity} connections "
+                           f"checked out ({pool.overflow()} overflow)")
+
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_ms_avg': round(1000 * self.wait_total / max(self.checkouts + self.timeouts, 1), 3),
+                'wait_ms_p95': round(1000 * waits[int(len(waits) * 0.95) - 1], 3) if waits else 0.0,
+                'wait_ms_max': round(1000 * self.wait_max, 3),
+            }
+        pool = self.pool
+        if pool is not None:
+            stats.update({
+                'pool_size': pool.size(),
+                'max_overflow': pool._max_overflow,
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+            })
+        return stats
+
+
+METRICS = {}  # pool name -> PoolMetrics
+WARN_UTILIZATION = 0.8
+
+
+def _pool_metrics(name):
+    metrics = METRICS.get(name)
+    if metrics is None:
+        metrics = METRICS.setdefault(name, PoolMetrics(name, WARN_UTILIZATION))
+    return metrics
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout, including ones that time out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics = _pool_metrics(self._orig_logging_name or 'primary')
+        self._metrics.pool = self
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self._metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self._metrics.record_wait(time.perf_counter() - start)
+        self._metrics.check_utilization(self)
+        return connection
+
+
+def pool_settings(config):
+    """(pool_size, max_overflow) for one process under `config`'s topology."""
+    threads = max(config.get('GUNICORN_THREADS', 1), 1)
+    processes = max(config.get('DB_MAX_REPLICAS', 1), 1) * max(config.get('WEB_CONCURRENCY', 1), 1)
+    budget = (config.get('DB_MAX_CONNECTIONS', 100) - config.get('DB_RESERVED_CONNECTIONS', 10)) // processes
+    if budget < 1:
+        logger.warning(f"DB_MAX_CONNECTIONS leaves no connections for {processes} web processes; "
+                       f"using 1 per process (consider DB_POOL_MODE=pgbouncer)")
+        return 1, 0
+    pool_size = min(threads, budget)
+    if config.get('DB_POOL_MODE') == 'pgbouncer':
+        return pool_size, 0
+    return pool_size, min(budget - pool_size, pool_size)
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database and topology."""
+    url = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') in ('sqlite:', 'sqlite://')):
+        return {}  # In-memory SQLite needs its single-connection pool
+    pool_size, max_overflow = pool_settings(config)
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+        'pool_logging_name': 'primary',
+    }
+
+
+def init_db_pool(app):
+    """Derive the engine's pool options; call before `db.init_app(app)`.
+
+    Explicit SQLALCHEMY_ENGINE_OPTIONS in the config take precedence.
+    """
+    global WARN_UTILIZATION
+    WARN_UTILIZATION = app.config.get('DB_POOL_WARN_UTILIZATION', 0.8)
+    options = engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    return options
+
+
+def pool_stats():
+    return {name: metrics.snapshot() for name, metrics in list(METRICS.items())}
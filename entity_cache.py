@@ -0,0 +1,272 @@
+"""Read-through cache for single-entity lookups by primary key.
+
+Only column state is cached, never ORM instances: a hit is rebuilt into a
+detached instance and attached to the current session without a query.
+Many-to-one relationships listed in CACHED_RELATIONSHIPS are materialised
+the same way and attached as already loaded, so the serializers read them
+without triggering lazy loads.
+
+Entries are keyed by primary key alone; a hit whose tenant_id differs from
+the current tenant is treated as not found, as the scoped query would be.
+
+Two tiers are used: a per-process LRU with a short TTL, and (when REDIS_URL
+is set) a shared Redis tier with a longer TTL. Services call `invalidate`
+after every update/delete; that clears Redis and the local tier of the
+worker that made the write, while other workers' local tiers expire within
+ENTITY_CACHE_LOCAL_TTL seconds. Misses are read from the primary even in
+requests routed to a read replica (see replicas.py), which may not have
+the write that emptied the entry yet.
+
+A miss that read the row before a concurrent write committed must not put
+the old row back after that write's invalidation. Each fill therefore
+takes a token before querying: the local tier refuses the fill if any
+invalidation happened in this process since, and Redis entries carry the
+per-key version (bumped by every invalidation) they were read under, so
+one stored late is never served.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db, User, Student, Course, Class
+from replicas import primary_reads
+from tenancy import current_tenant_id
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Many-to-one relationships to materialise from the cache alongside each
+# model; these mirror what the serializers read.
+CACHED_RELATIONSHIPS = {
+    User: (),
+    Student: ('user',),
+    Course: (),
+    Class: ('course', 'teacher'),
+}
+# Never copied into the cache; left unloaded on cached instances and fetched
+# on access if ever needed.
+UNCACHED_COLUMNS = {'password_hash'}
+
+
+class LRUTier:
+    def __init__(self, max_entries, ttl):
+        self._entries = OrderedDict()  # key -> (expires_at, state)
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, state):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl, state)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisTier:
+    KEY_PREFIX = 'entity:'
+    # Per-key invalidation counters; one small integer per entity ever
+    # written, so they are left without a TTL.
+    VERSION_PREFIX = 'entity-version:'
+
+    def __init__(self, client, ttl):
+        self._client = client
+        self._ttl = ttl
+
+    def get(self, key):
+        try:
+            payload, version = self._client.mget(self.KEY_PREFIX + key, self.VERSION_PREFIX + key)
+        except redis.RedisError as e:
+            logger.warning(f"Entity cache read failed: {e}")
+            return None
+        if not payload:
+            return None
+        stored_version, state = pickle.loads(payload)
+        # Filled from a read that started before the last invalidation
+        return state if stored_version == int(version or 0) else None
+
+    def version(self, key):
+        """Current version of `key`, to pass to `set` after reading the row (None on error)."""
+        try:
+            return int(self._client.get(self.VERSION_PREFIX + key) or 0)
+        except redis.RedisError as e:
+            logger.warning(f"Entity cache read failed: {e}")
+            return None
+
+    def set(self, key, state, version):
+        if version is None:
+            return
+        try:
+            self._client.set(self.KEY_PREFIX + key, pickle.dumps((version, state)), ex=self._ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Entity cache write failed: {e}")
+
+    def delete(self, key):
+        # Errors propagate: a failed invalidation must not be silently ignored.
+        pipe = self._client.pipeline(transaction=True)
+        pipe.incr(self.VERSION_PREFIX + key)
+        pipe.delete(self.KEY_PREFIX + key)
+        pipe.execute()
+
+
+class EntityCache:
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+        # Bumped by every invalidation in this process; a local fill taken
+        # under an older generation may hold a row read before the write.
+        self._generation = 0
+
+    @staticmethod
+    def key(model, entity_id):
+        return f'{model.__name__}:{entity_id}'
+
+    def get_state(self, model, entity_id):
+        key = self.key(model, entity_id)
+        state = self.local.get(key)
+        if state is not None:
+            self.stats['local_hits'] += 1
+            return state
+        if self.shared is not None:
+            generation = self._generation
+            state = self.shared.get(key)
+            if state is not None:
+                self.stats['shared_hits'] += 1
+                if generation == self._generation:
+                    self.local.set(key, state)
+                return state
+        self.stats['misses'] += 1
+        return None
+
+    def fill_token(self, model, entity_id):
+        """Take before reading a row to cache; pass to `set_state` afterwards."""
+        shared_version = None
+        if self.shared is not None:
+            shared_version = self.shared.version(self.key(model, entity_id))
+        return self._generation, shared_version
+
+    def set_state(self, model, entity_id, state, token):
+        generation, shared_version = token
+        key = self.key(model, entity_id)
+        if generation == self._generation:
+            self.local.set(key, state)
+        if self.shared is not None:
+            self.shared.set(key, state, shared_version)
+
+    def invalidate(self, model, entity_id):
+        key = self.key(model, entity_id)
+        self.stats['invalidations'] += 1
+        self._generation += 1
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+
+def init_entity_cache(app):
+    """Attach the entity cache to `app.extensions` (None when disabled)."""
+    cache = None
+    if app.config.get('ENTITY_CACHE_ENABLED', True):
+        local = LRUTier(app.config.get('ENTITY_CACHE_LOCAL_SIZE', 10000), app.config.get('ENTITY_CACHE_LOCAL_TTL', 30))
+        shared = None
+        url = app.config.get('REDIS_URL')
+        if url and redis is not None:
+            shared = RedisTier(redis.Redis.from_url(url), app.config.get('ENTITY_CACHE_TTL', 300))
+        cache = EntityCache(local, shared)
+    app.extensions['entity_cache'] = cache
+    return cache
+
+
+def _column_state(obj):
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in inspect(obj).mapper.column_attrs
+        if attr.key not in UNCACHED_COLUMNS
+    }
+
+
+def _materialise(model, entity_id, state):
+    """Attach a cached row to the session as a persistent instance, without SQL."""
+    identity_key = inspect(model).identity_key_from_primary_key((entity_id,))
+    obj = db.session.identity_map.get(identity_key)
+    if obj is None:
+        obj = model(**state)
+        make_transient_to_detached(obj)
+        db.session.add(obj)
+    return obj
+
+
+def cached_get(model, entity_id, options=()):
+    """Fetch `model` by primary key through the cache; `options` apply on a miss."""
+    cache = current_app.extensions.get('entity_cache')
+    if cache is None or entity_id is None:
+        return model.query.options(*options).get(entity_id)
+    try:
+        entity_id = int(entity_id)
+    except (TypeError, ValueError):
+        return None
+
+    state = cache.get_state(model, entity_id)
+    if state is not None:
+        tenant_id = current_tenant_id()
+        if tenant_id is not None and state.get('tenant_id') != tenant_id:
+            return None
+        obj = _materialise(model, entity_id, state)
+        for name in CACHED_RELATIONSHIPS.get(model, ()):
+            relationship = inspect(model).relationships[name]
+            (local_column,) = relationship.local_columns
+            related_id = getattr(obj, local_column.key)
+            if related_id is not None and name in inspect(obj).unloaded:
+                related = cached_get(relationship.mapper.class_, related_id)
+                set_committed_value(obj, name, related)
+        return obj
+
+    token = cache.fill_token(model, entity_id)
+    with primary_reads():
+        obj = model.query.options(*options).get(entity_id)
+    if obj is None:
+        return None
+    cache.set_state(model, entity_id, _column_state(obj), token)
+    for name in CACHED_RELATIONSHIPS.get(model, ()):
+        if name not in inspect(obj).unloaded:
+            # Joined-loaded on this miss: seed the local tier with it too (no
+            # Redis version was taken for it before the read)
+            related = getattr(obj, name)
+            if related is not None:
+                cache.set_state(type(related), related.id, _column_state(related), (token[0], None))
+    return obj
+
+
+def invalidate(model, entity_id):
+    cache = current_app.extensions.get('entity_cache')
+    if cache is not None and entity_id is not None:
+        cache.invalidate(model, int(entity_id))
+
+
+def cache_stats():
+    cache = current_app.extensions.get('entity_cache')
+    return dict(cache.stats) if cache is not None else {}
@@ -0,0 +1,107 @@
+"""Per-tenant caps on concurrently running heavy jobs.
+
+Bulk imports and reports run on the shared `bulk` queue (see celery_app.py).
+Without a cap, one tenant queuing dozens of jobs would occupy every bulk
+worker slot until its jobs finish. A heavy task therefore holds one of its
+tenant's FAIR_SHARE_MAX_JOBS slots while it runs; a task that finds its
+tenant at the cap is re-queued with a delay (see `tasks.tenant_job_slot`),
+freeing the worker for other tenants' jobs.
+
+Slots are leases keyed by task id, so a redelivered task (late acks) gets
+its slot back, and a worker that dies without releasing loses the lease after
+FAIR_SHARE_LEASE_TTL seconds. Production uses the Redis store so all workers
+share the counts; the in-memory store is the fallback for local development
+when REDIS_URL is not set.
+"""
+import random
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class InMemoryFairShare:
+    """Per-process leases; only correct with a single worker process."""
+
+    def __init__(self, max_jobs, lease_ttl):
+        self.max_jobs = max_jobs
+        self._lease_ttl = lease_ttl
+        self._leases = {}  # tenant key -> {job_id: expires_at}
+        self._lock = threading.Lock()
+
+    def acquire(self, tenant_key, job_id):
+        now = time.monotonic()
+        with self._lock:
+            leases = {j: t for j, t in self._leases.get(tenant_key, {}).items() if t > now}
+            if job_id not in leases and len(leases) >= self.max_jobs:
+                self._leases[tenant_key] = leases
+                return False
+            leases[job_id] = now + self._lease_ttl
+            self._leases[tenant_key] = leases
+            return True
+
+    def release(self, tenant_key, job_id):
+        with self._lock:
+            self._leases.get(tenant_key, {}).pop(job_id, None)
+
+    def running(self, tenant_key):
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for t in self._leases.get(tenant_key, {}).values() if t > now)
+
+
+class RedisFairShare:
+    """Leases in one sorted set per tenant, scored by expiry time."""
+
+    KEY_PREFIX = 'fair-share:'
+    ACQUIRE_SCRIPT = """
+        local now = tonumber(ARGV[2])
+        redis.call('zremrangebyscore', KEYS[1], '-inf', now)
+        if redis.call('zscore', KEYS[1], ARGV[1]) or redis.call('zcard', KEYS[1]) < tonumber(ARGV[3]) then
+            redis.call('zadd', KEYS[1], now + tonumber(ARGV[4]), ARGV[1])
+            redis.call('expire', KEYS[1], ARGV[4])
+            return 1
+        end
+        return 0
+    """
+
+    def __init__(self, client, max_jobs, lease_ttl):
+        self.max_jobs = max_jobs
+        self._client = client
+        self._lease_ttl = lease_ttl
+        self._acquire = client.register_script(self.ACQUIRE_SCRIPT)
+
+    def acquire(self, tenant_key, job_id):
+        return bool(self._acquire(keys=[self.KEY_PREFIX + tenant_key],
+                                  args=[job_id, time.time(), self.max_jobs, self._lease_ttl]))
+
+    def release(self, tenant_key, job_id):
+        self._client.zrem(self.KEY_PREFIX + tenant_key, job_id)
+
+    def running(self, tenant_key):
+        return self._client.zcount(self.KEY_PREFIX + tenant_key, time.time(), '+inf')
+
+
+def init_fair_share(app):
+    """Attach the configured fair-share store to `app.extensions`."""
+    url = app.config.get('REDIS_URL')
+    max_jobs = app.config.get('FAIR_SHARE_MAX_JOBS', 2)
+    lease_ttl = app.config.get('FAIR_SHARE_LEASE_TTL', 7200)
+    if url and redis is not None:
+        store = RedisFairShare(redis.Redis.from_url(url), max_jobs, lease_ttl)
+    else:
+        store = InMemoryFairShare(max_jobs, lease_ttl)
+    app.extensions['fair_share'] = store
+    return store
+
+
+def tenant_key(tenant_id):
+    return str(tenant_id) if tenant_id is not None else 'default'
+
+
+def defer_delay(base):
+    """Jittered re-queue delay, so deferred jobs of one tenant do not return in lockstep."""
+    return base * random.uniform(0.5, 1.5)
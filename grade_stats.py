@@ -0,0 +1,166 @@
+"""Vectorized grade statistics per course/term and term GPA.
+
+Each statistic loads the (student_id, course_id, grade) columns it needs in
+one query and computes everything with NumPy array operations; no ORM
+objects are built. A student with several grade rows in a course/term is
+scored by their mean, and distributions are over those per-student scores.
+
+Results are cached per process, keyed by tenant, course/term and a version
+counter from versions.py. GradeService bumps the counter of every
+course/term it writes (see `invalidate_grade_stats`) in the tenants owning
+the written grades, also for a super admin's write without X-Tenant-ID, so
+with the Redis version store all workers stop serving stale results at once. Results for
+a version that may not have replicated yet are computed on the primary.
+"""
+from flask import current_app
+from sqlalchemy import select
+from models import db, Grade
+from entity_cache import LRUTier
+from replicas import primary_reads
+from tenancy import current_tenant_id
+from versions import bump_collection_version, collection_settling, collection_version
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Lower bound of each letter band on a percentage scale -> grade points
+GRADE_POINTS = ((90, 4.0), (80, 3.0), (70, 2.0), (60, 1.0))
+HISTOGRAM_BINS = 10
+PERCENTILES = (10, 25, 75, 90)
+
+
+class GradeStatsUnavailable(RuntimeError):
+    pass
+
+
+def init_grade_stats(app):
+    """Attach the per-process statistics cache to `app.extensions`."""
+    cache = LRUTier(app.config.get('GRADE_STATS_CACHE_SIZE', 1024), app.config.get('GRADE_STATS_CACHE_TTL', 3600))
+    app.extensions['grade_stats_cache'] = cache
+    return cache
+
+
+def _stats_collection(course_id, term):
+    return f'grade-stats:{course_id}:{term}'
+
+
+def _gpa_collection(term):
+    return f'grade-gpa:{term}'
+
+
+def invalidate_grade_stats(course_terms):
+    """Invalidate cached statistics for (course_id, term) pairs; call after commit.
+
+    Also bumps the whole `grades` collection, which cached reports depend on.
+    """
+    course_terms = set(course_terms)
+    collections = ['grades'] + [_stats_collection(c, t) for c, t in course_terms]
+    collections += [_gpa_collection(t) for t in {t for _, t in course_terms}]
+    bump_collection_version(*collections)
+
+
+def _cached(collection, compute):
+    if np is None:
+        raise GradeStatsUnavailable('NumPy is required for grade statistics')
+    cache = current_app.extensions['grade_stats_cache']
+    key = f'{current_tenant_id()}:{collection}:{collection_version(collection)}'
+    result = cache.get(key)
+    if result is None:
+        with primary_reads(collection_settling(collection)):
+            result = compute()
+        cache.set(key, result)
+    return result
+
+
+def _per_student_scores(student_ids, grades):
+    """Mean grade per student: (unique student ids, scores)."""
+    students, inverse = np.unique(student_ids, return_inverse=True)
+    scores = np.bincount(inverse, weights=grades) / np.bincount(inverse)
+    return students, scores
+
+
+def _percentile_ranks(scores):
+    """Mid-rank percentile of each score within `scores` (0-100)."""
+    ordered = np.sort(scores)
+    below = np.searchsorted(ordered, scores, side='left')
+    through = np.searchsorted(ordered, scores, side='right')
+    return (below + (through - below) / 2) / len(scores) * 100
+
+
+def _round(values):
+    return np.round(values, 2).tolist()
+
+
+def course_term_stats(course_id, term):
+    """Distribution of one course/term: summary statistics, histogram and percentile ranks."""
+    def compute():
+        rows = db.session.execute(
+            select(Grade.student_id, Grade.grade)
+            .where(Grade.course_id == course_id, Grade.term == term, Grade.grade.is_not(None))
+        ).all()
+        result = {'course_id': course_id, 'term': term, 'grade_count': len(rows), 'student_count': 0}
+        if not rows:
+            return result
+        student_ids = np.fromiter((r[0] if r[0] is not None else -1 for r in rows), dtype=np.int64, count=len(rows))
+        grades = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+        students, scores = _per_student_scores(student_ids, grades)
+
+        counts, edges = np.histogram(scores, bins=HISTOGRAM_BINS, range=(min(0.0, scores.min()), max(100.0, scores.max())))
+        result.update({
+            'student_count': len(students),
+            'mean': round(float(scores.mean()), 2),
+            'median': round(float(np.median(scores)), 2),
+            'stddev': round(float(scores.std()), 2),
+            'min': round(float(scores.min()), 2),
+            'max': round(float(scores.max()), 2),
+            'percentiles': dict(zip((f'p{p}' for p in PERCENTILES), _round(np.percentile(scores, PERCENTILES)))),
+            'histogram': {'bin_edges': _round(edges), 'counts': counts.tolist()},
+            'percentile_ranks': [
+                {'student_id': int(s), 'score': score, 'percentile_rank': rank}
+                for s, score, rank in zip(students, _round(scores), _round(_percentile_ranks(scores)))
+                if s != -1
+            ],
+        })
+        return result
+
+    return _cached(_stats_collection(course_id, term), compute)
+
+
+def grade_points(scores):
+    """Map percentage scores to 4.0-scale grade points."""
+    thresholds = np.array([t for t, _ in GRADE_POINTS][::-1], dtype=np.float64)
+    points = np.array([0.0] + [p for _, p in GRADE_POINTS][::-1])
+    return points[np.searchsorted(thresholds, scores, side='right')]
+
+
+def term_gpa(term):
+    """Unweighted 4.0-scale GPA of every student graded in `term`."""
+    def compute():
+        rows = db.session.execute(
+            select(Grade.student_id, Grade.course_id, Grade.grade)
+            .where(Grade.term == term, Grade.grade.is_not(None), Grade.student_id.is_not(None),
+                   Grade.course_id.is_not(None))
+        ).all()
+        if not rows:
+            return {'term': term, 'student_count': 0, 'mean_gpa': None, 'students': []}
+        columns = np.array(rows, dtype=np.float64)
+        pairs, inverse = np.unique(columns[:, :2], axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        course_scores = np.bincount(inverse, weights=columns[:, 2]) / np.bincount(inverse)
+        students, student_index = np.unique(pairs[:, 0], return_inverse=True)
+        student_index = student_index.reshape(-1)
+        gpas = np.bincount(student_index, weights=grade_points(course_scores)) / np.bincount(student_index)
+        courses = np.bincount(student_index)
+        return {
+            'term': term,
+            'student_count': len(students),
+            'mean_gpa': round(float(gpas.mean()), 2),
+            'students': [
+                {'student_id': int(s), 'gpa': gpa, 'courses': int(n)}
+                for s, gpa, n in zip(students, _round(gpas), courses)
+            ],
+        }
+
+    return _cached(_gpa_collection(term), compute)
@@ -0,0 +1,139 @@
+"""Password hashing on a bounded process pool.
+
+Hashing is deliberately CPU-expensive. Running it on the request thread lets a
+login storm starve every other endpoint, so hashes are computed in a small
+process pool. PASSWORD_HASH_WORKERS and PASSWORD_HASH_QUEUE_DEPTH are budgets
+for the whole pod (by default its cores, and four queued hashes per core);
+each of the WEB_CONCURRENCY gunicorn workers gets an equal share, so together
+they never run more hashes than there are cores. Beyond its queue share a
+worker raises HashingBusyError, and app.py answers any request that hit it
+(login, registration, password change) with 503 and Retry-After instead of
+piling up latency.
+
+A pool whose process died (OOM kill, segfault) is replaced on the next hash
+instead of failing every later call with BrokenProcessPool.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing queue is full."""
+
+
+class HashingPool:
+    def __init__(self, processes, queue_depth, method):
+        self.processes = processes
+        self.method = method
+        self._slots = threading.BoundedSemaphore(max(queue_depth, 1))
+        self._executor = None
+        self._lock = threading.Lock()
+        self._prefix = None
+
+    def executor(self):
+        """Return the process pool, or None when hashes must run inline.
+
+        The pool is created lazily so it is never inherited across a gunicorn
+        fork. Daemonic processes (Celery prefork children) cannot spawn
+        children of their own, so they hash inline.
+        """
+        if self.processes <= 0 or multiprocessing.current_process().daemon:
+            return None
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self._executor
+
+    def discard(self, executor):
+        """Drop a broken pool so the next call starts a fresh one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.warning('Password hashing pool broke; starting a new one')
+
+    def run(self, fn, *args):
+        executor = self.executor()
+        if executor is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusyError('Password hashing queue is full')
+        try:
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                self.discard(executor)
+                return self.executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def map(self, fn, *iterables):
+        executor = self.executor()
+        if executor is not None:
+            try:
+                return list(executor.map(fn, *iterables, chunksize=16))
+            except BrokenProcessPool:
+                self.discard(executor)
+                return list(self.executor().map(fn, *iterables, chunksize=16))
+        # hashlib releases the GIL while hashing, so threads still run in parallel
+        with ThreadPoolExecutor(max_workers=max(self.processes, 1)) as threads:
+            return list(threads.map(fn, *iterables))
+
+    def prefix(self):
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._prefix
+
+
+def init_hashing(app):
+    """Attach this worker's share of the pod's hashing pool to `app.extensions`."""
+    workers = max(app.config.get('WEB_CONCURRENCY', 1), 1)
+    processes = app.config.get('PASSWORD_HASH_WORKERS', Config.PASSWORD_HASH_WORKERS)
+    if processes > 0:
+        processes = max(processes // workers, 1)
+    queue_depth = max(app.config.get('PASSWORD_HASH_QUEUE_DEPTH', Config.PASSWORD_HASH_QUEUE_DEPTH) // workers, 1)
+    pool = HashingPool(processes, queue_depth, app.config.get('PASSWORD_HASH_METHOD', Config.PASSWORD_HASH_METHOD))
+    app.extensions['hashing'] = pool
+    return pool
+
+
+_inline_pool = None
+
+
+def _pool():
+    """The app's pool; scripts running without an app hash inline."""
+    global _inline_pool
+    if has_app_context() and 'hashing' in current_app.extensions:
+        return current_app.extensions['hashing']
+    if _inline_pool is None:
+        _inline_pool = HashingPool(0, 1, Config.PASSWORD_HASH_METHOD)
+    return _inline_pool
+
+
+def hash_password(password):
+    pool = _pool()
+    return pool.run(generate_password_hash, password, pool.method)
+
+
+def hash_passwords(passwords):
+    """Hash many passwords in parallel (used by bulk imports)."""
+    pool = _pool()
+    return pool.map(generate_password_hash, passwords, [pool.method] * len(passwords))
+
+
+def verify_password(pwhash, password):
+    return _pool().run(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """True when `pwhash` was produced with different method parameters than configured."""
+    return pwhash.split('$', 1)[0] != _pool().prefix()
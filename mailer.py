@@ -0,0 +1,272 @@
+"""Batched email delivery over pooled SMTP connections.
+
+A batch of messages is grouped by sender and cut into bursts; each burst is
+sent on one connection checked out of a pool of authenticated SMTP
+connections, with up to MAIL_POOL_SIZE bursts in flight at once. Opening and
+authenticating a connection therefore happens once per pooled connection
+rather than once per message. Deliveries to each recipient domain are
+limited to MAIL_DOMAIN_RATE messages per second (token bucket), and bursts
+interleave domains so one throttled domain does not stall the others.
+
+Without MAIL_SERVER, messages are only logged (local development).
+"""
+import logging
+import queue
+import smtplib
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.message import EmailMessage
+from email.utils import make_msgid
+
+logger = logging.getLogger(__name__)
+
+# Connection-level failures: the connection is discarded, not returned to the pool
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+class SMTPConnectionPool:
+    """Up to `size` connections, reused LIFO; idle ones are checked with NOOP before reuse."""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=False, use_ssl=False,
+                 size=4, timeout=30, max_idle=30):
+        self._host = host
+        self._port = port
+        self._username = username
+        self._password = password
+        self._use_tls = use_tls
+        self._use_ssl = use_ssl
+        self._timeout = timeout
+        self._max_idle = max_idle
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.opened = 0
+
+    def _connect(self):
+        smtp_class = smtplib.SMTP_SSL if self._use_ssl else smtplib.SMTP
+        conn = smtp_class(self._host, self._port, timeout=self._timeout)
+        try:
+            conn.ehlo()
+            if self._use_tls and not self._use_ssl:
+                conn.starttls()
+                conn.ehlo()
+            if self._username:
+                conn.login(self._username, self._password or '')
+        except Exception:
+            self._discard(conn)
+            raise
+        self.opened += 1
+        return conn
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def _checkout(self):
+        while True:
+            try:
+                idle_since, conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - idle_since < self._max_idle:
+                return conn
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except CONNECTION_ERRORS:
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put((time.monotonic(), conn))
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                _, conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+class DomainRateLimiter:
+    """Token bucket per recipient domain; `rate` <= 0 disables limiting."""
+
+    def __init__(self, rate, overrides=None, burst=None):
+        self._rate = rate
+        self._overrides = overrides or {}
+        self._burst = burst
+        self._buckets = {}  # domain -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def wait(self, domain):
+        rate = self._overrides.get(domain, self._rate)
+        if rate <= 0:
+            return
+        capacity = self._burst or max(rate, 1)
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(domain, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate) - 1
+            self._buckets[domain] = (tokens, now)
+        # A negative balance is a reservation: sleep until it is paid off
+        if tokens < 0:
+            time.sleep(-tokens / rate)
+
+
+def recipient_domain(address):
+    return address.rpartition('@')[2].lower()
+
+
+def build_message(sender, message):
+    email = EmailMessage()
+    email['From'] = sender
+    email['To'] = message['recipient']
+    email['Subject'] = message.get('subject', '')
+    email['Message-ID'] = make_msgid(domain=recipient_domain(sender) or None)
+    email.set_content(message.get('body', ''))
+    return email
+
+
+def interleave_domains(messages):
+    """Reorder messages round-robin across recipient domains."""
+    by_domain = defaultdict(deque)
+    for message in messages:
+        by_domain[recipient_domain(message['recipient'])].append(message)
+    queues = list(by_domain.values())
+    ordered = []
+    while queues:
+        for q in queues:
+            ordered.append(q.popleft())
+        queues = [q for q in queues if q]
+    return ordered
+
+
+class BatchMailer:
+    """Sends batches of {recipient, subject, body[, sender]} dicts."""
+
+    def __init__(self, pool, limiter, default_sender, burst_size=100):
+        self._pool = pool
+        self._limiter = limiter
+        self._default_sender = default_sender
+        self._burst_size = burst_size
+
+    def send(self, messages):
+        """Deliver `messages`; returns {'sent': n, 'failed': [{recipient, error, temporary}]}.
+
+        `temporary` marks failures worth retrying later (4xx replies and
+        connection errors); permanent rejections are not retried.
+        """
+        by_sender = defaultdict(list)
+        for message in messages:
+            by_sender[message.get('sender') or self._default_sender].append(message)
+        bursts = []
+        for sender, group in by_sender.items():
+            ordered = interleave_domains(group)
+            bursts += [(sender, ordered[i:i + self._burst_size]) for i in range(0, len(ordered), self._burst_size)]
+        sent = 0
+        failed = []
+        if len(bursts) <= 1:
+            results = [self._send_burst(*burst) for burst in bursts]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(bursts), self._pool.size)) as executor:
+                results = list(executor.map(lambda burst: self._send_burst(*burst), bursts))
+        for burst_sent, burst_failed in results:
+            sent += burst_sent
+            failed.extend(burst_failed)
+        return {'sent': sent, 'failed': failed}
+
+    def _send_burst(self, sender, messages, reconnects=1):
+        sent = 0
+        failed = []
+        pending = deque(messages)
+        try:
+            with self._pool.connection() as conn:
+                while pending:
+                    message = pending[0]
+                    self._limiter.wait(recipient_domain(message['recipient']))
+                    try:
+                        conn.send_message(build_message(sender, message), from_addr=sender,
+                                          to_addrs=[message['recipient']])
+                        sent += 1
+                    except smtplib.SMTPRecipientsRefused as e:
+                        code = next(iter(e.recipients.values()))[0]
+                        failed.append(_failure(message, e, code))
+                    except (smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as e:
+                        failed.append(_failure(message, e, e.smtp_code))
+                    pending.popleft()
+        except CONNECTION_ERRORS as e:
+            if reconnects > 0 and pending:
+                logger.warning(f"SMTP connection lost, reconnecting: {e}")
+                more_sent, more_failed = self._send_burst(sender, list(pending), reconnects - 1)
+                return sent + more_sent, failed + more_failed
+            failed.extend({'recipient': m['recipient'], 'error': str(e), 'temporary': True} for m in pending)
+        return sent, failed
+
+    def close(self):
+        self._pool.close()
+
+
+def _failure(message, error, code):
+    return {'recipient': message['recipient'], 'error': str(error), 'temporary': 400 <= (code or 0) < 500}
+
+
+class LoggingMailer:
+    """Development stand-in used when MAIL_SERVER is not set."""
+
+    def send(self, messages):
+        for message in messages:
+            logger.info(f"Email to {message['recipient']}: {message.get('subject', '')} (MAIL_SERVER not set)")
+        return {'sent': len(messages), 'failed': []}
+
+    def close(self):
+        pass
+
+
+def parse_domain_rates(value):
+    """'gmail.com=20,yahoo.com=10' -> {'gmail.com': 20.0, 'yahoo.com': 10.0}"""
+    rates = {}
+    for item in (value or '').split(','):
+        domain, _, rate = item.partition('=')
+        if domain.strip() and rate.strip():
+            rates[domain.strip().lower()] = float(rate)
+    return rates
+
+
+def init_mailer(app):
+    """Attach the configured mailer to `app.extensions`."""
+    config = app.config
+    if config.get('MAIL_SERVER'):
+        pool = SMTPConnectionPool(
+            config['MAIL_SERVER'], config.get('MAIL_PORT', 587),
+            username=config.get('MAIL_USERNAME'), password=config.get('MAIL_PASSWORD'),
+            use_tls=config.get('MAIL_USE_TLS', True), use_ssl=config.get('MAIL_USE_SSL', False),
+            size=config.get('MAIL_POOL_SIZE', 4),
+        )
+        limiter = DomainRateLimiter(config.get('MAIL_DOMAIN_RATE', 0),
+                                    parse_domain_rates(config.get('MAIL_DOMAIN_RATE_OVERRIDES')))
+        mailer = BatchMailer(pool, limiter, config.get('MAIL_DEFAULT_SENDER'), config.get('MAIL_BURST_SIZE', 100))
+    else:
+        mailer = LoggingMailer()
+    app.extensions['mailer'] = mailer
+    return mailer
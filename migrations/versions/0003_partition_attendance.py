@@ -0,0 +1,100 @@
+"""partition attendance by school year
+
+On Postgres, rebuilds attendance as a table range-partitioned on `date`
+with one partition per school year (from the oldest row through next year)
+plus a default partition. The primary key becomes (id, date), since
+Postgres requires the partition key in every unique constraint; ids keep
+coming from the existing sequence, so the ORM still identifies rows by id.
+Other databases keep the single table and this revision does nothing.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 22:05:41.118402
+
+"""
+from datetime import date
+from alembic import op
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, student_id, class_id, date, status, created_at, tenant_id'
+INDEXES = {
+    'ix_attendance_tenant_id_student_id_class_id_date': 'tenant_id, student_id, class_id, date',
+    'ix_attendance_tenant_id_class_id_date': 'tenant_id, class_id, date',
+    'ix_attendance_class_id': 'class_id',
+}
+
+
+def _create_table(name, partitioned):
+    primary_key = 'id, date' if partitioned else 'id'
+    op.execute(f"""
+        CREATE TABLE {name} (
+            id INTEGER NOT NULL DEFAULT nextval('attendance_id_seq'),
+            student_id INTEGER REFERENCES students (id),
+            class_id INTEGER REFERENCES classes (id),
+            date DATE NOT NULL,
+            status VARCHAR(10),
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            tenant_id INTEGER REFERENCES tenants (id),
+            CONSTRAINT attendance_pkey PRIMARY KEY ({primary_key}),
+            CONSTRAINT uq_attendance_student_class_date UNIQUE (student_id, class_id, date)
+        ){' PARTITION BY RANGE (date)' if partitioned else ''}
+    """)
+    for index, columns in INDEXES.items():
+        op.execute(f'CREATE INDEX {index} ON {name} ({columns})')
+
+
+def _rename_old_table():
+    """Move the current table and its constraint/index names out of the way."""
+    op.execute('ALTER TABLE attendance RENAME TO attendance_old')
+    op.execute('ALTER TABLE attendance_old RENAME CONSTRAINT attendance_pkey TO attendance_old_pkey')
+    op.execute('ALTER TABLE attendance_old RENAME CONSTRAINT uq_attendance_student_class_date '
+               'TO uq_attendance_old_student_class_date')
+    for index in INDEXES:
+        op.execute(f'ALTER INDEX {index} RENAME TO {index.replace("ix_attendance_", "ix_attendance_old_")}')
+
+
+def _move_rows_and_drop_old():
+    op.execute(f'INSERT INTO attendance ({COLUMNS}) SELECT {COLUMNS} FROM attendance_old')
+    op.execute('ALTER SEQUENCE attendance_id_seq OWNED BY attendance.id')
+    op.execute('DROP TABLE attendance_old')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    start_month = current_app.config.get('SCHOOL_YEAR_START_MONTH', 8)
+
+    def school_year(day):
+        return day.year if day.month >= start_month else day.year - 1
+
+    oldest = op.get_bind().exec_driver_sql('SELECT MIN(date) FROM attendance').scalar()
+    current_year = school_year(date.today())
+    first_year = min(school_year(oldest), current_year) if oldest else current_year
+
+    _rename_old_table()
+    _create_table('attendance', partitioned=True)
+    for year in range(first_year, current_year + 2):
+        op.execute(
+            f'CREATE TABLE attendance_y{year} PARTITION OF attendance '
+            f"FOR VALUES FROM ('{date(year, start_month, 1)}') TO ('{date(year + 1, start_month, 1)}')"
+        )
+    op.execute('CREATE TABLE attendance_default PARTITION OF attendance DEFAULT')
+    _move_rows_and_drop_old()
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    _rename_old_table()
+    _create_table('attendance', partitioned=False)
+    # Dropping the partitioned parent drops its partitions with it
+    _move_rows_and_drop_old()
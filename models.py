@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from hashing import hash_password, verify_password
+from replicas import RoutingSession
 from datetime import datetime
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Tenant Model for multi-tenancy
 class Tenant(db.Model):
@@ -18,6 +19,9 @@ class Tenant(db.Model):
 # User Model
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_tenant_id_user_type_id', 'tenant_id', 'user_type', 'id'),
+    )
     USER_TYPE_CHOICES = [
         (1, 'admin'),
         (2, 'teacher'),
@@ -39,10 +43,10 @@ class User(db.Model):
     tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'))
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     def __repr__(self):
         return f"<User {self.email}>"
@@ -50,6 +54,11 @@ class User(db.Model):
 # Student Model
 class Student(db.Model):
     __tablename__ = 'students'
+    __table_args__ = (
+        db.Index('ix_students_tenant_id_current_class_id_id', 'tenant_id', 'current_class_id', 'id'),
+        db.Index('ix_students_user_id', 'user_id'),
+        db.Index('ix_students_current_class_id', 'current_class_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.String(20), unique=True)
     dob = db.Column(db.Date)
@@ -80,6 +89,9 @@ class Student(db.Model):
 # Course Model
 class Course(db.Model):
     __tablename__ = 'courses'
+    __table_args__ = (
+        db.Index('ix_courses_tenant_id_id', 'tenant_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     code = db.Column(db.String(20), unique=True)
@@ -93,6 +105,12 @@ class Course(db.Model):
 # Class Model
 class Class(db.Model):
     __tablename__ = 'classes'
+    __table_args__ = (
+        db.Index('ix_classes_tenant_id_course_id_id', 'tenant_id', 'course_id', 'id'),
+        db.Index('ix_classes_tenant_id_teacher_id_id', 'tenant_id', 'teacher_id', 'id'),
+        db.Index('ix_classes_course_id', 'course_id'),
+        db.Index('ix_classes_teacher_id', 'teacher_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
@@ -107,7 +125,17 @@ class Class(db.Model):
 
 # Attendance Model
 class Attendance(db.Model):
+    # On Postgres the table is partitioned by school year (migration 0003,
+    # primary key (id, date)); see archive.py.
     __tablename__ = 'attendance'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'class_id', 'date', name='uq_attendance_student_class_date'),
+        db.Index('ix_attendance_tenant_id_student_id_class_id_date', 'tenant_id', 'student_id', 'class_id', 'date'),
+        db.Index('ix_attendance_tenant_id_class_id_date', 'tenant_id', 'class_id', 'date'),
+        db.Index('ix_attendance_class_id', 'class_id'),
+    )
+    STATUS_CHOICES = ('present', 'absent', 'late')
+
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
     class_id = db.Column(db.Integer, db.ForeignKey('classes.id'))
@@ -122,6 +150,12 @@ class Attendance(db.Model):
 # Grade Model
 class Grade(db.Model):
     __tablename__ = 'grades'
+    __table_args__ = (
+        db.Index('ix_grades_tenant_id_student_id_course_id_term', 'tenant_id', 'student_id', 'course_id', 'term'),
+        db.Index('ix_grades_tenant_id_course_id_term_id', 'tenant_id', 'course_id', 'term', 'id'),
+        db.Index('ix_grades_student_id', 'student_id'),
+        db.Index('ix_grades_course_id', 'course_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
@@ -137,8 +171,40 @@ class Grade(db.Model):
     def value(self):
         return self.grade
 
+# Attendance rollups, maintained alongside attendance writes (see rollups.py)
+class AttendanceMonthly(db.Model):
+    __tablename__ = 'attendance_monthly'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'class_id', 'month', name='uq_attendance_monthly_student_class_month'),
+        db.Index('ix_attendance_monthly_tenant_id_class_id_month', 'tenant_id', 'class_id', 'month'),
+        db.Index('ix_attendance_monthly_tenant_id_student_id_month', 'tenant_id', 'student_id', 'month'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
+    class_id = db.Column(db.Integer, db.ForeignKey('classes.id'))
+    month = db.Column(db.Date, nullable=False)  # First day of the month
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'))
+
+class AttendanceClassDaily(db.Model):
+    __tablename__ = 'attendance_class_daily'
+    __table_args__ = (
+        db.UniqueConstraint('class_id', 'date', name='uq_attendance_class_daily_class_date'),
+        db.Index('ix_attendance_class_daily_tenant_id_date', 'tenant_id', 'date'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('classes.id'))
+    date = db.Column(db.Date, nullable=False)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'))
+
 # Association table for student-parents relationship
 student_parents = db.Table('student_parents',
     db.Column('student_id', db.Integer, db.ForeignKey('students.id'), primary_key=True),
-    db.Column('parent_id', db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    db.Column('parent_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Index('ix_student_parents_parent_id', 'parent_id'),
 )
@@ -0,0 +1,179 @@
+"""Read-replica routing with read-your-writes.
+
+With SQLALCHEMY_REPLICA_URIS set, each replica becomes an extra engine
+(bind key `replica_<n>`) and `db.session` routes statements per request:
+
+- SELECTs issued while handling a GET/HEAD/OPTIONS request go to one replica,
+  chosen at random once per request so the request sees one snapshot;
+- everything else (flushes, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE,
+  raw SQL, Celery tasks and CLI commands) goes to the primary.
+
+A request that commits a write pins its client (JWT identity, or address
+for anonymous requests, within the tenant) to the primary for
+REPLICA_PIN_SECONDS, which should exceed the usual replication lag, so the
+client reads its own writes. Production keeps pins in Redis so they hold
+across API workers and pods; the in-memory store is the fallback for local
+development when REDIS_URL is not set.
+
+Caches shared between clients must not be filled from a replica that may
+not have seen the write that invalidated them: fills run under
+`primary_reads()` (see entity_cache.py, and `collection_settling` in
+versions.py for the version-keyed caches).
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+class InMemoryPinStore:
+    """Per-process pins; only correct with a single worker."""
+
+    PURGE_THRESHOLD = 10000
+
+    def __init__(self):
+        self._pins = {}  # client key -> monotonic expiry
+        self._lock = threading.Lock()
+
+    def pin(self, key, ttl):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._pins) >= self.PURGE_THRESHOLD:
+                self._pins = {k: v for k, v in self._pins.items() if v > now}
+            self._pins[key] = now + ttl
+
+    def is_pinned(self, key):
+        with self._lock:
+            return self._pins.get(key, 0) > time.monotonic()
+
+
+class RedisPinStore:
+    KEY_PREFIX = 'primary-pin:'
+
+    def __init__(self, client):
+        self._client = client
+
+    def pin(self, key, ttl):
+        self._client.set(self.KEY_PREFIX + key, 1, px=int(ttl * 1000))
+
+    def is_pinned(self, key):
+        return bool(self._client.exists(self.KEY_PREFIX + key))
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends read-only request queries to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _reads_from_replica(self, clause):
+            if '_replica_key' not in g:
+                g._replica_key = random.choice(current_app.extensions['replica_keys'])
+            return self._db.engines[g._replica_key]
+        return super().get_bind(mapper, clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def primary_reads(enabled=True):
+    """Send the reads of this block to the primary, e.g. to fill a shared cache."""
+    if not enabled or not has_request_context():
+        yield
+        return
+    previous = g.get('_primary_reads', False)
+    g._primary_reads = True
+    try:
+        yield
+    finally:
+        g._primary_reads = previous
+
+
+def _reads_from_replica(session, clause):
+    if session._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None:
+        return False
+    if not has_request_context() or request.method not in READ_METHODS:
+        return False
+    if not current_app.extensions.get('replica_keys'):
+        return False
+    if g.get('_primary_reads') or g.get('_wrote_primary') or g.get('_write_pending'):
+        return False
+    if '_pinned_to_primary' not in g:
+        store = current_app.extensions.get('replica_pins')
+        g._pinned_to_primary = bool(store and store.is_pinned(_client_key()))
+    return not g._pinned_to_primary
+
+
+def _client_key():
+    from tenancy import current_tenant_id
+
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:  # No verified token in this request
+        identity = None
+    client = f'user:{identity}' if identity is not None else f'addr:{request.remote_addr}'
+    return f'{current_tenant_id()}:{client}'
+
+
+def _mark_write_pending(*args):
+    if has_request_context():
+        g._write_pending = True
+
+
+def _mark_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_write_pending()
+
+
+def _mark_committed(session):
+    if has_request_context() and g.get('_write_pending'):
+        g._wrote_primary = True
+
+
+def _pin_writer(response):
+    if g.get('_wrote_primary') and current_app.extensions.get('replica_keys'):
+        current_app.extensions['replica_pins'].pin(_client_key(), current_app.config.get('REPLICA_PIN_SECONDS', 5))
+    return response
+
+
+def init_replicas(app):
+    """Register replica engines and routing; call before `db.init_app(app)`.
+
+    Replica pools are sized like the primary's (see dbpool.py). Returns the
+    replica bind keys.
+    """
+    from dbpool import engine_options
+    from models import db
+
+    uris = [u.strip() for u in (app.config.get('SQLALCHEMY_REPLICA_URIS') or '').split(',') if u.strip()]
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    keys = []
+    for n, uri in enumerate(uris):
+        key = f'{REPLICA_BIND_PREFIX}{n}'
+        options = engine_options({**app.config, 'SQLALCHEMY_DATABASE_URI': uri})
+        options['pool_logging_name'] = key
+        binds[key] = {'url': uri, **options}
+        keys.append(key)
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions['replica_keys'] = keys
+
+    # Hooks are installed even without replicas; they are no-ops until
+    # `replica_keys` is non-empty.
+    url = app.config.get('REDIS_URL')
+    app.extensions['replica_pins'] = (
+        RedisPinStore(redis.Redis.from_url(url)) if url and redis is not None else InMemoryPinStore()
+    )
+    if not event.contains(db.session, 'after_commit', _mark_committed):
+        event.listen(db.session, 'after_flush', _mark_write_pending)
+        event.listen(db.session, 'do_orm_execute', _mark_statement_write)
+        event.listen(db.session, 'after_commit', _mark_committed)
+    app.after_request(_pin_writer)
+    return keys
@@ -0,0 +1,190 @@
+"""Content-addressed cache of generated reports.
+
+A report is identified by a hash of (tenant, report_type, normalized
+parameters, format, data version), where the data version is the collection
+version (see versions.py) of every collection the report type reads. The
+report file is named after that hash, so an identical request finds the
+finished file in REPORT_FOLDER and is answered without queuing anything;
+any write to an underlying collection changes the hash.
+
+Requests whose report is still being generated are deduplicated through an
+in-flight store mapping the hash to the task id of the run that claimed it.
+Production uses the Redis store so every API worker sees the same claims;
+the in-memory store is the fallback for local development when REDIS_URL is
+not set.
+
+REPORT_FOLDER is bounded by total size: files are evicted least recently
+used first, with a cache hit refreshing the file's mtime.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from flask import current_app
+from reports import WRITERS, get_report_type, report_dir
+from tenancy import current_tenant_id
+from versions import collection_version
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class InMemoryInflightStore:
+    """Per-process claims; only deduplicates requests handled by one worker."""
+
+    def __init__(self):
+        self._claims = {}  # key -> (task_id, expires_at)
+        self._lock = threading.Lock()
+
+    def claim(self, key, task_id, ttl):
+        """Claim `key` for `task_id`; returns the current holder's task id if already claimed."""
+        now = time.monotonic()
+        with self._lock:
+            holder = self._claims.get(key)
+            if holder and holder[1] > now:
+                return holder[0]
+            self._claims[key] = (task_id, now + ttl)
+            return None
+
+    def replace(self, key, task_id, ttl):
+        with self._lock:
+            self._claims[key] = (task_id, time.monotonic() + ttl)
+
+    def release(self, key, task_id):
+        with self._lock:
+            if self._claims.get(key, (None,))[0] == task_id:
+                del self._claims[key]
+
+
+class RedisInflightStore:
+    KEY_PREFIX = 'report-inflight:'
+    # Delete the claim only if it still belongs to the releasing task
+    RELEASE_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('del', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._release = client.register_script(self.RELEASE_SCRIPT)
+
+    def claim(self, key, task_id, ttl):
+        if self._client.set(self.KEY_PREFIX + key, task_id, nx=True, ex=ttl):
+            return None
+        holder = self._client.get(self.KEY_PREFIX + key)
+        if holder is None:  # Released in between; claim again
+            return self.claim(key, task_id, ttl)
+        return holder.decode()
+
+    def replace(self, key, task_id, ttl):
+        self._client.set(self.KEY_PREFIX + key, task_id, ex=ttl)
+
+    def release(self, key, task_id):
+        self._release(keys=[self.KEY_PREFIX + key], args=[task_id])
+
+
+def init_report_cache(app):
+    """Attach the configured in-flight store to `app.extensions`."""
+    url = app.config.get('REDIS_URL')
+    if url and redis is not None:
+        store = RedisInflightStore(redis.Redis.from_url(url))
+    else:
+        store = InMemoryInflightStore()
+    app.extensions['report_inflight'] = store
+    return store
+
+
+def report_cache_key(report_type, params, output_format):
+    """Hash identifying one report's content; `params` must already be normalized."""
+    report = get_report_type(report_type)
+    seed = json.dumps({
+        'tenant': current_tenant_id(),
+        'report_type': report_type,
+        'params': params,
+        'format': output_format,
+        'versions': {c: collection_version(c) for c in report.collections},
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(seed.encode()).hexdigest()
+
+
+def cached_report(key, output_format):
+    """Filename of the finished report for `key`, or None.
+
+    Files older than REPORT_CACHE_MAX_AGE are not served: data changes that
+    bypass the collection versions (such as archival) stop being hidden
+    after that long.
+    """
+    filename = f'{key}.{WRITERS[output_format].extension}'
+    path = os.path.join(report_dir(current_tenant_id()), filename)
+    try:
+        modified = os.path.getmtime(path)
+    except OSError:
+        return None
+    now = time.time()
+    if now - modified > current_app.config.get('REPORT_CACHE_MAX_AGE', 86400):
+        return None
+    os.utime(path, (now, now))  # Mark as recently used for eviction
+    return filename
+
+
+def claim_report(key, task_id, is_finished):
+    """Claim `key` for a new run with `task_id`.
+
+    Returns the task id of an unfinished run already generating the same
+    report, or None when the caller should queue `task_id`. A claim held by
+    a run that finished without leaving a file (it failed) is taken over.
+    """
+    store = current_app.extensions['report_inflight']
+    ttl = current_app.config.get('REPORT_INFLIGHT_TTL', 3600)
+    holder = store.claim(key, task_id, ttl)
+    if holder is None:
+        return None
+    if not is_finished(holder):
+        return holder
+    store.replace(key, task_id, ttl)
+    return None
+
+
+def release_report(key, task_id):
+    """Drop the in-flight claim of `task_id`; call when the run ends either way."""
+    current_app.extensions['report_inflight'].release(key, task_id)
+
+
+def evict_reports(keep=None):
+    """Delete least recently used reports until REPORT_FOLDER fits REPORT_CACHE_MAX_BYTES.
+
+    `keep` (a path) is never evicted. Returns the number of files removed.
+    """
+    max_bytes = current_app.config.get('REPORT_CACHE_MAX_BYTES', 1 << 30)
+    files = []
+    total = 0
+    for root, _, names in os.walk(current_app.config['REPORT_FOLDER']):
+        for name in names:
+            if name.endswith('.incomplete'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            total += stat.st_size
+            files.append((stat.st_mtime, stat.st_size, path))
+    keep = os.path.abspath(keep) if keep else None
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
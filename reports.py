@@ -0,0 +1,365 @@
+"""Report engine behind tasks.generate_report.
+
+A report type declares its columns, validates its parameters, counts its
+rows (the progress denominator) and yields rows from one query executed
+with `yield_per`, which on Postgres reads through a server-side cursor.
+Writers consume the rows chunk by chunk and append to the output file, so
+memory stays bounded by REPORT_CHUNK_SIZE whatever the report's size.
+
+Outputs are written under REPORT_FOLDER/tenant=<id>/ with a temporary name
+and renamed into place when complete.
+"""
+import csv
+import os
+import uuid
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from models import db, User, Student, Course, Class, Grade
+from rollups import STATUSES, attendance_counts_by_student
+from tenancy import current_tenant_id
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+REPORT_CHUNK_SIZE = 2000
+REPORT_FORMATS = ('csv', 'xlsx', 'pdf')
+REPORT_TYPES = {}
+
+
+def register_report(cls):
+    REPORT_TYPES[cls.name] = cls()
+    return cls
+
+
+def get_report_type(name):
+    try:
+        return REPORT_TYPES[name]
+    except KeyError:
+        raise ValueError(f"report_type must be one of: {', '.join(sorted(REPORT_TYPES))}")
+
+
+class ReportType:
+    """One kind of report. Subclasses set `name`, `title`, `columns` and the
+    `collections` (see versions.py) whose writes change its output."""
+
+    name = None
+    title = None
+    columns = ()
+    collections = ()
+
+    def normalize(self, params):
+        """Validate `params` and return them in canonical form; raises ValueError."""
+        return {}
+
+    def query(self, params):
+        raise NotImplementedError
+
+    def count(self, params):
+        return db.session.execute(select(func.count()).select_from(self.query(params).subquery())).scalar()
+
+    def iter_chunks(self, params):
+        result = db.session.execute(self.query(params).execution_options(yield_per=REPORT_CHUNK_SIZE))
+        for chunk in result.partitions():
+            yield [self.format_row(row) for row in chunk]
+
+    def format_row(self, row):
+        return tuple(row)
+
+
+def _int_param(params, name, required=False):
+    value = params.get(name)
+    if value in (None, ''):
+        if required:
+            raise ValueError(f'{name} is required')
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer')
+
+
+def _date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+
+
+def _full_name(first, last):
+    return f'{first or ""} {last or ""}'.strip()
+
+
+@register_report
+class ClassRosterReport(ReportType):
+    name = 'class_roster'
+    title = 'Class roster'
+    columns = ('class_id', 'class', 'course', 'teacher', 'student_id', 'student_name', 'email')
+    collections = ('students', 'classes')
+
+    def normalize(self, params):
+        return {'class_id': _int_param(params, 'class_id')}
+
+    def query(self, params):
+        teacher = aliased(User)
+        query = select(
+            Class.id, Class.name, Course.name, teacher.first_name, teacher.last_name,
+            Student.student_id, User.first_name, User.last_name, User.email,
+        ).select_from(Student) \
+            .join(Class, Student.current_class_id == Class.id) \
+            .outerjoin(Course, Class.course_id == Course.id) \
+            .outerjoin(teacher, Class.teacher_id == teacher.id) \
+            .outerjoin(User, Student.user_id == User.id) \
+            .order_by(Class.id, Student.id)
+        if params['class_id'] is not None:
+            query = query.where(Class.id == params['class_id'])
+        return query
+
+    def format_row(self, row):
+        class_id, class_name, course, t_first, t_last, student_id, first, last, email = row
+        return (class_id, class_name, course, _full_name(t_first, t_last), student_id,
+                _full_name(first, last), email)
+
+
+@register_report
+class AttendanceSummaryReport(ReportType):
+    name = 'attendance_summary'
+    title = 'Attendance summary'
+    columns = ('class_id', 'class', 'student_id', 'student_name', *STATUSES, 'total', 'rate')
+    collections = ('attendance', 'students', 'classes')
+
+    def normalize(self, params):
+        normalized = {
+            'class_id': _int_param(params, 'class_id'),
+            'date_from': _date_param(params, 'date_from'),
+            'date_to': _date_param(params, 'date_to'),
+        }
+        if normalized['date_from'] and normalized['date_to'] and normalized['date_from'] > normalized['date_to']:
+            raise ValueError('date_from must not be after date_to')
+        return {k: v.isoformat() if hasattr(v, 'isoformat') else v for k, v in normalized.items()}
+
+    def query(self, params):
+        counts = attendance_counts_by_student(
+            _date_param(params, 'date_from'), _date_param(params, 'date_to'), params['class_id'],
+        ).subquery()
+        return select(
+            counts.c.class_id, Class.name, Student.student_id, User.first_name, User.last_name,
+            *(counts.c[s] for s in STATUSES),
+        ).select_from(counts) \
+            .outerjoin(Class, counts.c.class_id == Class.id) \
+            .outerjoin(Student, counts.c.student_id == Student.id) \
+            .outerjoin(User, Student.user_id == User.id) \
+            .order_by(counts.c.class_id, counts.c.student_id)
+
+    def format_row(self, row):
+        class_id, class_name, student_id, first, last, *counts = row
+        present, absent, late = (c or 0 for c in counts)
+        total = present + absent + late
+        return (class_id, class_name, student_id, _full_name(first, last), present, absent, late, total,
+                round((present + late) / total, 4) if total else None)
+
+
+@register_report
+class TermGradesReport(ReportType):
+    name = 'term_grades'
+    title = 'Term grades'
+    columns = ('course_code', 'course', 'student_id', 'student_name', 'term', 'grade')
+    collections = ('grades', 'students', 'courses')
+
+    def normalize(self, params):
+        term = (params.get('term') or '').strip()
+        if not term:
+            raise ValueError('term is required')
+        return {'term': term, 'course_id': _int_param(params, 'course_id')}
+
+    def query(self, params):
+        query = select(
+            Course.code, Course.name, Student.student_id, User.first_name, User.last_name, Grade.term, Grade.grade,
+        ).select_from(Grade) \
+            .outerjoin(Course, Grade.course_id == Course.id) \
+            .outerjoin(Student, Grade.student_id == Student.id) \
+            .outerjoin(User, Student.user_id == User.id) \
+            .where(Grade.term == params['term']) \
+            .order_by(Grade.course_id, Grade.student_id, Grade.id)
+        if params['course_id'] is not None:
+            query = query.where(Grade.course_id == params['course_id'])
+        return query
+
+    def format_row(self, row):
+        code, course, student_id, first, last, term, grade = row
+        return (code, course, student_id, _full_name(first, last), term, grade)
+
+
+class CsvWriter:
+    extension = 'csv'
+
+    def __init__(self, path, title, columns):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class XlsxWriter:
+    """openpyxl write-only workbook: rows are streamed to a temporary file as they are appended."""
+
+    extension = 'xlsx'
+
+    def __init__(self, path, title, columns):
+        if Workbook is None:
+            raise ValueError('openpyxl is required for XLSX reports')
+        self._path = path
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(title[:31])
+        self._sheet.append(list(columns))
+
+    def write(self, rows):
+        for row in rows:
+            self._sheet.append(list(row))
+
+    def close(self):
+        self._workbook.save(self._path)
+
+
+class PdfWriter:
+    """Minimal streaming PDF writer for tabular text.
+
+    Each page is written to the file as soon as it fills up; only the byte
+    offsets of the objects are kept until the cross-reference table is
+    written at the end. Text is set in Courier on landscape A4.
+    """
+
+    extension = 'pdf'
+    PAGE_WIDTH, PAGE_HEIGHT = 842, 595
+    FONT_SIZE = 7
+    LEADING = 9
+    MARGIN = 36
+    # Courier glyphs are 0.6 em wide
+    LINE_CHARS = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.6))
+    LINES_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN) / LEADING) - 2  # minus heading and column header
+
+    # Fixed object numbers: 1 catalog, 2 page tree, 3 font; pages start at 4
+    def __init__(self, path, title, columns):
+        self._file = open(path, 'wb')
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 4
+        self._title = title
+        self._columns = columns
+        self._widths = None
+        self._lines = []
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._write_object(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>')
+
+    def _write_object(self, object_id, body):
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(b'%d 0 obj\n' % object_id + body + b'\nendobj\n')
+
+    def _format(self, values):
+        if self._widths is None:
+            # Column widths come from the header and first chunk, then stay fixed
+            self._widths = [max(len(str(c)), 6) for c in self._columns]
+        cells = ['' if v is None else str(v) for v in values]
+        line = ' '.join(cell[:w].ljust(w) for cell, w in zip(cells, self._widths))
+        return line[:self.LINE_CHARS]
+
+    @staticmethod
+    def _escape(text):
+        text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        return text.encode('cp1252', errors='replace')
+
+    def _flush_page(self):
+        page_no = len(self._page_ids) + 1
+        heading = f'{self._title}  -  page {page_no}'
+        lines = [heading, self._format(self._columns)] + self._lines
+        y = self.PAGE_HEIGHT - self.MARGIN
+        content = [b'BT /F1 %d Tf %d TL %d %d Td' % (self.FONT_SIZE, self.LEADING, self.MARGIN, y)]
+        content += [b'(' + self._escape(line) + b') Tj T*' for line in lines]
+        content.append(b'ET')
+        stream = b'\n'.join(content)
+        content_id, page_id = self._next_id, self._next_id + 1
+        self._next_id += 2
+        self._write_object(content_id, b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        self._write_object(page_id, (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>'
+        ) % (self.PAGE_WIDTH, self.PAGE_HEIGHT, content_id))
+        self._page_ids.append(page_id)
+        self._lines = []
+
+    def write(self, rows):
+        if self._widths is None and rows:
+            self._widths = [
+                min(max(len(str(c)), 6, *(len(str(r[i])) for r in rows if r[i] is not None)), 40)
+                for i, c in enumerate(self._columns)
+            ]
+        for row in rows:
+            self._lines.append(self._format(row))
+            if len(self._lines) == self.LINES_PER_PAGE:
+                self._flush_page()
+
+    def close(self):
+        if self._lines or not self._page_ids:
+            self._flush_page()
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self._page_ids)
+        self._write_object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._page_ids)))
+        self._write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref_offset = self._file.tell()
+        size = self._next_id
+        self._file.write(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+        for object_id in range(1, size):
+            self._file.write(b'%010d 00000 n \n' % self._offsets[object_id])
+        self._file.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref_offset))
+        self._file.close()
+
+
+WRITERS = {'csv': CsvWriter, 'xlsx': XlsxWriter, 'pdf': PdfWriter}
+
+
+def report_dir(tenant_id=None):
+    tenant = tenant_id if tenant_id is not None else 'none'
+    return os.path.join(current_app.config['REPORT_FOLDER'], f'tenant={tenant}')
+
+
+def run_report(report_type, params, output_format, name=None, progress=None):
+    """Write one report to REPORT_FOLDER and return (path, row count).
+
+    `params` must already be normalized. `progress(current, total)` is
+    called after every chunk.
+    """
+    report = get_report_type(report_type)
+    if output_format not in WRITERS:
+        raise ValueError(f"format must be one of: {', '.join(REPORT_FORMATS)}")
+    directory = report_dir(current_tenant_id())
+    os.makedirs(directory, exist_ok=True)
+    writer_class = WRITERS[output_format]
+    path = os.path.join(directory, f'{name or uuid.uuid4().hex}.{writer_class.extension}')
+    tmp_path = path + '.incomplete'
+
+    total = report.count(params)
+    written = 0
+    writer = writer_class(tmp_path, report.title, report.columns)
+    try:
+        for rows in report.iter_chunks(params):
+            writer.write(rows)
+            written += len(rows)
+            if progress:
+                progress(written, total)
+        writer.close()
+    except Exception:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return path, written
@@ -0,0 +1,91 @@
+"""Token revocation stores keyed by JWT `jti`.
+
+Logged-out tokens must be rejected by every API worker, so production uses
+the Redis store; the in-memory store is the fallback for local development
+when REDIS_URL is not set.
+"""
+import logging
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryRevocationStore:
+    """Per-process store; only correct with a single worker."""
+
+    PURGE_THRESHOLD = 10000
+
+    def __init__(self):
+        self._revoked = {}  # jti -> expires_at (epoch seconds)
+
+    def revoke(self, jti, expires_at):
+        now = time.time()
+        if expires_at <= now:
+            return
+        if len(self._revoked) >= self.PURGE_THRESHOLD:
+            self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+        self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+
+class RedisRevocationStore:
+    """Shared store; each revoked jti lives in Redis until its token expires.
+
+    Lookups that come back "not revoked" are remembered locally for
+    `negative_ttl` seconds, so the common case costs no round trip. A token
+    revoked on another worker is therefore rejected here within that window.
+    """
+
+    KEY_PREFIX = 'revoked-jti:'
+    NEGATIVE_CACHE_MAX_ENTRIES = 100000
+
+    def __init__(self, client, negative_ttl=5):
+        self._client = client
+        self._negative_ttl = negative_ttl
+        self._not_revoked = {}  # jti -> monotonic time the answer expires
+
+    def revoke(self, jti, expires_at):
+        self._not_revoked.pop(jti, None)
+        ttl = int(expires_at - time.time())
+        if ttl > 0:
+            self._client.set(self.KEY_PREFIX + jti, 1, ex=ttl)
+
+    def is_revoked(self, jti):
+        now = time.monotonic()
+        cached_until = self._not_revoked.get(jti)
+        if cached_until and cached_until > now:
+            return False
+        try:
+            revoked = bool(self._client.exists(self.KEY_PREFIX + jti))
+        except redis.RedisError as e:
+            # Fail open: tokens are short-lived and an outage should not log
+            # every user out.
+            logger.warning(f"Revocation lookup failed, treating token as valid: {e}")
+            return False
+        if not revoked and self._negative_ttl > 0:
+            if len(self._not_revoked) >= self.NEGATIVE_CACHE_MAX_ENTRIES:
+                self._not_revoked.clear()
+            self._not_revoked[jti] = now + self._negative_ttl
+        return revoked
+
+
+def init_revocation_store(app):
+    """Attach the configured revocation store to `app.extensions`."""
+    url = app.config.get('REDIS_URL')
+    if url and redis is not None:
+        store = RedisRevocationStore(
+            redis.Redis.from_url(url),
+            negative_ttl=app.config.get('REVOCATION_NEGATIVE_CACHE_TTL', 5),
+        )
+    else:
+        store = InMemoryRevocationStore()
+    app.extensions['revocation_store'] = store
+    return store
@@ -0,0 +1,269 @@
+"""Attendance rollups: status counts per student x class x month and per class x day.
+
+AttendanceService reports every attendance change through
+`apply_attendance_changes` before committing, so the rollups move in the
+same transaction as the rows they summarise. Counts are adjusted with
+atomic delta upserts (`present = present + :delta`). That only keeps them
+correct if the deltas are too: callers derive them from attendance rows
+they hold locked, or that an INSERT ... RETURNING reports as theirs (see
+AttendanceService.record_roll_call). Statuses outside
+Attendance.STATUS_CHOICES are not counted.
+
+`attendance_rates` answers date-range questions from the rollups: whole
+months come from attendance_monthly and only the partial months at either
+end of the range are read from attendance itself. Rollups are kept when
+attendance is archived, so a partial month in a school year that may be
+archived (before archive.hot_cutoff) is widened to the whole month and
+read from the rollup. `rebuild_attendance_rollups` only rewrites the
+months it is asked to (by default, those still present in attendance).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import case, cast, delete, func, insert, select, union_all
+from models import db, Attendance, AttendanceMonthly, AttendanceClassDaily
+from archive import hot_cutoff
+
+STATUSES = Attendance.STATUS_CHOICES
+GROUP_BY_CHOICES = ('student', 'class', 'day')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _upsert_counts(model, key_columns, rows):
+    """Add each row's status deltas to `model`, creating rows as needed."""
+    from services import upsert_insert
+
+    stmt = upsert_insert(model)
+    if stmt is not None:
+        stmt = stmt.values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={status: getattr(model, status) + getattr(stmt.excluded, status) for status in STATUSES},
+        )
+        db.session.execute(stmt)
+        return
+    for row in rows:
+        existing = model.query.filter_by(**{k: row[k] for k in key_columns}) \
+            .execution_options(all_tenants=True).with_for_update().first()
+        if existing is None:
+            db.session.add(model(**row))
+        else:
+            for status in STATUSES:
+                setattr(existing, status, getattr(existing, status) + row[status])
+
+
+def apply_attendance_changes(changes):
+    """Fold attendance changes into the rollups, in the caller's transaction.
+
+    `changes` is an iterable of (tenant_id, student_id, class_id, date,
+    status, delta) with delta +1 for a row that now counts and -1 for one
+    that no longer does.
+    """
+    monthly = defaultdict(lambda: dict.fromkeys(STATUSES, 0))
+    daily = defaultdict(lambda: dict.fromkeys(STATUSES, 0))
+    for tenant_id, student_id, class_id, day, status, delta in changes:
+        if status not in STATUSES or day is None:
+            continue
+        monthly[(tenant_id, student_id, class_id, month_start(day))][status] += delta
+        daily[(tenant_id, class_id, day)][status] += delta
+
+    monthly_rows = [
+        {'tenant_id': t, 'student_id': s, 'class_id': c, 'month': m, **counts}
+        for (t, s, c, m), counts in monthly.items() if any(counts.values())
+    ]
+    daily_rows = [
+        {'tenant_id': t, 'class_id': c, 'date': d, **counts}
+        for (t, c, d), counts in daily.items() if any(counts.values())
+    ]
+    if monthly_rows:
+        _upsert_counts(AttendanceMonthly, ['student_id', 'class_id', 'month'], monthly_rows)
+    if daily_rows:
+        _upsert_counts(AttendanceClassDaily, ['class_id', 'date'], daily_rows)
+
+
+def _status_sums(status_column):
+    return [func.sum(case((status_column == status, 1), else_=0)).label(status) for status in STATUSES]
+
+
+def _month_of(date_column):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return cast(func.date_trunc('month', date_column), db.Date)
+    return func.date(date_column, 'start of month')
+
+
+def rebuild_attendance_rollups(since=None, until=None):
+    """Recompute the rollups for months [since, until) from attendance.
+
+    Defaults to every month from the oldest attendance row onwards, leaving
+    the rollups of already archived months alone. Returns the number of
+    monthly rows written.
+    """
+    if since is None:
+        oldest = db.session.execute(
+            select(func.min(Attendance.date)).execution_options(all_tenants=True)
+        ).scalar()
+        if oldest is None:
+            return 0
+        since = oldest
+    since = month_start(since)
+    in_range = [Attendance.date >= since]
+    monthly_range = [AttendanceMonthly.month >= since]
+    daily_range = [AttendanceClassDaily.date >= since]
+    if until is not None:
+        until = month_start(until)
+        in_range.append(Attendance.date < until)
+        monthly_range.append(AttendanceMonthly.month < until)
+        daily_range.append(AttendanceClassDaily.date < until)
+    counted = Attendance.status.in_(STATUSES)
+    options = {'all_tenants': True, 'synchronize_session': False}
+
+    db.session.execute(delete(AttendanceMonthly).where(*monthly_range), execution_options=options)
+    db.session.execute(delete(AttendanceClassDaily).where(*daily_range), execution_options=options)
+    month = _month_of(Attendance.date)
+    written = db.session.execute(insert(AttendanceMonthly).from_select(
+        ['tenant_id', 'student_id', 'class_id', 'month', *STATUSES],
+        select(Attendance.tenant_id, Attendance.student_id, Attendance.class_id, month,
+               *_status_sums(Attendance.status))
+        .where(*in_range, counted)
+        .group_by(Attendance.tenant_id, Attendance.student_id, Attendance.class_id, month),
+    ), execution_options={'all_tenants': True}).rowcount
+    db.session.execute(insert(AttendanceClassDaily).from_select(
+        ['tenant_id', 'class_id', 'date', *STATUSES],
+        select(Attendance.tenant_id, Attendance.class_id, Attendance.date, *_status_sums(Attendance.status))
+        .where(*in_range, counted)
+        .group_by(Attendance.tenant_id, Attendance.class_id, Attendance.date),
+    ), execution_options={'all_tenants': True})
+    db.session.commit()
+    return written
+
+
+def _split_range(date_from, date_to):
+    """Split [date_from, date_to] into whole months and raw edge ranges.
+
+    Returns ((first_month, end_month) or None, [(start, end)...]) where the
+    month range is half-open and edge ranges are inclusive; None bounds are
+    open-ended. Bounds before the archive cutoff are widened to whole months,
+    since attendance there may have been archived.
+    """
+    cutoff = hot_cutoff()
+    if date_from is not None and date_from < cutoff:
+        date_from = month_start(date_from)
+    if date_to is not None and date_to < cutoff:
+        date_to = next_month(date_to) - timedelta(days=1)
+    first = date_from if date_from is None or date_from.day == 1 else next_month(date_from)
+    end = None if date_to is None else month_start(date_to + timedelta(days=1))
+    if first is not None and end is not None and first >= end:
+        return None, [(date_from, date_to)]
+    edges = []
+    if date_from is not None and first != date_from:
+        edges.append((date_from, first - timedelta(days=1)))
+    if date_to is not None and end != date_to + timedelta(days=1):
+        edges.append((end, date_to))
+    return (first, end), edges
+
+
+def _rate_row(key, counts):
+    total = sum(counts.values())
+    return {
+        **key,
+        **counts,
+        'total': total,
+        'rate': round((counts['present'] + counts['late']) / total, 4) if total else None,
+    }
+
+
+def attendance_counts_by_student(date_from=None, date_to=None, class_id=None):
+    """One SELECT of (class_id, student_id, present, absent, late) over a date range.
+
+    Whole months come from attendance_monthly and partial edge months from
+    attendance (see `_split_range`), combined in SQL so callers can stream
+    the result.
+    """
+    months, edges = _split_range(date_from, date_to)
+    parts = []
+    if months is not None:
+        query = select(AttendanceMonthly.class_id, AttendanceMonthly.student_id,
+                       *(getattr(AttendanceMonthly, s).label(s) for s in STATUSES))
+        if class_id is not None:
+            query = query.where(AttendanceMonthly.class_id == class_id)
+        if months[0] is not None:
+            query = query.where(AttendanceMonthly.month >= months[0])
+        if months[1] is not None:
+            query = query.where(AttendanceMonthly.month < months[1])
+        parts.append(query)
+    for start, end in edges:
+        query = select(Attendance.class_id, Attendance.student_id, *_status_sums(Attendance.status)) \
+            .where(Attendance.date >= start, Attendance.date <= end)
+        if class_id is not None:
+            query = query.where(Attendance.class_id == class_id)
+        parts.append(query.group_by(Attendance.class_id, Attendance.student_id))
+    combined = (union_all(*parts) if len(parts) > 1 else parts[0]).subquery()
+    return select(combined.c.class_id, combined.c.student_id,
+                  *(func.sum(combined.c[s]).label(s) for s in STATUSES)) \
+        .group_by(combined.c.class_id, combined.c.student_id)
+
+
+def attendance_rates(group_by, date_from=None, date_to=None, class_id=None, student_id=None):
+    """Attendance counts and rates for the current tenant, grouped by student, class or day.
+
+    `rate` is (present + late) / total. Day grouping is per class and
+    cannot be filtered by student. Student and class groupings count whole
+    months for range bounds before the archive cutoff (see `_split_range`).
+    """
+    if group_by not in GROUP_BY_CHOICES:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY_CHOICES)}")
+
+    if group_by == 'day':
+        if student_id is not None:
+            raise ValueError('student_id cannot be combined with group_by=day')
+        query = select(AttendanceClassDaily.date, *(func.sum(getattr(AttendanceClassDaily, s)).label(s)
+                                                   for s in STATUSES))
+        if class_id is not None:
+            query = query.where(AttendanceClassDaily.class_id == class_id)
+        if date_from is not None:
+            query = query.where(AttendanceClassDaily.date >= date_from)
+        if date_to is not None:
+            query = query.where(AttendanceClassDaily.date <= date_to)
+        rows = db.session.execute(query.group_by(AttendanceClassDaily.date).order_by(AttendanceClassDaily.date))
+        return [_rate_row({'date': row.date}, {s: row._mapping[s] for s in STATUSES}) for row in rows]
+
+    key_name = 'student_id' if group_by == 'student' else 'class_id'
+    totals = defaultdict(lambda: dict.fromkeys(STATUSES, 0))
+
+    def accumulate(rows):
+        for row in rows:
+            counts = totals[row[0]]
+            for status in STATUSES:
+                counts[status] += row._mapping[status] or 0
+
+    months, edges = _split_range(date_from, date_to)
+    if months is not None:
+        key = getattr(AttendanceMonthly, key_name)
+        query = select(key, *(func.sum(getattr(AttendanceMonthly, s)).label(s) for s in STATUSES))
+        if class_id is not None:
+            query = query.where(AttendanceMonthly.class_id == class_id)
+        if student_id is not None:
+            query = query.where(AttendanceMonthly.student_id == student_id)
+        if months[0] is not None:
+            query = query.where(AttendanceMonthly.month >= months[0])
+        if months[1] is not None:
+            query = query.where(AttendanceMonthly.month < months[1])
+        accumulate(db.session.execute(query.group_by(key)))
+
+    key = getattr(Attendance, key_name)
+    for start, end in edges:
+        query = select(key, *_status_sums(Attendance.status)) \
+            .where(Attendance.date >= start, Attendance.date <= end)
+        if class_id is not None:
+            query = query.where(Attendance.class_id == class_id)
+        if student_id is not None:
+            query = query.where(Attendance.student_id == student_id)
+        accumulate(db.session.execute(query.group_by(key)))
+
+    return [_rate_row({key_name: k}, totals[k]) for k in sorted(totals, key=lambda k: (k is None, k))]
@@ -2,7 +2,11 @@ from flask import Blueprint, request
 from typing import cast
 from models import Attendance
 from services import AttendanceService
-from utils import success_response, error_response, admin_required
+from serializers import ATTENDANCE, dumps_bytes
+from utils import (
+    success_response, error_response, admin_required, teacher_required, get_page_args, get_date_arg,
+    get_int_arg, stream_export,
+)
 
 attendance_bp = Blueprint('attendance', __name__)
 
@@ -17,27 +21,112 @@ def create_attendance():
     attendance = cast(Attendance, attendance)
     return success_response({
         'message': 'Attendance record created successfully',
-        'attendance': {
-            'id': attendance.id,
-            'class_id': attendance.class_id,
-            'student_id': attendance.student_id,
-            'status': attendance.status
-        }
+        'attendance': ATTENDANCE.dump(attendance)
     }, 201)
 
 
+@attendance_bp.route('/attendance/roll-call', methods=['POST'])
+@teacher_required
+def record_roll_call():
+    data = request.get_json() or {}
+    count = AttendanceService.record_roll_call(data)
+    if isinstance(count, tuple):  # If it's an error response
+        return count
+    return success_response({
+        'message': 'Roll call recorded successfully',
+        'class_id': data['class_id'],
+        'date': data['date'],
+        'recorded': count
+    })
+
+
 @attendance_bp.route('/attendance', methods=['GET'])
 @admin_required
 def get_all_attendance():
-    attendance_records = AttendanceService.get_all_attendance()
-    return success_response({
-        'attendance': [{
-            'id': attendance.id,
-            'class_id': attendance.class_id,
-            'student_id': attendance.student_id,
-            'status': attendance.status
-        } for attendance in attendance_records]
-    })
+    try:
+        limit, after = get_page_args()
+        class_id = get_int_arg('class_id')
+        student_id = get_int_arg('student_id')
+        date_from = get_date_arg('date_from')
+        date_to = get_date_arg('date_to')
+    except ValueError as e:
+        return error_response(str(e), 400)
+    attendance_records, next_cursor = AttendanceService.get_all_attendance(
+        limit, after,
+        class_id=class_id,
+        student_id=student_id,
+        date_from=date_from,
+        date_to=date_to,
+        columns=ATTENDANCE.columns,
+    )
+    return success_response(dumps_bytes({
+        'attendance': ATTENDANCE.dump_rows(attendance_records),
+        'next_cursor': next_cursor
+    }))
+
+
+@attendance_bp.route('/attendance/export', methods=['GET'])
+@admin_required
+def export_attendance():
+    try:
+        rows = AttendanceService.export_attendance(
+            class_id=get_int_arg('class_id'),
+            student_id=get_int_arg('student_id'),
+            date_from=get_date_arg('date_from'),
+            date_to=get_date_arg('date_to'),
+        )
+        return stream_export(
+            rows, ('id', 'student_id', 'class_id', 'date', 'status'),
+            'attendance', request.args.get('format', 'csv'),
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+
+@attendance_bp.route('/attendance/analytics', methods=['GET'])
+@admin_required
+def get_attendance_analytics():
+    """Attendance counts and rates per student, class or day over a date range."""
+    group_by = request.args.get('group_by', 'student')
+    try:
+        rates = AttendanceService.get_attendance_rates(
+            group_by,
+            date_from=get_date_arg('date_from'),
+            date_to=get_date_arg('date_to'),
+            class_id=get_int_arg('class_id'),
+            student_id=get_int_arg('student_id'),
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+    return success_response({'group_by': group_by, 'rates': rates})
+
+
+@attendance_bp.route('/attendance/archive', methods=['GET'])
+@admin_required
+def get_archived_attendance():
+    """List archived school years, or stream one year (`year`) with the export filters."""
+    try:
+        year = get_int_arg('year')
+    except ValueError as e:
+        return error_response(str(e), 400)
+    if year is None:
+        return success_response({'school_years': AttendanceService.get_archived_years()})
+    if year not in AttendanceService.get_archived_years():
+        return error_response('No archived attendance for that school year', 404)
+    try:
+        rows = AttendanceService.export_archived_attendance(
+            year,
+            class_id=get_int_arg('class_id'),
+            student_id=get_int_arg('student_id'),
+            date_from=get_date_arg('date_from'),
+            date_to=get_date_arg('date_to'),
+        )
+        return stream_export(
+            rows, ('id', 'student_id', 'class_id', 'date', 'status'),
+            f'attendance-{year}', request.args.get('format', 'csv'),
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
 
 
 @attendance_bp.route('/attendance/<int:attendance_id>', methods=['GET'])
@@ -48,12 +137,7 @@ def get_attendance(attendance_id):
         return error_response('Attendance record not found', 404)
     attendance = cast(Attendance, attendance)
     return success_response({
-        'attendance': {
-            'id': attendance.id,
-            'class_id': attendance.class_id,
-            'student_id': attendance.student_id,
-            'status': attendance.status
-        }
+        'attendance': ATTENDANCE.dump(attendance)
     })
 
 
@@ -64,15 +148,12 @@ def update_attendance():
     attendance = AttendanceService.update_attendance(data)
     if isinstance(attendance, tuple):  # If it's an error response
         return attendance
+    if not attendance:
+        return error_response('Attendance record not found', 404)
     attendance = cast(Attendance, attendance)
     return success_response({
         'message': 'Attendance record updated successfully',
-        'attendance': {
-            'id': attendance.id,
-            'class_id': attendance.class_id,
-            'student_id': attendance.student_id,
-            'status': attendance.status
-        }
+        'attendance': ATTENDANCE.dump(attendance)
     })
 
 
@@ -3,7 +3,8 @@ from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identi
 from typing import cast
 from models import User
 from services import AuthService
-from utils import success_response, error_response, admin_required
+from serializers import USER, dumps_bytes
+from utils import success_response, error_response, admin_required, get_page_args, get_int_arg
 
 
 auth_bp = Blueprint('auth', __name__)
@@ -18,13 +19,7 @@ def register():
     user = cast(User, user)
     return success_response({
         'message': 'User registered successfully',
-        'user': {
-            'id': user.id,
-            'email': user.email,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'user_type': user.user_type
-        }
+        'user': USER.dump(user)
     }, 201)
 
 
@@ -35,10 +30,10 @@ def login():
     password = data.get('password')
     if not email or not password:
         return error_response('Email and password are required', 400)
-    user = AuthService.authenticate_user(email, password)
+    user = AuthService.authenticate_user(email, password)  # HashingBusyError is a 503 (see app.py)
     if not user:
         return error_response('Invalid credentials', 401)
-    access_token = create_access_token(identity=user.id)
+    access_token = create_access_token(identity=user.id, additional_claims={'tenant_id': user.tenant_id})
     return success_response({
         'message': 'User logged in successfully',
         'access_token': access_token
@@ -48,8 +43,8 @@ def login():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    jti = get_jwt()['jti']  # Get JWT ID
-    AuthService.blacklist_token(jti)
+    claims = get_jwt()
+    AuthService.blacklist_token(claims['jti'], claims['exp'])
     return success_response({'message': 'User logged out successfully'})
 
 
@@ -57,7 +52,8 @@ def logout():
 @jwt_required(refresh=True)
 def refresh():
     current_user = get_jwt_identity()
-    access_token = create_access_token(identity=current_user)
+    access_token = create_access_token(identity=current_user,
+                                       additional_claims={'tenant_id': get_jwt().get('tenant_id')})
     return success_response({
         'message': 'Token refreshed successfully',
         'access_token': access_token
@@ -67,16 +63,17 @@ def refresh():
 @auth_bp.route('/users', methods=['GET'])
 @admin_required
 def get_all_users():
-    users = AuthService.get_all_users()
-    return success_response({'users': [
-        {
-            'id': u.id,
-            'email': u.email,
-            'first_name': u.first_name,
-            'last_name': u.last_name,
-            'user_type': u.user_type
-        } for u in users
-    ]})
+    try:
+        limit, after = get_page_args()
+        user_type = get_int_arg('user_type')
+    except ValueError as e:
+        return error_response(str(e), 400)
+    users, next_cursor = AuthService.get_all_users(
+        limit, after,
+        user_type=user_type,
+        columns=USER.columns,
+    )
+    return success_response(dumps_bytes({'users': USER.dump_rows(users), 'next_cursor': next_cursor}))
 
 
 @auth_bp.route('/user/<int:user_id>', methods=['DELETE'])
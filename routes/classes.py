@@ -2,11 +2,13 @@ from flask import Blueprint, request
 from typing import cast
 from models import Class
 from services import ClassService
-from utils import success_response, error_response, admin_required
+from serializers import CLASS, dumps_bytes
+from utils import (
+    success_response, error_response, admin_required, conditional_get, get_page_args, get_int_arg,
+)
 
 classes_bp = Blueprint('classes', __name__)
 
-
 @classes_bp.route('/classes', methods=['POST'])
 @admin_required
 def create_class():
@@ -17,43 +19,42 @@ def create_class():
     class_ = cast(Class, class_)
     return success_response({
         'message': 'Class created successfully',
-        'class': {
-            'id': class_.id,
-            'course_id': class_.course_id,
-            'teacher_id': class_.teacher_id,
-            'schedule': class_.schedule
-        }
+        'class': CLASS.dump(class_)
     }, 201)
 
 
 @classes_bp.route('/classes', methods=['GET'])
 @admin_required
+@conditional_get('classes')
 def get_all_classes():
-    classes = ClassService.get_all_classes()
-    return success_response({
-        'classes': [{
-            'id': class_.id,
-            'course_id': class_.course_id,
-            'teacher_id': class_.teacher_id,
-            'schedule': class_.schedule
-        } for class_ in classes]
-    })
+    try:
+        limit, after = get_page_args()
+        course_id = get_int_arg('course_id')
+        teacher_id = get_int_arg('teacher_id')
+    except ValueError as e:
+        return error_response(str(e), 400)
+    classes, next_cursor = ClassService.get_all_classes(
+        limit, after,
+        course_id=course_id,
+        teacher_id=teacher_id,
+        options=CLASS.load_options,
+    )
+    return success_response(dumps_bytes({
+        'classes': CLASS.dump_many(classes),
+        'next_cursor': next_cursor
+    }))
 
 
 @classes_bp.route('/class/<int:class_id>', methods=['GET'])
 @admin_required
+@conditional_get('classes')
 def get_class(class_id):
-    class_ = ClassService.get_class_by_id(class_id)
+    class_ = ClassService.get_class_by_id(class_id, options=CLASS.load_options)
     if not class_:
         return error_response('Class not found', 404)
     class_ = cast(Class, class_)
     return success_response({
-        'class': {
-            'id': class_.id,
-            'course_id': class_.course_id,
-            'teacher_id': class_.teacher_id,
-            'schedule': class_.schedule
-        }
+        'class': CLASS.dump(class_)
     })
 
 
@@ -67,12 +68,7 @@ def update_class():
     class_ = cast(Class, class_)
     return success_response({
         'message': 'Class updated successfully',
-        'class': {
-            'id': class_.id,
-            'course_id': class_.course_id,
-            'teacher_id': class_.teacher_id,
-            'schedule': class_.schedule
-        }
+        'class': CLASS.dump(class_)
     })
 
 
@@ -2,7 +2,8 @@ from flask import Blueprint, request
 from typing import cast
 from models import Course
 from services import CourseService
-from utils import success_response, error_response, admin_required
+from serializers import COURSE, dumps_bytes
+from utils import success_response, error_response, admin_required, conditional_get, get_page_args
 
 courses_bp = Blueprint('courses', __name__)
 
@@ -17,40 +18,35 @@ def create_course():
     course = cast(Course, course)
     return success_response({
         'message': 'Course created successfully',
-        'course': {
-            'id': course.id,
-            'name': course.name,
-            'description': course.description
-        }
+        'course': COURSE.dump(course)
     }, 201)
 
 
 @courses_bp.route('/courses', methods=['GET'])
 @admin_required
+@conditional_get('courses')
 def get_all_courses():
-    courses = CourseService.get_all_courses()
-    return success_response({
-        'courses': [{
-            'id': course.id,
-            'name': course.name,
-            'description': course.description
-        } for course in courses]
-    })
+    try:
+        limit, after = get_page_args()
+    except ValueError as e:
+        return error_response(str(e), 400)
+    courses, next_cursor = CourseService.get_all_courses(limit, after, columns=COURSE.columns)
+    return success_response(dumps_bytes({
+        'courses': COURSE.dump_rows(courses),
+        'next_cursor': next_cursor
+    }))
 
 
 @courses_bp.route('/course/<int:course_id>', methods=['GET'])
 @admin_required
+@conditional_get('courses')
 def get_course(course_id):
     course = CourseService.get_course_by_id(course_id)
     if not course:
         return error_response('Course not found', 404)
     course = cast(Course, course)
     return success_response({
-        'course': {
-            'id': course.id,
-            'name': course.name,
-            'description': course.description
-        }
+        'course': COURSE.dump(course)
     })
 
 
@@ -64,11 +60,7 @@ def update_course():
     course = cast(Course, course)
     return success_response({
         'message': 'Course updated successfully',
-        'course': {
-            'id': course.id,
-            'name': course.name,
-            'description': course.description
-        }
+        'course': COURSE.dump(course)
     })
 
 
@@ -1,12 +1,18 @@
+import csv
+import io
 from flask import Blueprint, request
 from typing import cast
 from models import Grade
 from services import GradeService
-from utils import success_response, error_response, admin_required
+from serializers import GRADE, dumps_bytes
+from grade_stats import GradeStatsUnavailable
+from utils import (
+    success_response, error_response, admin_required, teacher_required, get_page_args, get_int_arg,
+    stream_export,
+)
 
 grades_bp = Blueprint('grades', __name__)
 
-
 @grades_bp.route('/grades', methods=['POST'])
 @admin_required
 def create_grade():
@@ -17,43 +23,113 @@ def create_grade():
     grade = cast(Grade, grade)
     return success_response({
         'message': 'Grade record created successfully',
-        'grade': {
-            'id': grade.id,
-            'student_id': grade.student_id,
-            'course_id': grade.course_id,
-            'value': grade.value
-        }
+        'grade': GRADE.dump(grade)
     }, 201)
 
 
+@grades_bp.route('/grades/bulk', methods=['POST'])
+@teacher_required
+def bulk_create_grades():
+    """Ingest a gradebook sent as a JSON array or a CSV upload (`file` field)."""
+    upload = request.files.get('file')
+    if upload:
+        rows = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+    else:
+        data = request.get_json(silent=True)
+        rows = data.get('grades') if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            return error_response('Expected a JSON array of grades or a CSV file upload', 400)
+    report = GradeService.bulk_create_grades(rows)
+    return success_response({
+        'message': f"{report['inserted']} grade records created",
+        **report
+    }, 201 if report['inserted'] else 200)
+
+
 @grades_bp.route('/grades', methods=['GET'])
 @admin_required
 def get_all_grades():
-    grades = GradeService.get_all_grades()
-    return success_response({
-        'grades': [{
-            'id': grade.id,
-            'student_id': grade.student_id,
-            'course_id': grade.course_id,
-            'value': grade.value
-        } for grade in grades]
-    })
+    try:
+        limit, after = get_page_args()
+        student_id = get_int_arg('student_id')
+        course_id = get_int_arg('course_id')
+    except ValueError as e:
+        return error_response(str(e), 400)
+    grades, next_cursor = GradeService.get_all_grades(
+        limit, after,
+        student_id=student_id,
+        course_id=course_id,
+        term=request.args.get('term'),
+        options=GRADE.load_options,
+    )
+    return success_response(dumps_bytes({
+        'grades': GRADE.dump_many(grades),
+        'next_cursor': next_cursor
+    }))
+
+
+@grades_bp.route('/grades/stats', methods=['GET'])
+@teacher_required
+def get_grade_stats():
+    """Mean, median, stddev, percentiles, histogram and percentile ranks for a course and term."""
+    try:
+        course_id = get_int_arg('course_id')
+    except ValueError as e:
+        return error_response(str(e), 400)
+    term = request.args.get('term')
+    if course_id is None or not term:
+        return error_response('course_id and term are required', 400)
+    try:
+        stats = GradeService.get_course_term_stats(course_id, term)
+    except GradeStatsUnavailable as e:
+        return error_response(str(e), 503)
+    return success_response(stats)
+
+
+@grades_bp.route('/grades/gpa', methods=['GET'])
+@teacher_required
+def get_term_gpa():
+    """Per-student 4.0-scale GPA for a term, optionally for one `student_id`."""
+    term = request.args.get('term')
+    if not term:
+        return error_response('term is required', 400)
+    try:
+        student_id = get_int_arg('student_id')
+    except ValueError as e:
+        return error_response(str(e), 400)
+    try:
+        gpa = GradeService.get_term_gpa(term, student_id)
+    except GradeStatsUnavailable as e:
+        return error_response(str(e), 503)
+    return success_response(gpa)
+
+
+@grades_bp.route('/grades/export', methods=['GET'])
+@admin_required
+def export_grades():
+    try:
+        rows = GradeService.export_grades(
+            student_id=get_int_arg('student_id'),
+            course_id=get_int_arg('course_id'),
+            term=request.args.get('term'),
+        )
+        return stream_export(
+            rows, ('id', 'student_id', 'course_id', 'term', 'value'),
+            'grades', request.args.get('format', 'csv'),
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
 
 
 @grades_bp.route('/grade/<int:grade_id>', methods=['GET'])
 @admin_required
 def get_grade(grade_id):
-    grade = GradeService.get_grade_by_id(grade_id)
+    grade = GradeService.get_grade_by_id(grade_id, options=GRADE.load_options)
     if not grade:
         return error_response('Grade record not found', 404)
     grade = cast(Grade, grade)
     return success_response({
-        'grade': {
-            'id': grade.id,
-            'student_id': grade.student_id,
-            'course_id': grade.course_id,
-            'value': grade.value
-        }
+        'grade': GRADE.dump(grade)
     })
 
 
@@ -67,12 +143,7 @@ def update_grade():
     grade = cast(Grade, grade)
     return success_response({
         'message': 'Grade record updated successfully',
-        'grade': {
-            'id': grade.id,
-            'student_id': grade.student_id,
-            'course_id': grade.course_id,
-            'value': grade.value
-        }
+        'grade': GRADE.dump(grade)
     })
 
 
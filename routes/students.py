@@ -2,11 +2,11 @@ from flask import Blueprint, request
 from typing import cast
 from models import Student
 from services import StudentService
-from utils import success_response, error_response, admin_required
+from serializers import STUDENT, dumps_bytes
+from utils import success_response, error_response, admin_required, get_page_args, get_int_arg
 
 students_bp = Blueprint('students', __name__)
 
-
 @students_bp.route('/students', methods=['POST'])
 @admin_required
 def create_student():
@@ -17,43 +17,38 @@ def create_student():
     student = cast(Student, student)
     return success_response({
         'message': 'Student created successfully',
-        'student': {
-            'id': student.id,
-            'first_name': student.first_name,
-            'last_name': getattr(student, 'last_name', None),
-            'email': student.email
-        }
+        'student': STUDENT.dump(student)
     }, 201)
 
 
 @students_bp.route('/students', methods=['GET'])
 @admin_required
 def get_all_students():
-    students = StudentService.get_all_students()
-    return success_response({
-        'students': [{
-            'id': student.id,
-            'first_name': student.first_name,
-            'last_name': student.last_name,
-            'email': student.email
-        } for student in students]
-    })
+    try:
+        limit, after = get_page_args()
+        class_id = get_int_arg('class_id')
+    except ValueError as e:
+        return error_response(str(e), 400)
+    students, next_cursor = StudentService.get_all_students(
+        limit, after,
+        class_id=class_id,
+        options=STUDENT.load_options,
+    )
+    return success_response(dumps_bytes({
+        'students': STUDENT.dump_many(students),
+        'next_cursor': next_cursor
+    }))
 
 
 @students_bp.route('/student/<int:student_id>', methods=['GET'])
 @admin_required
 def get_student(student_id):
-    student = StudentService.get_student_by_id(student_id)
+    student = StudentService.get_student_by_id(student_id, options=STUDENT.load_options)
     if not student:
         return error_response('Student not found', 404)
     student = cast(Student, student)
     return success_response({
-        'student': {
-            'id': student.id,
-            'first_name': student.first_name,
-            'last_name': student.last_name,
-            'email': student.email
-        }
+        'student': STUDENT.dump(student)
     })
 
 
@@ -70,12 +65,7 @@ def update_student():
     student = cast(Student, student)
     return success_response({
         'message': 'Student updated successfully',
-        'student': {
-            'id': student.id,
-            'first_name': student.first_name,
-            'last_name': student.last_name,
-            'email': student.email
-        }
+        'student': STUDENT.dump(student)
     })
 
 
@@ -1,12 +1,19 @@
-from flask import Blueprint, request
-from flask_jwt_extended import jwt_required
+import os
+import uuid
+from flask import Blueprint, Response, current_app, request, send_from_directory, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from celery import states
+from celery.backends.base import BaseKeyValueStoreBackend
 
-from utils import success_response, error_response
+from utils import success_response, error_response, admin_required, teacher_required
+from tenancy import current_tenant_id
 
 
 # The tasks blueprint only deals with queuing and checking Celery jobs.
 tasks_bp = Blueprint('tasks', __name__)
 
+MAX_BATCH_TASK_IDS = 500
+
 
 @tasks_bp.route('/test-email', methods=['POST'])
 @jwt_required()
@@ -31,42 +38,244 @@ def test_email_task():
     })
 
 
-@tasks_bp.route('/task-status/<task_id>', methods=['GET'])
-@jwt_required()
-def get_task_status(task_id):
-    """Return the state and result of a previously queued task."""
+@tasks_bp.route('/email-batch', methods=['POST'])
+@admin_required
+def email_batch_task():
+    """Queue one message per recipient, batched over pooled SMTP connections.
+
+    Accepts `messages` ([{recipient, subject, body}]) or `recipients` with a
+    shared `subject` and `body`.
+    """
+    from tasks import queue_email_batches
     from app import celery
+
+    if not celery:
+        return error_response('Celery not configured', 503)
+
+    data = request.get_json() or {}
+    messages = data.get('messages')
+    if messages is None:
+        messages = [
+            {'recipient': r, 'subject': data.get('subject', ''), 'body': data.get('body', '')}
+            for r in data.get('recipients') or []
+        ]
+    if not messages or not all(isinstance(m, dict) and m.get('recipient') for m in messages):
+        return error_response('messages (or recipients) with a recipient each are required', 400)
+
+    task_ids = queue_email_batches(messages)
+    return success_response({
+        'message': 'Email batches queued successfully',
+        'task_ids': task_ids,
+        'recipients': len(messages)
+    }, 202)
+
+
+@tasks_bp.route('/import-students', methods=['POST'])
+@admin_required
+def import_students_task():
+    """Upload a CSV/XLSX student roster and queue it for import."""
+    from tasks import process_bulk_data_import
+    from app import celery
+
     if not celery:
         return error_response('Celery not configured', 503)
 
-    result = celery.AsyncResult(task_id)
-    response = {
-        'task_id': task_id,
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return error_response('A CSV or XLSX file is required', 400)
+    extension = os.path.splitext(upload.filename)[1].lower()
+    if extension not in ('.csv', '.xlsx'):
+        return error_response('Only .csv and .xlsx files are supported', 400)
+
+    upload_dir = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f'{uuid.uuid4().hex}{extension}')
+    upload.save(path)
+
+    result = process_bulk_data_import.delay(path, get_jwt_identity(), current_tenant_id())
+    return success_response({
+        'message': 'Student import queued successfully',
+        'task_id': result.id
+    }, 202)
+
+
+def _status_record(result):
+    record = {
+        'task_id': result.id,
         'status': result.status,
         'current': result.info if result.state == 'PROGRESS' else None
     }
     if result.ready():
-        response['result'] = result.result
-    return success_response(response)
+        record['result'] = result.result
+    return record
 
 
-@tasks_bp.route('/test-report', methods=['POST'])
+@tasks_bp.route('/task-status/<task_id>', methods=['GET'])
+@jwt_required()
+def get_task_status(task_id):
+    """Return the state and result of a previously queued task."""
+    from app import celery
+    if not celery:
+        return error_response('Celery not configured', 503)
+
+    return success_response(_status_record(celery.AsyncResult(task_id)))
+
+
+def _task_metas(backend, task_ids):
+    """Result-backend meta of each task; a single MGET on key/value backends such as Redis."""
+    if isinstance(backend, BaseKeyValueStoreBackend):
+        keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+        try:
+            values = backend.mget(keys)
+        except NotImplementedError:
+            values = None
+        if hasattr(values, 'items'):  # Some clients return a mapping of the keys found
+            values = [values.get(key) for key in keys]
+        if values is not None:
+            return [backend.decode_result(v) if v else {'status': states.PENDING, 'result': None} for v in values]
+    return [backend.get_task_meta(task_id) for task_id in task_ids]
+
+
+def _compact_status_record(task_id, meta, include_result):
+    record = {'task_id': task_id, 'status': meta['status']}
+    if meta['status'] == 'PROGRESS':
+        record['current'] = meta['result']
+    elif include_result and meta['status'] in states.READY_STATES:
+        result = meta['result']
+        record['result'] = str(result) if isinstance(result, BaseException) else result
+    return record
+
+
+@tasks_bp.route('/task-status', methods=['POST'])
 @jwt_required()
+def get_task_statuses():
+    """Return the state of up to MAX_BATCH_TASK_IDS tasks (`task_ids`) in one call.
+
+    Results of finished tasks are left out unless `include_result` is true.
+    """
+    from app import celery
+    if not celery:
+        return error_response('Celery not configured', 503)
+
+    data = request.get_json() or {}
+    task_ids = data.get('task_ids')
+    if not isinstance(task_ids, list) or not all(isinstance(t, str) and t for t in task_ids):
+        return error_response('task_ids must be a list of task ids', 400)
+    task_ids = list(dict.fromkeys(task_ids))
+    if len(task_ids) > MAX_BATCH_TASK_IDS:
+        return error_response(f'At most {MAX_BATCH_TASK_IDS} task_ids per request', 400)
+
+    include_result = bool(data.get('include_result'))
+    metas = _task_metas(celery.backend, task_ids) if task_ids else []
+    return success_response({
+        'tasks': [_compact_status_record(t, meta, include_result) for t, meta in zip(task_ids, metas)]
+    })
+
+
+@tasks_bp.route('/task-events/<task_id>', methods=['GET'])
+@jwt_required()
+def stream_task_events(task_id):
+    """Stream a task's state changes as Server-Sent Events until it finishes.
+
+    Each `data:` frame has the task-status payload; a final `end` event
+    marks completion. Answers 503 with Retry-After while this worker already
+    holds TASK_EVENTS_MAX_STREAMS streams.
+    """
+    from task_events import task_event_stream
+    from app import celery
+    if not celery:
+        return error_response('Celery not configured', 503)
+    streams = current_app.extensions['task_event_streams']
+    if not streams.acquire(blocking=False):
+        body, status = error_response('Too many open task event streams, poll task-status instead', 503)
+        return body, status, {'Retry-After': str(current_app.config.get('TASK_EVENTS_HEARTBEAT', 15))}
+
+    def current_state():
+        record = _status_record(celery.AsyncResult(task_id))
+        if isinstance(record.get('result'), BaseException):
+            record['result'] = str(record['result'])
+        return record
+
+    response = Response(
+        stream_with_context(task_event_stream(task_id, current_state)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    # the server closes the response when the stream ends or the client
+    # leaves, after the request context is gone
+    response.call_on_close(streams.release)
+    return response
+
+
+REPORT_TENANT_REQUIRED = 'Reports are per tenant; send X-Tenant-ID'
+
+
+@tasks_bp.route('/test-report', methods=['POST'])
+@teacher_required
 def test_report_task():
-    """Queue a report generation task."""
+    """Queue a report generation task (`report_type`, `parameters`, `format`).
+
+    An identical report that is already generated is returned at once, and
+    one that is still being generated returns the running task's id.
+    """
     from tasks import generate_report
+    from reports import REPORT_FORMATS, get_report_type
+    from report_cache import cached_report, claim_report, report_cache_key
     from app import celery
 
+    if current_tenant_id() is None:
+        return error_response(REPORT_TENANT_REQUIRED, 400)
     if not celery:
         return error_response('Celery not configured', 503)
 
     data = request.get_json() or {}
-    report_type = data.get('report_type', 'summary')
-    parameters = data.get('parameters', {})
+    report_type = data.get('report_type', 'class_roster')
+    output_format = data.get('format', 'csv')
+    if output_format not in REPORT_FORMATS:
+        return error_response(f"format must be one of: {', '.join(REPORT_FORMATS)}", 400)
+    try:
+        parameters = get_report_type(report_type).normalize(data.get('parameters') or {})
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    key = report_cache_key(report_type, parameters, output_format)
+    filename = cached_report(key, output_format)
+    if filename:
+        return success_response({
+            'message': 'Report already generated',
+            'cached': True,
+            'report_type': report_type,
+            'file': filename,
+            'url': f'/api/tasks/reports/{filename}',
+        })
+
+    task_id = uuid.uuid4().hex
+    running = claim_report(key, task_id, lambda holder: celery.AsyncResult(holder).ready())
+    if running:
+        return success_response({
+            'message': 'Identical report is already being generated',
+            'task_id': running,
+            'report_type': report_type
+        })
 
-    result = generate_report.delay(report_type, parameters)
+    result = generate_report.apply_async(
+        (report_type, parameters, output_format, current_tenant_id(), key), task_id=task_id,
+    )
     return success_response({
         'message': 'Report generation task queued successfully',
         'task_id': result.id,
         'report_type': report_type
-    })
\ No newline at end of file
+    })
+
+
+@tasks_bp.route('/reports/<filename>', methods=['GET'])
+@teacher_required
+def download_report(filename):
+    """Download a generated report of the current tenant."""
+    from reports import report_dir
+
+    tenant_id = current_tenant_id()
+    if tenant_id is None:
+        return error_response(REPORT_TENANT_REQUIRED, 400)
+    # send_from_directory refuses names resolving outside the tenant's directory
+    return send_from_directory(report_dir(tenant_id), filename, as_attachment=True)
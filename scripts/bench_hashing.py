@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Measure login throughput per core with inline and pooled password hashing.
+
+Seeds a SQLite database with one user, then has concurrent clients call
+POST /api/auth/login through the Flask test client for a fixed time, once
+hashing inline on the request threads and once on the process pool, and
+prints logins per second, per core, the 503s from a full hashing queue and
+p95 latency. The pool gets this process's share of PASSWORD_HASH_WORKERS,
+as one of --web-concurrency gunicorn workers would.
+
+    python scripts/bench_hashing.py
+    python scripts/bench_hashing.py --clients 32 --seconds 10 --web-concurrency 2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--web-concurrency', type=int, default=1, help='gunicorn workers sharing the cores')
+    parser.add_argument('--method', default=None, help='PASSWORD_HASH_METHOD (default: configured)')
+    return parser.parse_args()
+
+
+def run(app, clients, seconds):
+    """Log in from `clients` threads for `seconds`; returns (ok, busy, latencies)."""
+    ok = busy = 0
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client_loop():
+        nonlocal ok, busy
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            response = client.post('/api/auth/login', json={'email': 'bench@example.com', 'password': 'password'})
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code == 200:
+                    ok += 1
+                    latencies.append(elapsed)
+                elif response.status_code == 503:
+                    busy += 1
+                else:
+                    raise RuntimeError(f'Unexpected login response {response.status_code}')
+            if response.status_code == 503:
+                time.sleep(0.05)  # a real client backs off on 503 rather than spinning
+
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return ok, busy, sorted(latencies)
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'SQLALCHEMY_REPLICA_URIS': '',
+        'REDIS_URL': '',
+        'WEB_CONCURRENCY': str(args.web_concurrency),
+    })
+    if args.method:
+        os.environ['PASSWORD_HASH_METHOD'] = args.method
+
+    from app import app
+    from hashing import init_hashing
+    from models import db, Tenant, User
+
+    app.config['JWT_VERIFY_SUB'] = False
+    cores = os.cpu_count() or 1
+    with app.app_context():
+        db.create_all()
+        db.session.add(Tenant(id=1, name='Bench School', schema_name='bench'))
+        user = User(email='bench@example.com', user_type=1, tenant_id=1)
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+
+    print(f'{cores} cores, {args.web_concurrency} gunicorn worker(s), {args.clients} clients, '
+          f'{app.config["PASSWORD_HASH_METHOD"]}')
+    for label, workers in (('inline', 0), ('pool', app.config['PASSWORD_HASH_WORKERS'])):
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        pool = init_hashing(app)
+        run(app, 1, 0.5)  # start the pool's processes
+        ok, busy, latencies = run(app, args.clients, args.seconds)
+        rate = ok / args.seconds
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float('nan')
+        print(f'{label:>6}: {pool.processes} hashing processes, {rate:8.1f} logins/s, '
+              f'{rate / cores:7.1f} logins/s/core, {busy} busy (503), p95 {p95:.0f} ms')
+        if pool.executor() is not None:
+            pool.executor().shutdown()
+
+
+if __name__ == '__main__':
+    main()
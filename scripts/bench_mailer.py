@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Measure email throughput: one SMTP connection per message vs the pooled batch mailer.
+
+Starts a local aiosmtpd server that accepts and counts messages, optionally
+adding latency to each connection handshake to mimic a remote relay, then
+sends the same messages both ways and prints messages per second.
+
+    pip install aiosmtpd
+    python scripts/bench_mailer.py
+    python scripts/bench_mailer.py --messages 5000 --handshake-latency 0.05 --pool-size 8
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--domains', type=int, default=5, help='distinct recipient domains')
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--burst-size', type=int, default=100)
+    parser.add_argument('--handshake-latency', type=float, default=0.02,
+                        help='seconds added to every EHLO, as a remote relay would')
+    parser.add_argument('--port', type=int, default=8025)
+    return parser.parse_args()
+
+
+class CountingHandler:
+    def __init__(self, latency):
+        self.latency = latency
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.latency)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += len(envelope.rcpt_tos)
+        return '250 Message accepted for delivery'
+
+
+def make_messages(count, domains):
+    return [{'recipient': f'parent{i}@school{i % domains}.example', 'subject': 'Grades posted',
+             'body': f'Grades for term are now available (#{i}).'} for i in range(count)]
+
+
+def send_unpooled(port, sender, messages):
+    from mailer import build_message
+    for message in messages:
+        with smtplib.SMTP('127.0.0.1', port) as conn:
+            conn.ehlo()
+            conn.send_message(build_message(sender, message))
+
+
+def send_batched(port, sender, messages, pool_size, burst_size):
+    from mailer import BatchMailer, DomainRateLimiter, SMTPConnectionPool
+    pool = SMTPConnectionPool('127.0.0.1', port, size=pool_size)
+    mailer = BatchMailer(pool, DomainRateLimiter(0), sender, burst_size)
+    try:
+        result = mailer.send(messages)
+    finally:
+        mailer.close()
+    if result['failed']:
+        sys.exit(f"{len(result['failed'])} messages failed: {result['failed'][0]}")
+    return pool.opened
+
+
+def timed(label, handler, count, send):
+    before = handler.received
+    start = time.perf_counter()
+    extra = send()
+    elapsed = time.perf_counter() - start
+    delivered = handler.received - before
+    print(f'{label:<28} {delivered:>6} delivered in {elapsed:7.2f}s  {count / elapsed:9.1f} msg/s'
+          + (f'  ({extra} connections)' if extra is not None else ''))
+    return elapsed
+
+
+def main():
+    args = parse_args()
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit('aiosmtpd is required: pip install aiosmtpd')
+
+    handler = CountingHandler(args.handshake_latency)
+    controller = Controller(handler, hostname='127.0.0.1', port=args.port)
+    controller.start()
+    sender = 'no-reply@school.example'
+    messages = make_messages(args.messages, args.domains)
+    try:
+        unpooled = timed('connection per message', handler, len(messages),
+                         lambda: send_unpooled(args.port, sender, messages))
+        batched = timed(f'pooled (size {args.pool_size})', handler, len(messages),
+                        lambda: send_batched(args.port, sender, messages, args.pool_size, args.burst_size))
+    finally:
+        controller.stop()
+    print(f'speedup: {unpooled / batched:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
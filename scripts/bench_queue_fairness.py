@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Show email latency and tenant fairness under a bulk-job flood, before and after queue routing.
+
+Simulates the Celery workers in-process with scaled-down task durations:
+
+- shared: every task on one FIFO queue served by all worker processes (the
+  old single `celery worker`);
+- routed: queues and priorities from celery_app.task_routes, an email/default
+  worker and a bulk worker as in docker-compose.yml, and heavy jobs capped
+  per tenant by fairshare.InMemoryFairShare.
+
+One tenant floods the bulk queue with imports, two others queue a couple of
+reports shortly after, and transactional emails arrive at a steady rate
+throughout. Prints the email queue wait and each tenant's wait for its first
+heavy job to start.
+
+    python scripts/bench_queue_fairness.py
+    python scripts/bench_queue_fairness.py --flood 80 --job-seconds 0.1
+"""
+import argparse
+import heapq
+import itertools
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEAVY_TASKS = ('tasks.process_bulk_data_import', 'tasks.generate_report')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--flood', type=int, default=40, help='imports queued by the flooding tenant')
+    parser.add_argument('--job-seconds', type=float, default=0.2, help='duration of one heavy job')
+    parser.add_argument('--email-seconds', type=float, default=0.005, help='duration of one email')
+    parser.add_argument('--email-interval', type=float, default=0.01, help='seconds between emails')
+    parser.add_argument('--email-workers', type=int, default=4)
+    parser.add_argument('--bulk-workers', type=int, default=2)
+    parser.add_argument('--max-jobs', type=int, default=1, help='heavy jobs a tenant may run at once')
+    return parser.parse_args()
+
+
+class Broker:
+    """Named priority queues; a lower priority value is served first, as on the Redis transport."""
+
+    def __init__(self):
+        self._queues = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def put(self, queue, priority, job):
+        with self._cond:
+            heapq.heappush(self._queues.setdefault(queue, []), (priority, next(self._seq), job))
+            self._cond.notify_all()
+
+    def put_later(self, delay, queue, priority, job):
+        timer = threading.Timer(delay, self.put, (queue, priority, job))
+        timer.daemon = True
+        timer.start()
+
+    def get(self, queues):
+        with self._cond:
+            while True:
+                for name in queues:
+                    if self._queues.get(name):
+                        return heapq.heappop(self._queues[name])[2]
+                if self.closed:
+                    return None
+                self._cond.wait(0.05)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class Simulation:
+    def __init__(self, args, routes, fair_share):
+        self.args = args
+        self.routes = routes
+        self.fair_share = fair_share
+        self.broker = Broker()
+        self.email_waits = []
+        self.first_start = {}  # tenant -> seconds from its first enqueue to its first heavy job starting
+        self.first_enqueued = {}
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.done = threading.Event()
+        self.job_ids = itertools.count()
+
+    def route(self, name):
+        if self.routes is None:
+            return 'celery', 0
+        route = self.routes.get(name, {})
+        return route.get('queue', 'default'), route.get('priority', 5)
+
+    def enqueue(self, name, tenant, duration):
+        job = {'id': str(next(self.job_ids)), 'name': name, 'tenant': tenant, 'duration': duration,
+               'enqueued': time.perf_counter()}
+        with self.lock:
+            self.pending += 1
+            if name in HEAVY_TASKS:
+                self.first_enqueued.setdefault(tenant, job['enqueued'])
+        self.broker.put(*self.route(name), job)
+
+    def run_job(self, job):
+        started = time.perf_counter()
+        if job['name'] in HEAVY_TASKS:
+            if self.fair_share and not self.fair_share.acquire(str(job['tenant']), job['id']):
+                self.broker.put_later(self.args.job_seconds / 2, *self.route(job['name']), job)
+                return
+            with self.lock:
+                self.first_start.setdefault(job['tenant'], started - self.first_enqueued[job['tenant']])
+        elif job['name'] == 'tasks.send_email_notification':
+            with self.lock:
+                self.email_waits.append(started - job['enqueued'])
+        time.sleep(job['duration'])
+        if self.fair_share and job['name'] in HEAVY_TASKS:
+            self.fair_share.release(str(job['tenant']), job['id'])
+        with self.lock:
+            self.pending -= 1
+            if self.pending == 0:
+                self.done.set()
+
+    def worker(self, queues):
+        while (job := self.broker.get(queues)) is not None:
+            self.run_job(job)
+
+    def run(self, worker_groups):
+        threads = [threading.Thread(target=self.worker, args=(queues,), daemon=True)
+                   for queues, count in worker_groups for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        args = self.args
+        for _ in range(args.flood):
+            self.enqueue('tasks.process_bulk_data_import', 1, args.job_seconds)
+        time.sleep(args.job_seconds / 4)
+        for tenant in (2, 3):
+            for _ in range(2):
+                self.enqueue('tasks.generate_report', tenant, args.job_seconds)
+        emails = int(args.flood * args.job_seconds / args.bulk_workers / args.email_interval)
+        for i in range(emails):
+            self.enqueue('tasks.send_email_notification', 2 + i % 2, args.email_seconds)
+            time.sleep(args.email_interval)
+        self.done.wait()
+        self.broker.close()
+        for thread in threads:
+            thread.join()
+
+
+def report(label, sim):
+    waits = sorted(sim.email_waits)
+    p95 = waits[int(len(waits) * 0.95) - 1]
+    print(f'\n=== {label} ===')
+    print(f'email wait: p50 {statistics.median(waits) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms   '
+          f'max {waits[-1] * 1000:8.1f} ms   ({len(waits)} emails)')
+    for tenant in sorted(sim.first_start):
+        print(f'tenant {tenant}: first heavy job started after {sim.first_start[tenant] * 1000:8.1f} ms')
+
+
+def main():
+    args = parse_args()
+    from celery_app import celery
+    from fairshare import InMemoryFairShare
+
+    workers = args.email_workers + args.bulk_workers
+    shared = Simulation(args, None, None)
+    shared.run([(['celery'], workers)])
+    report(f'shared queue, {workers} workers', shared)
+
+    routed = Simulation(args, celery.conf.task_routes, InMemoryFairShare(args.max_jobs, 3600))
+    routed.run([(['email', 'default'], args.email_workers), (['bulk'], args.bulk_workers)])
+    report(f'routed: {args.email_workers} email/default + {args.bulk_workers} bulk workers, '
+           f'{args.max_jobs} job(s) per tenant', routed)
+
+
+if __name__ == '__main__':
+    main()
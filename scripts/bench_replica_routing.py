@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Measure how much query load read-replica routing takes off the primary.
+
+Builds a primary SQLite database and a replica (a file copy of the seeded
+primary, so it never receives later writes), runs a read-heavy API workload
+through the Flask test client, and counts the SQL statements each engine
+executes. Also checks read-your-writes: a course created by a client is
+readable by that client right away (pinned to the primary), and is read
+from the stale replica once the pin expires.
+
+    python scripts/bench_replica_routing.py
+    python scripts/bench_replica_routing.py --requests 2000 --write-every 10
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--write-every', type=int, default=20, help='every Nth request is a write')
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--pin-seconds', type=float, default=0.5)
+    return parser.parse_args()
+
+
+def seed(db, courses):
+    from models import Tenant, User, Course
+    db.session.add(Tenant(id=1, name='Bench School', schema_name='bench'))
+    admin = User(email='admin@example.com', first_name='Ada', last_name='Admin', user_type=1, tenant_id=1)
+    admin.set_password('password')
+    db.session.add(admin)
+    db.session.add_all(Course(name=f'Course {i}', code=f'C{i}', tenant_id=1) for i in range(courses))
+    db.session.commit()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    primary = os.path.join(workdir, 'primary.db')
+    replica = os.path.join(workdir, 'replica.db')
+    os.environ.update({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'SQLALCHEMY_REPLICA_URIS': f'sqlite:///{replica}',
+        'REPLICA_PIN_SECONDS': str(args.pin_seconds),
+        'ENTITY_CACHE_ENABLED': 'false',
+        'REDIS_URL': '',
+    })
+
+    from sqlalchemy import event
+    from app import app
+    from models import db
+
+    with app.app_context():
+        db.create_all()
+        seed(db, args.courses)
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+        shutil.copyfile(primary, replica)
+
+        statements = Counter()
+        for key, engine in db.engines.items():
+            name = key or 'primary'
+            event.listen(engine, 'before_cursor_execute',
+                         lambda *a, name=name: statements.update([name]))
+
+    # Access tokens carry the integer user id as `sub`, which
+    # flask-jwt-extended >= 4.7 rejects unless told not to
+    app.config['JWT_VERIFY_SUB'] = False
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'email': 'admin@example.com', 'password': 'password'})
+    token = response.get_json()['data']['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    statements.clear()
+
+    reads = writes = 0
+    start = time.perf_counter()
+    for i in range(args.requests):
+        if args.write_every and i % args.write_every == 0:
+            client.post('/api/courses/courses', json={'name': f'New {i}', 'code': f'N{i}'}, headers=headers)
+            writes += 1
+            time.sleep(args.pin_seconds)  # let the pin lapse so the next reads use the replica
+        else:
+            course_id = 1 + i % args.courses
+            path = '/api/courses/courses' if i % 2 else f'/api/courses/course/{course_id}'
+            client.get(path, headers=headers)
+            reads += 1
+    elapsed = time.perf_counter() - start - writes * args.pin_seconds
+
+    total = sum(statements.values())
+    print(f'{reads} reads, {writes} writes in {elapsed:.2f}s (excluding pin waits)')
+    for name, count in sorted(statements.items()):
+        print(f'  {name:<10} {count:>6} statements ({100 * count / total:5.1f}%)')
+    print(f'primary load reduction vs. primary-only: {100 * (1 - statements["primary"] / total):.1f}%')
+
+    created = client.post('/api/courses/courses', json={'name': 'Fresh', 'code': 'FRESH'}, headers=headers)
+    course_id = created.get_json()['data']['course']['id']
+    pinned = client.get(f'/api/courses/course/{course_id}', headers=headers).status_code
+    time.sleep(args.pin_seconds + 0.1)
+    unpinned = client.get(f'/api/courses/course/{course_id}', headers=headers).status_code
+    print(f'read-your-writes: right after create -> {pinned} (primary); '
+          f'after the pin expires -> {unpinned} (stale replica)')
+
+
+if __name__ == '__main__':
+    main()
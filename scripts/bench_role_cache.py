@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Measure SQL statements per protected request with and without the role cache.
+
+Seeds a SQLite database with an admin and some courses, then sends the same
+mix of admin-only GET requests through the Flask test client twice: with
+ROLE_CACHE_TTL=0, so admin_required reads the user row on every request as
+it used to, and with the configured TTL. Prints statements per request and
+how many of them read the users table.
+
+    python scripts/bench_role_cache.py
+    python scripts/bench_role_cache.py --requests 2000 --ttl 60
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--ttl', type=int, default=60, help='ROLE_CACHE_TTL for the cached run')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'SQLALCHEMY_REPLICA_URIS': '',
+        'REDIS_URL': '',
+    })
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event
+    import utils
+    from app import app
+    from models import db, Tenant, User, Course
+
+    statements = []
+    with app.app_context():
+        db.create_all()
+        db.session.add(Tenant(id=1, name='Bench School', schema_name='bench'))
+        admin = User(email='admin@example.com', user_type=1, tenant_id=1)
+        db.session.add(admin)
+        db.session.add_all(Course(name=f'Course {i}', code=f'C{i}', tenant_id=1) for i in range(args.courses))
+        db.session.commit()
+        headers = {'Authorization': 'Bearer ' + create_access_token(
+            identity=str(admin.id), additional_claims={'tenant_id': 1})}
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *rest: statements.append(statement))
+
+    client = app.test_client()
+    urls = ['/api/courses/courses', '/api/students/students', '/api/auth/users'] + [
+        f'/api/courses/course/{i}' for i in range(1, 6)]
+
+    for label, ttl in (('uncached', 0), ('cached', args.ttl)):
+        app.config['ROLE_CACHE_TTL'] = ttl
+        utils._role_cache.clear()
+        client.get(urls[0], headers=headers)  # warm the tenant map and entity cache
+        statements.clear()
+        start = time.perf_counter()
+        for i in range(args.requests):
+            response = client.get(urls[i % len(urls)], headers=headers)
+            assert response.status_code == 200, response.get_json()
+        elapsed = time.perf_counter() - start
+        user_reads = sum(1 for s in statements if 'FROM users' in s and 'users.id = ' in s)
+        print(f'{label:>8}: {len(statements) / args.requests:.2f} statements/request '
+              f'({user_reads / args.requests:.2f} role lookups), {args.requests / elapsed:.0f} requests/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Measure rows serialized per second: hand-built dicts vs compiled serializers.
+
+Seeds an in-memory SQLite database with attendance and grade rows, then
+times three ways of turning a list page into dicts: the per-field dict the
+routes used to build from ORM objects, the compiled `dump` over ORM objects,
+and `dump_rows` over plain row tuples (serializers of column-only models).
+Also times encoding the dicts with the stdlib json module and with the
+app's JSON provider (orjson when installed).
+
+    python scripts/bench_serializers.py
+    python scripts/bench_serializers.py --rows 200000 --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs')
+    return parser.parse_args()
+
+
+def best_rate(fn, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+def main():
+    args = parse_args()
+    os.environ.update({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SQLALCHEMY_REPLICA_URIS': '', 'REDIS_URL': ''})
+
+    from app import app
+    from models import db, Attendance, Course, Grade
+    from serializers import ATTENDANCE, GRADE, dumps_bytes
+    from utils import success_response
+
+    with app.app_context():
+        db.create_all()
+        course = Course(name='Algebra', code='ALG')
+        db.session.add(course)
+        db.session.flush()
+        start_day = date(2020, 1, 1)
+        db.session.execute(Attendance.__table__.insert(), [
+            {'student_id': i % 500 + 1, 'class_id': i // 500 + 1, 'date': start_day + timedelta(days=i % 1000),
+             'status': 'present'} for i in range(args.rows)])
+        db.session.execute(Grade.__table__.insert(), [
+            {'student_id': i + 1, 'course_id': course.id, 'grade': 80.0, 'term': 'Fall 2023'}
+            for i in range(args.rows)])
+        db.session.commit()
+
+        attendance = Attendance.query.all()
+        attendance_rows = db.session.query(*ATTENDANCE.columns).all()
+        grades = Grade.query.options(*GRADE.load_options).all()
+
+        def hand_attendance():
+            return [{'id': a.id, 'class_id': a.class_id, 'student_id': a.student_id, 'status': a.status}
+                    for a in attendance]
+
+        def hand_grades():
+            return [{'id': g.id, 'student_id': g.student_id, 'course_id': g.course_id,
+                     'course_name': g.course.name if g.course else None, 'term': g.term, 'value': g.grade}
+                    for g in grades]
+
+        cases = [
+            ('attendance, hand-built from ORM', hand_attendance),
+            ('attendance, compiled dump from ORM', lambda: ATTENDANCE.dump_many(attendance)),
+            ('attendance, compiled dump_rows from tuples', lambda: ATTENDANCE.dump_rows(attendance_rows)),
+            ('grades, hand-built from ORM', hand_grades),
+            ('grades, compiled dump from ORM', lambda: GRADE.dump_many(grades)),
+        ]
+        print(f'{args.rows} rows per page, best of {args.repeat}')
+        for label, fn in cases:
+            print(f'{label:>44}: {best_rate(fn, args.rows, args.repeat):12,.0f} rows/s')
+
+        payload = {'attendance': ATTENDANCE.dump_rows(attendance_rows)}
+        encoders = [('stdlib json', lambda: json.dumps(payload, separators=(',', ':'))),
+                    (f'{type(app.json).__name__}', lambda: app.json.dumps(payload))]
+        for label, fn in encoders:
+            print(f'{"encode, " + label:>44}: {best_rate(fn, args.rows, args.repeat):12,.0f} rows/s')
+
+        with app.test_request_context():
+            responses = [('success_response(dict)', lambda: success_response(payload)),
+                         ('success_response(dumps_bytes)', lambda: success_response(dumps_bytes(payload)))]
+            for label, fn in responses:
+                print(f'{label:>44}: {best_rate(fn, args.rows, args.repeat):12,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Declarative per-model serializers.
+
+Each model's public fields are declared once below. The declaration is
+compiled into a plain function returning a dict literal, so dumping a row is
+a single function call with no per-field dispatch. Serializers whose fields
+are all plain columns also expose `columns`, letting list endpoints select
+row tuples and skip building ORM objects entirely. Serializers are
+registered by model (see `get_serializer`).
+
+`dumps_bytes` encodes with orjson when it is installed; list endpoints pass
+its bytes to `success_response`, which splices them into the envelope
+without decoding and re-encoding them.
+"""
+import json
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.orm import ColumnProperty, joinedload
+from models import User, Student, Course, Class, Attendance, Grade
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SERIALIZERS = {}
+
+
+def _path_expr(path, name):
+    """Python source reading a dotted attribute path, None-safe along the way.
+
+    Each intermediate object is bound once (to `name`_0, `name`_1, ...) so a
+    relationship is not read twice.
+    """
+    parts = path.split('.')
+    if not all(part.isidentifier() for part in parts):
+        raise ValueError(f'Invalid field path: {path!r}')
+    expr = 'obj.' + parts[0]
+    for depth, part in enumerate(parts[1:]):
+        var = f'{name}_{depth}'
+        expr = f'({var}.{part} if ({var} := {expr}) is not None else None)'
+    return expr
+
+
+class Serializer:
+    """Public representation of one model.
+
+    `fields` maps output keys to a dotted attribute path ('user.email') or a
+    callable taking the object. `load_options` are the loader options the
+    fields need (e.g. joinedload of the relationships they traverse) so
+    callers can apply them to their query and avoid lazy loads.
+    """
+
+    def __init__(self, model, fields, load_options=()):
+        self.model = model
+        self.fields = dict(fields)
+        self.load_options = tuple(load_options)
+        self.dump = self._compile_dump()
+        self.columns = self._plain_columns()
+        self.dump_row = self._compile_dump_row() if self.columns else None
+        SERIALIZERS[model.__name__] = self
+
+    def dump_many(self, objs):
+        return list(map(self.dump, objs))
+
+    def dump_rows(self, rows):
+        return list(map(self.dump_row, rows))
+
+    def _compile_dump(self):
+        namespace = {}
+        items = []
+        for i, (key, source) in enumerate(self.fields.items()):
+            if callable(source):
+                namespace[f'_field{i}'] = source
+                items.append(f'{key!r}: _field{i}(obj)')
+            else:
+                items.append(f'{key!r}: {_path_expr(source, f"_v{i}")}')
+        exec(f"def dump(obj):\n    return {{{', '.join(items)}}}\n", namespace)
+        return namespace['dump']
+
+    def _plain_columns(self):
+        columns = []
+        for source in self.fields.values():
+            if callable(source) or '.' in source:
+                return None
+            attr = getattr(self.model, source)
+            if not isinstance(getattr(attr, 'property', None), ColumnProperty):
+                return None
+            columns.append(attr)
+        return tuple(columns)
+
+    def _compile_dump_row(self):
+        namespace = {}
+        items = ', '.join(f'{key!r}: row[{i}]' for i, key in enumerate(self.fields))
+        exec(f'def dump_row(row):\n    return {{{items}}}\n', namespace)
+        return namespace['dump_row']
+
+
+def get_serializer(model):
+    return SERIALIZERS[model.__name__]
+
+
+def _full_name(user):
+    if user is None:
+        return None
+    return f'{user.first_name or ""} {user.last_name or ""}'.strip()
+
+
+USER = Serializer(User, {
+    'id': 'id',
+    'email': 'email',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'user_type': 'user_type',
+})
+
+STUDENT = Serializer(Student, {
+    'id': 'id',
+    'first_name': 'user.first_name',
+    'last_name': 'user.last_name',
+    'email': 'user.email',
+}, load_options=(joinedload(Student.user),))
+
+COURSE = Serializer(Course, {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+})
+
+CLASS = Serializer(Class, {
+    'id': 'id',
+    'name': 'name',
+    'course_id': 'course_id',
+    'course_name': 'course.name',
+    'teacher_id': 'teacher_id',
+    'teacher_name': lambda class_: _full_name(class_.teacher),
+    'schedule': 'schedule',
+}, load_options=(joinedload(Class.course), joinedload(Class.teacher)))
+
+ATTENDANCE = Serializer(Attendance, {
+    'id': 'id',
+    'class_id': 'class_id',
+    'student_id': 'student_id',
+    'status': 'status',
+})
+
+GRADE = Serializer(Grade, {
+    'id': 'id',
+    'student_id': 'student_id',
+    'course_id': 'course_id',
+    'course_name': 'course.name',
+    'term': 'term',
+    'value': 'grade',
+}, load_options=(joinedload(Grade.course),))
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps_bytes(obj):
+        """Encode `obj` as compact JSON bytes."""
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=_ORJSON_OPTIONS)
+else:
+    def dumps_bytes(obj):
+        """Encode `obj` as compact JSON bytes."""
+        return json.dumps(obj, default=DefaultJSONProvider.default, separators=(',', ':')).encode()
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Dates still go through Flask's default hook, so values encode exactly as
+    before; keys keep declaration order and non-ASCII text is sent as UTF-8.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = _ORJSON_OPTIONS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=self.default, option=option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install the orjson provider when orjson is available."""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
@@ -1,14 +1,108 @@
-from models import db, User, Student, Course, Class, Attendance, Grade
+from flask import current_app
+from models import db, User, Student, Course, Class, Attendance, Grade, student_parents
+from hashing import HashingBusyError, needs_rehash, hash_passwords
 from datetime import datetime
-from utils import error_response
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from utils import error_response, encode_cursor, invalidate_user_role, DEFAULT_PAGE_SIZE
+from versions import bump_collection_version
+from entity_cache import cached_get, invalidate
+from tenancy import current_tenant_id, is_cross_tenant_request
+from archive import archived_years, read_archived_attendance
+from rollups import apply_attendance_changes, attendance_rates
+from grade_stats import course_term_stats, invalidate_grade_stats, term_gpa
+
+# Rows fetched per round trip when streaming exports; on Postgres this is
+# served from a server-side cursor so memory stays bounded.
+EXPORT_BATCH_SIZE = 1000
+# Rows per executemany/transaction (and ids per IN list) for bulk writes.
+BULK_CHUNK_SIZE = 1000
+# Collections whose payloads embed user fields: class payloads carry teacher
+# names, student payloads (and every report, via students) names and emails.
+USER_COLLECTIONS = ('classes', 'students')
+
+
+def paginate(query, model, limit=DEFAULT_PAGE_SIZE, after=None):
+    """Return one keyset page of `query` ordered by primary key.
+
+    Rows are fetched with `id > after` rather than by OFFSET; one extra row is
+    read to decide whether a next cursor is needed. A page is an index range
+    scan when the query's filters are equalities on the leading columns of an
+    index that ends in `id` (see the models' `__table_args__`); other filters
+    (date ranges, combinations without such an index) read the matching rows
+    and sort them. Queries selecting plain columns (`with_entities`) work
+    too, as long as `id` is among them.
+    """
+    query = query.order_by(model.id)
+    if after is not None:
+        query = query.filter(model.id > after)
+    items = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].id)
+    return items, next_cursor
+
+
+def upsert_insert(model):
+    """Return a dialect insert() supporting ON CONFLICT, or None if unsupported."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    return None
+
+
+def coerce_id(value):
+    """A positive integer id given as an int or a string of digits, else None."""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        return None
+    return value
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD string; raises ValueError otherwise."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError('date must be in YYYY-MM-DD format')
+
+
+def existing_ids(model, ids) -> set:
+    """Return the subset of `ids` present in `model`'s table, in chunked IN queries."""
+    ids = list(ids)
+    found = set()
+    for start in range(0, len(ids), BULK_CHUNK_SIZE):
+        chunk = ids[start:start + BULK_CHUNK_SIZE]
+        found.update(row[0] for row in db.session.query(model.id).filter(model.id.in_(chunk)))
+    return found
+
+
+def taken_values(column, values) -> set:
+    """Return the subset of `values` already stored in the unique `column`.
+
+    Emails, student ids and course codes are unique across all tenants, so
+    the lookup is not tenant scoped: a value held by another tenant would
+    pass a scoped check and then fail on insert.
+    """
+    values = [value for value in values if value is not None]
+    taken = set()
+    for start in range(0, len(values), BULK_CHUNK_SIZE):
+        chunk = values[start:start + BULK_CHUNK_SIZE]
+        taken.update(db.session.execute(
+            select(column).where(column.in_(chunk)), execution_options={'all_tenants': True},
+        ).scalars())
+    return taken
 
 
 class AuthService:
-    BLACKLIST = set()
-
     @staticmethod
     def register_user(data) -> User | tuple:
-        if User.query.filter_by(email=data['email']).first():
+        if taken_values(User.email, [data['email']]):
             return error_response('Email already exists', 400)
 
         user = User()
@@ -26,35 +120,52 @@ class AuthService:
         user = User.query.filter_by(email=email).first()
         if not user or not user.check_password(password):
             return None
+        if needs_rehash(user.password_hash):
+            # Upgrade hashes made with older parameters while we hold the
+            # plaintext; best effort, a busy pool must not fail the login.
+            try:
+                user.set_password(password)
+            except HashingBusyError:
+                return user
+            db.session.commit()
         return user
 
     @staticmethod
-    def blacklist_token(jti):
-        AuthService.BLACKLIST.add(jti)
+    def blacklist_token(jti, expires_at):
+        current_app.extensions['revocation_store'].revoke(jti, expires_at)
 
     @staticmethod
     def is_token_blacklisted(jti):
-        return jti in AuthService.BLACKLIST
+        return current_app.extensions['revocation_store'].is_revoked(jti)
 
     @staticmethod
-    def get_all_users() -> list[User]:
-        return User.query.all()
+    def get_all_users(limit=DEFAULT_PAGE_SIZE, after=None, user_type=None,
+                      columns=None) -> tuple[list, str | None]:
+        query = User.query.with_entities(*columns) if columns else User.query
+        if user_type is not None:
+            query = query.filter(User.user_type == user_type)
+        return paginate(query, User, limit, after)
 
     @staticmethod
     def get_user_by_id(user_id: int) -> User | None:
-        return User.query.get(user_id)
+        return cached_get(User, user_id)
 
     @staticmethod
-    def update_user(user_id: int, data) -> User | None:
+    def update_user(user_id: int, data) -> User | tuple | None:
         user = User.query.get(user_id)
         if not user:
             return None
-        for key in ('email', 'first_name', 'last_name', 'phone', 'is_active'):
+        if data.get('email', user.email) != user.email and taken_values(User.email, [data['email']]):
+            return error_response('Email already exists', 400)
+        for key in ('email', 'first_name', 'last_name', 'phone', 'is_active', 'user_type'):
             if key in data:
                 setattr(user, key, data[key])
         if 'password' in data:
             user.set_password(data['password'])
         db.session.commit()
+        invalidate_user_role(user_id)
+        invalidate(User, user_id)
+        bump_collection_version(*USER_COLLECTIONS)
         return user
 
     @staticmethod
@@ -64,24 +175,33 @@ class AuthService:
             return False
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_role(user_id)
+        invalidate(User, user_id)
+        bump_collection_version(*USER_COLLECTIONS)
         return True
 
 
 class StudentService:
     @staticmethod
-    def get_all_students() -> list[Student]:
-        return Student.query.all()
+    def get_all_students(limit=DEFAULT_PAGE_SIZE, after=None, class_id=None,
+                         options=()) -> tuple[list[Student], str | None]:
+        query = Student.query.options(*options)
+        if class_id is not None:
+            query = query.filter(Student.current_class_id == class_id)
+        return paginate(query, Student, limit, after)
 
     @staticmethod
-    def get_student_by_id(student_id: int) -> Student | None:
-        return Student.query.get(student_id)
+    def get_student_by_id(student_id: int, options=()) -> Student | None:
+        return cached_get(Student, student_id, options)
 
     @staticmethod
     def create_student(data) -> Student | tuple:
         # Create user first
         user_data = data.get('user') or {}
-        if User.query.filter_by(email=user_data.get('email')).first():
+        if taken_values(User.email, [user_data.get('email')]):
             return error_response('Email already exists', 400)
+        if taken_values(Student.student_id, [data.get('student_id')]):
+            return error_response('Student ID already exists', 400)
 
         user = User()
         user.email = user_data.get('email')
@@ -109,13 +229,133 @@ class StudentService:
                     student.parents.append(parent)
 
         db.session.commit()
+        bump_collection_version('students')
         return student
 
     @staticmethod
-    def update_student(student_id: int, data) -> Student | None:
+    def import_students(rows) -> tuple[int, list[dict]]:
+        """Create users and student profiles for one chunk of import rows.
+
+        `rows` is a list of (row_number, row) pairs where each row is a flat
+        dict with email, first_name, last_name, password, student_id, dob,
+        gender, address and `parents` (semicolon-separated parent emails).
+        Existing emails/student ids and parents are resolved with one IN
+        query each, passwords are hashed in parallel, and the chunk is
+        written with executemany in a single transaction. If a concurrent
+        write makes that transaction violate a unique constraint, it is rolled
+        back and the entries are written one by one, so only the conflicting
+        rows fail. Returns the number of students created and a list of
+        per-row errors.
+        """
+        errors = []
+        valid = []
+        seen_emails = set()
+        seen_student_ids = set()
+        for row_number, row in rows:
+            email = (row.get('email') or '').strip()
+            student_id = (row.get('student_id') or '').strip() or None
+            if not email:
+                errors.append({'row': row_number, 'error': 'email is required'})
+                continue
+            if email in seen_emails or (student_id and student_id in seen_student_ids):
+                errors.append({'row': row_number, 'error': 'Duplicate email or student_id in file'})
+                continue
+            try:
+                dob = datetime.strptime(row['dob'], '%Y-%m-%d').date() if row.get('dob') else None
+            except (TypeError, ValueError):
+                errors.append({'row': row_number, 'error': 'dob must be in YYYY-MM-DD format'})
+                continue
+            seen_emails.add(email)
+            if student_id:
+                seen_student_ids.add(student_id)
+            parents = [p.strip() for p in (row.get('parents') or '').split(';') if p.strip()]
+            valid.append((row_number, row, email, student_id, dob, parents))
+
+        taken_emails = taken_values(User.email, seen_emails)
+        taken_student_ids = taken_values(Student.student_id, seen_student_ids)
+        entries = []
+        for entry in valid:
+            row_number, _, email, student_id, _, _ = entry
+            if email in taken_emails:
+                errors.append({'row': row_number, 'error': 'Email already exists'})
+            elif student_id in taken_student_ids:
+                errors.append({'row': row_number, 'error': 'Student ID already exists'})
+            else:
+                entries.append(entry)
+        errors.sort(key=lambda e: e['row'])
+        if not entries:
+            return 0, errors
+
+        parent_emails = {p for entry in entries for p in entry[5]}
+        parent_ids = dict(
+            db.session.query(User.email, User.id).filter(User.email.in_(parent_emails), User.user_type == 4)
+        ) if parent_emails else {}
+
+        hashes = hash_passwords([row.get('password') or 'default_password' for _, row, *_ in entries])
+        try:
+            StudentService._insert_students(entries, hashes, parent_ids)
+            created = len(entries)
+        except IntegrityError:
+            # A concurrent write took an email or student_id after the check
+            db.session.rollback()
+            created = 0
+            for entry, password_hash in zip(entries, hashes):
+                try:
+                    StudentService._insert_students([entry], [password_hash], parent_ids)
+                    created += 1
+                except IntegrityError:
+                    db.session.rollback()
+                    errors.append({'row': entry[0], 'error': 'Email or student_id already exists'})
+            errors.sort(key=lambda e: e['row'])
+        if created:
+            bump_collection_version('students')
+        return created, errors
+
+    @staticmethod
+    def _insert_students(entries, hashes, parent_ids):
+        """Write validated import entries with executemany and commit."""
+        tenant_id = current_tenant_id()
+        user_ids = dict(db.session.execute(
+            insert(User).returning(User.email, User.id),
+            [{
+                'email': email,
+                'first_name': row.get('first_name'),
+                'last_name': row.get('last_name'),
+                'user_type': 3,  # Student
+                'password_hash': password_hash,
+                'tenant_id': tenant_id,
+            } for (_, row, email, *_), password_hash in zip(entries, hashes)],
+        ).all())
+        student_ids = db.session.execute(
+            insert(Student).returning(Student.id, sort_by_parameter_order=True),
+            [{
+                'student_id': student_id,
+                'dob': dob,
+                'gender': row.get('gender'),
+                'address': row.get('address') or '',
+                'user_id': user_ids[email],
+                'tenant_id': tenant_id,
+            } for _, row, email, student_id, dob, _ in entries],
+        ).scalars().all()
+        links = [
+            {'student_id': sid, 'parent_id': parent_ids[p]}
+            for sid, entry in zip(student_ids, entries)
+            for p in dict.fromkeys(entry[5]) if p in parent_ids
+        ]
+        if links:
+            db.session.execute(student_parents.insert(), links)
+        db.session.commit()
+
+    @staticmethod
+    def update_student(student_id: int, data) -> Student | tuple | None:
         student = Student.query.get(student_id)
         if not student:
             return None
+        if data.get('email', student.user.email) != student.user.email and taken_values(User.email, [data['email']]):
+            return error_response('Email already exists', 400)
+        if data.get('student_id', student.student_id) != student.student_id and \
+                taken_values(Student.student_id, [data['student_id']]):
+            return error_response('Student ID already exists', 400)
 
         if 'student_id' in data:
             student.student_id = data['student_id']
@@ -134,7 +374,11 @@ class StudentService:
             if key in data:
                 setattr(student.user, key, data[key])
 
+        user_id = student.user_id
         db.session.commit()
+        invalidate(Student, student_id)
+        invalidate(User, user_id)
+        bump_collection_version('students')
         return student
 
     @staticmethod
@@ -145,26 +389,32 @@ class StudentService:
 
         db.session.delete(student)
         db.session.commit()
+        invalidate(Student, student_id)
+        bump_collection_version('students')
         return True
 
 
 class CourseService:
     @staticmethod
-    def get_all_courses() -> list[Course]:
-        return Course.query.all()
+    def get_all_courses(limit=DEFAULT_PAGE_SIZE, after=None, columns=None) -> tuple[list, str | None]:
+        query = Course.query.with_entities(*columns) if columns else Course.query
+        return paginate(query, Course, limit, after)
 
     @staticmethod
     def get_course_by_id(course_id: int) -> Course | None:
-        return Course.query.get(course_id)
+        return cached_get(Course, course_id)
 
     @staticmethod
-    def create_course(data) -> Course:
+    def create_course(data) -> Course | tuple:
+        if taken_values(Course.code, [data.get('code')]):
+            return error_response('Course code already exists', 400)
         course = Course()
         course.name = data['name']
         course.code = data.get('code')
         course.description = data.get('description', '')
         db.session.add(course)
         db.session.commit()
+        bump_collection_version('courses')
         return course
 
     @staticmethod
@@ -178,6 +428,8 @@ class CourseService:
         if 'description' in data:
             course.description = data['description']
         db.session.commit()
+        invalidate(Course, course_id)
+        bump_collection_version('courses', 'classes')  # class payloads embed course names
         return course
 
     @staticmethod
@@ -187,17 +439,25 @@ class CourseService:
             return False
         db.session.delete(course)
         db.session.commit()
+        invalidate(Course, course_id)
+        bump_collection_version('courses', 'classes')
         return True
 
 
 class ClassService:
     @staticmethod
-    def get_all_classes() -> list[Class]:
-        return Class.query.all()
+    def get_all_classes(limit=DEFAULT_PAGE_SIZE, after=None, course_id=None, teacher_id=None,
+                        options=()) -> tuple[list[Class], str | None]:
+        query = Class.query.options(*options)
+        if course_id is not None:
+            query = query.filter(Class.course_id == course_id)
+        if teacher_id is not None:
+            query = query.filter(Class.teacher_id == teacher_id)
+        return paginate(query, Class, limit, after)
 
     @staticmethod
-    def get_class_by_id(class_id: int) -> Class | None:
-        return Class.query.get(class_id)
+    def get_class_by_id(class_id: int, options=()) -> Class | None:
+        return cached_get(Class, class_id, options)
 
     @staticmethod
     def create_class(data) -> Class:
@@ -208,6 +468,7 @@ class ClassService:
         class_obj.schedule = data.get('schedule')
         db.session.add(class_obj)
         db.session.commit()
+        bump_collection_version('classes')
         return class_obj
 
     @staticmethod
@@ -220,6 +481,8 @@ class ClassService:
             if key in data:
                 setattr(class_obj, key, data[key])
         db.session.commit()
+        invalidate(Class, class_id)
+        bump_collection_version('classes')
         return class_obj
 
     @staticmethod
@@ -229,55 +492,252 @@ class ClassService:
             return False
         db.session.delete(class_obj)
         db.session.commit()
+        invalidate(Class, class_id)
+        bump_collection_version('classes')
         return True
 
 
 class AttendanceService:
-    @staticmethod
-    def create_attendance(data) -> Attendance:
-        attendance = Attendance()
-        attendance.student_id = data['student_id']
-        attendance.class_id = data['class_id']
-        attendance.date = datetime.strptime(data['date'], '%Y-%m-%d').date() if data.get('date') else None
-        attendance.status = data.get('status', 'present')
+    DUPLICATE_MESSAGE = 'Attendance already recorded for this student, class and date'
+
+    @staticmethod
+    def create_attendance(data) -> Attendance | tuple:
+        data = data if isinstance(data, dict) else {}
+        student_id = coerce_id(data.get('student_id'))
+        class_id = coerce_id(data.get('class_id'))
+        status = data.get('status', 'present')
+        if not student_id or not class_id or not data.get('date'):
+            return error_response('student_id, class_id and date are required', 400)
+        if status not in Attendance.STATUS_CHOICES:
+            return error_response(f"status must be one of: {', '.join(Attendance.STATUS_CHOICES)}", 400)
+        try:
+            date = parse_date(data['date'])
+        except ValueError as e:
+            return error_response(str(e), 400)
+        if not existing_ids(Student, [student_id]):
+            return error_response('Student not found', 400)
+        if not existing_ids(Class, [class_id]):
+            return error_response('Class not found', 400)
+
+        attendance = Attendance(student_id=student_id, class_id=class_id, date=date, status=status)
         db.session.add(attendance)
-        db.session.commit()
+        try:
+            db.session.flush()
+            apply_attendance_changes([AttendanceService._rollup_change(attendance, 1)])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            if AttendanceService._is_recorded(student_id, class_id, date):
+                return error_response(AttendanceService.DUPLICATE_MESSAGE, 409)
+            raise
+        bump_collection_version('attendance')
         return attendance
 
     @staticmethod
-    def get_all_attendance() -> list[Attendance]:
-        return Attendance.query.all()
+    def _is_recorded(student_id, class_id, date, exclude_id=None) -> bool:
+        """Whether (student, class, date) already has a row, i.e. the unique constraint would fail."""
+        query = db.session.query(Attendance.id).filter(
+            Attendance.student_id == student_id, Attendance.class_id == class_id, Attendance.date == date,
+        )
+        if exclude_id is not None:
+            query = query.filter(Attendance.id != exclude_id)
+        return query.first() is not None
+
+    @staticmethod
+    def record_roll_call(data) -> int | tuple:
+        """Record a whole class's attendance for one date in one transaction.
+
+        `data` is {class_id, date, records: [{student_id, status}]}. New rows
+        are inserted with one statement; existing (student, class, date) rows
+        have their status overwritten.
+        """
+        data = data if isinstance(data, dict) else {}
+        class_id = coerce_id(data.get('class_id'))
+        records = data.get('records') or []
+        if not class_id or not data.get('date') or not records:
+            return error_response('class_id, date and records are required', 400)
+        if not isinstance(records, list):
+            return error_response('records must be a list', 400)
+        try:
+            date = parse_date(data['date'])
+        except ValueError as e:
+            return error_response(str(e), 400)
+
+        # Ids are coerced up front so '12' and 12 are the same student. Last
+        # entry wins for a student listed twice; ON CONFLICT cannot touch the
+        # same row twice within one statement.
+        statuses = {}
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                return error_response(f'Invalid roll-call record at index {index}: must be an object', 400)
+            student_id = coerce_id(record.get('student_id'))
+            status = record.get('status', 'present')
+            if student_id is None or status not in Attendance.STATUS_CHOICES:
+                return error_response(f'Invalid roll-call record at index {index}: {record}', 400)
+            statuses[student_id] = status
+
+        if not existing_ids(Class, [class_id]):
+            return error_response('Class not found', 400)
+        unknown = set(statuses) - existing_ids(Student, statuses)
+        if unknown:
+            return error_response(f'Unknown student_id(s): {sorted(unknown)}', 400)
+
+        # Rollup deltas must match what was actually written even with
+        # concurrent roll-calls: rows that exist are locked before their old
+        # status is read, and new rows are inserted with ON CONFLICT DO
+        # NOTHING, counting only those RETURNING reports as inserted. A row
+        # another writer inserted meanwhile is then locked and updated.
+        existing = AttendanceService._lock_existing(class_id, date, statuses)
+        new_ids = [student_id for student_id in statuses if student_id not in existing]
+        tenant_id = current_tenant_id()
+        changes = []
+        insert = upsert_insert(Attendance)
+        if insert is None:
+            for student_id in new_ids:
+                db.session.add(Attendance(student_id=student_id, class_id=class_id, date=date,
+                                          status=statuses[student_id]))
+                changes.append((tenant_id, student_id, class_id, date, statuses[student_id], 1))
+        elif new_ids:
+            stmt = insert.values([
+                {'student_id': student_id, 'class_id': class_id, 'date': date, 'status': statuses[student_id],
+                 'tenant_id': tenant_id}
+                for student_id in new_ids
+            ]).on_conflict_do_nothing(index_elements=['student_id', 'class_id', 'date'])
+            inserted = set(db.session.execute(stmt.returning(Attendance.student_id)).scalars())
+            changes.extend((tenant_id, student_id, class_id, date, statuses[student_id], 1) for student_id in inserted)
+            raced = [student_id for student_id in new_ids if student_id not in inserted]
+            if raced:
+                existing.update(AttendanceService._lock_existing(class_id, date, raced))
+
+        for student_id, attendance in existing.items():
+            if attendance.status != statuses[student_id]:
+                changes.append(AttendanceService._rollup_change(attendance, -1))
+                attendance.status = statuses[student_id]
+                changes.append(AttendanceService._rollup_change(attendance, 1))
+        apply_attendance_changes(changes)
+        db.session.commit()
+        bump_collection_version('attendance')
+        return len(statuses)
+
+    @staticmethod
+    def _lock_existing(class_id, date, student_ids) -> dict:
+        """Lock the class's rows for `date` of `student_ids` that exist; returns them by student id."""
+        return {
+            a.student_id: a for a in Attendance.query.filter(
+                Attendance.class_id == class_id,
+                Attendance.date == date,
+                Attendance.student_id.in_(list(student_ids)),
+            ).with_for_update()
+        }
+
+    @staticmethod
+    def get_all_attendance(limit=DEFAULT_PAGE_SIZE, after=None, class_id=None, student_id=None,
+                           date_from=None, date_to=None, columns=None) -> tuple[list, str | None]:
+        query = Attendance.query.with_entities(*columns) if columns else Attendance.query
+        query = AttendanceService._filter(query, class_id, student_id, date_from, date_to)
+        return paginate(query, Attendance, limit, after)
+
+    @staticmethod
+    def export_attendance(class_id=None, student_id=None, date_from=None, date_to=None):
+        """Yield (id, student_id, class_id, date, status) tuples in id order."""
+        query = Attendance.query.with_entities(
+            Attendance.id, Attendance.student_id, Attendance.class_id, Attendance.date, Attendance.status
+        )
+        query = AttendanceService._filter(query, class_id, student_id, date_from, date_to)
+        return query.order_by(Attendance.id).yield_per(EXPORT_BATCH_SIZE)
+
+    @staticmethod
+    def get_attendance_rates(group_by, date_from=None, date_to=None, class_id=None, student_id=None) -> list[dict]:
+        """Counts and rates from the attendance rollups; raises ValueError on bad arguments."""
+        return attendance_rates(group_by, date_from, date_to, class_id=class_id, student_id=student_id)
+
+    @staticmethod
+    def _rollup_change(attendance, delta):
+        return (attendance.tenant_id, attendance.student_id, attendance.class_id,
+                attendance.date, attendance.status, delta)
+
+    @staticmethod
+    def get_archived_years() -> list[int]:
+        return archived_years(current_tenant_id(), all_tenants=is_cross_tenant_request())
+
+    @staticmethod
+    def export_archived_attendance(school_year, class_id=None, student_id=None, date_from=None, date_to=None):
+        """Yield (id, student_id, class_id, date, status) tuples from an archived school year."""
+        return read_archived_attendance(school_year, current_tenant_id(), all_tenants=is_cross_tenant_request(),
+                                        class_id=class_id, student_id=student_id,
+                                        date_from=date_from, date_to=date_to)
+
+    @staticmethod
+    def _filter(query, class_id=None, student_id=None, date_from=None, date_to=None):
+        if class_id is not None:
+            query = query.filter(Attendance.class_id == class_id)
+        if student_id is not None:
+            query = query.filter(Attendance.student_id == student_id)
+        if date_from is not None:
+            query = query.filter(Attendance.date >= date_from)
+        if date_to is not None:
+            query = query.filter(Attendance.date <= date_to)
+        return query
 
     @staticmethod
     def get_attendance_by_id(attendance_id: int) -> Attendance | None:
         return Attendance.query.get(attendance_id)
 
     @staticmethod
-    def update_attendance(data) -> Attendance | None:
-        attendance_id = data.get('id') or data.get('attendance_id')
-        attendance = Attendance.query.get(attendance_id)
+    def update_attendance(data) -> Attendance | tuple | None:
+        data = data if isinstance(data, dict) else {}
+        attendance_id = coerce_id(data.get('id') or data.get('attendance_id'))
+        if attendance_id is None:
+            return None
+        if 'status' in data and data['status'] not in Attendance.STATUS_CHOICES:
+            return error_response(f"status must be one of: {', '.join(Attendance.STATUS_CHOICES)}", 400)
+        try:
+            date = parse_date(data['date']) if 'date' in data else None
+        except ValueError as e:
+            return error_response(str(e), 400)
+        # Locked, so a concurrent update cannot apply the same rollup delta twice
+        attendance = Attendance.query.filter(Attendance.id == attendance_id).with_for_update().first()
         if not attendance:
             return None
+        before = AttendanceService._rollup_change(attendance, -1)
         if 'status' in data:
             attendance.status = data['status']
-        if 'date' in data:
-            attendance.date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-        db.session.commit()
+        if date is not None:
+            attendance.date = date
+        after = AttendanceService._rollup_change(attendance, 1)
+        key = (attendance.student_id, attendance.class_id, attendance.date)
+        try:
+            db.session.flush()
+            if after[:5] != before[:5]:
+                apply_attendance_changes([before, after])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            if AttendanceService._is_recorded(*key, exclude_id=attendance_id):
+                return error_response(AttendanceService.DUPLICATE_MESSAGE, 409)
+            raise
+        bump_collection_version('attendance')
         return attendance
 
     @staticmethod
     def delete_attendance(attendance_id: int) -> bool:
-        attendance = Attendance.query.get(attendance_id)
+        attendance = Attendance.query.filter(Attendance.id == attendance_id).with_for_update().first()
         if not attendance:
             return False
+        apply_attendance_changes([AttendanceService._rollup_change(attendance, -1)])
         db.session.delete(attendance)
         db.session.commit()
+        bump_collection_version('attendance')
         return True
 
 
 class GradeService:
     @staticmethod
-    def create_grade(data) -> Grade:
+    def create_grade(data) -> Grade | tuple:
+        if not existing_ids(Student, [data['student_id']]):
+            return error_response('Student not found', 400)
+        if not existing_ids(Course, [data['course_id']]):
+            return error_response('Course not found', 400)
         grade = Grade()
         grade.student_id = data['student_id']
         grade.course_id = data['course_id']
@@ -285,15 +745,90 @@ class GradeService:
         grade.term = data.get('term')
         db.session.add(grade)
         db.session.commit()
+        invalidate_grade_stats([(grade.course_id, grade.term)])
         return grade
 
     @staticmethod
-    def get_all_grades() -> list[Grade]:
-        return Grade.query.all()
-
-    @staticmethod
-    def get_grade_by_id(grade_id: int) -> Grade | None:
-        return Grade.query.get(grade_id)
+    def bulk_create_grades(rows) -> dict:
+        """Validate and insert many grade rows, reporting failures per row.
+
+        Foreign keys are checked with one IN query per chunk of distinct ids
+        rather than per row, and valid rows are written with executemany in
+        BULK_CHUNK_SIZE transactions. Row numbers in the report are 1-based.
+        """
+        errors = []
+        parsed = []
+        tenant_id = current_tenant_id()
+        for index, row in enumerate(rows, 1):
+            try:
+                value = row.get('value', row.get('grade'))
+                parsed.append((index, {
+                    'student_id': int(row['student_id']),
+                    'course_id': int(row['course_id']),
+                    'grade': float(value) if value not in (None, '') else None,
+                    'term': row.get('term') or None,
+                    'tenant_id': tenant_id,
+                }))
+            except (AttributeError, KeyError, TypeError, ValueError):
+                errors.append({'row': index, 'error': 'student_id and course_id must be integers and value numeric'})
+
+        students = existing_ids(Student, {r['student_id'] for _, r in parsed})
+        courses = existing_ids(Course, {r['course_id'] for _, r in parsed})
+        valid = []
+        for index, row in parsed:
+            if row['student_id'] not in students:
+                errors.append({'row': index, 'error': f"Student {row['student_id']} not found"})
+            elif row['course_id'] not in courses:
+                errors.append({'row': index, 'error': f"Course {row['course_id']} not found"})
+            else:
+                valid.append(row)
+
+        for start in range(0, len(valid), BULK_CHUNK_SIZE):
+            db.session.execute(insert(Grade), valid[start:start + BULK_CHUNK_SIZE])
+            db.session.commit()
+        if valid:
+            invalidate_grade_stats({(row['course_id'], row['term']) for row in valid})
+
+        errors.sort(key=lambda e: e['row'])
+        return {'inserted': len(valid), 'errors': errors}
+
+    @staticmethod
+    def get_all_grades(limit=DEFAULT_PAGE_SIZE, after=None, student_id=None, course_id=None,
+                       term=None, options=()) -> tuple[list[Grade], str | None]:
+        query = GradeService._filter(Grade.query.options(*options), student_id, course_id, term)
+        return paginate(query, Grade, limit, after)
+
+    @staticmethod
+    def export_grades(student_id=None, course_id=None, term=None):
+        """Yield (id, student_id, course_id, term, grade) tuples in id order."""
+        query = Grade.query.with_entities(Grade.id, Grade.student_id, Grade.course_id, Grade.term, Grade.grade)
+        query = GradeService._filter(query, student_id, course_id, term)
+        return query.order_by(Grade.id).yield_per(EXPORT_BATCH_SIZE)
+
+    @staticmethod
+    def _filter(query, student_id=None, course_id=None, term=None):
+        if student_id is not None:
+            query = query.filter(Grade.student_id == student_id)
+        if course_id is not None:
+            query = query.filter(Grade.course_id == course_id)
+        if term is not None:
+            query = query.filter(Grade.term == term)
+        return query
+
+    @staticmethod
+    def get_course_term_stats(course_id: int, term: str) -> dict:
+        return course_term_stats(course_id, term)
+
+    @staticmethod
+    def get_term_gpa(term: str, student_id=None) -> dict:
+        gpa = term_gpa(term)
+        if student_id is None:
+            return gpa
+        return {**gpa, 'students': [s for s in gpa['students'] if s['student_id'] == student_id]}
+
+    @staticmethod
+    def get_grade_by_id(grade_id: int, options=()) -> Grade | None:
+        return Grade.query.options(*options).get(grade_id)
 
     @staticmethod
     def update_grade(data) -> Grade | None:
@@ -301,11 +836,13 @@ class GradeService:
         grade = Grade.query.get(grade_id)
         if not grade:
             return None
+        previous_term = grade.term
         if 'value' in data:
             grade.grade = data['value']
         if 'term' in data:
             grade.term = data['term']
         db.session.commit()
+        invalidate_grade_stats([(grade.course_id, previous_term), (grade.course_id, grade.term)])
         return grade
 
     @staticmethod
@@ -313,6 +850,8 @@ class GradeService:
         grade = Grade.query.get(grade_id)
         if not grade:
             return False
+        course_term = (grade.course_id, grade.term)
         db.session.delete(grade)
         db.session.commit()
+        invalidate_grade_stats([course_term])
         return True
@@ -0,0 +1,188 @@
+"""Task state changes pushed to clients as Server-Sent Events.
+
+Workers publish every state transition of a task (STARTED, PROGRESS,
+DEFERRED, RETRY, SUCCESS, FAILURE) to a per-task channel and keep the latest
+event under a key, so a client subscribing late still starts from the
+current state. /api/tasks/task-events/<task_id> holds one streaming response
+per task instead of the client polling task-status in a loop.
+
+Production uses Redis pub/sub so events cross from the Celery workers to
+every API worker. The in-memory broker is the fallback for local development
+when REDIS_URL is not set (and a stand-in for tests); it only delivers
+events published in the same process, so streams also re-check the result
+backend on every heartbeat.
+
+Every open stream pins one gthread thread of its gunicorn worker for up to
+TASK_EVENTS_MAX_STREAM seconds. A worker holds at most
+TASK_EVENTS_MAX_STREAMS of them at once, so streams can never take all of
+its GUNICORN_THREADS; beyond the cap the endpoint answers 503 and clients
+fall back to polling task-status.
+"""
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from flask import current_app
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+TERMINAL_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+
+
+class InMemoryTaskEvents:
+    """Per-process pub/sub with the latest event of each task."""
+
+    MAX_TASKS = 10000
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)  # task_id -> {queue.Queue}
+        self._last = OrderedDict()  # task_id -> event
+        self._lock = threading.Lock()
+
+    def publish(self, task_id, event):
+        with self._lock:
+            self._last[task_id] = event
+            self._last.move_to_end(task_id)
+            while len(self._last) > self.MAX_TASKS:
+                self._last.popitem(last=False)
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def last(self, task_id):
+        with self._lock:
+            return self._last.get(task_id)
+
+    @contextmanager
+    def subscribe(self, task_id):
+        events = queue.Queue()
+        with self._lock:
+            self._subscribers[task_id].add(events)
+        try:
+            yield _QueueSubscription(events)
+        finally:
+            with self._lock:
+                self._subscribers[task_id].discard(events)
+                if not self._subscribers[task_id]:
+                    del self._subscribers[task_id]
+
+
+class _QueueSubscription:
+    def __init__(self, events):
+        self._events = events
+
+    def get(self, timeout):
+        """Next event, or None if none arrives within `timeout` seconds."""
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RedisTaskEvents:
+    CHANNEL_PREFIX = 'task-events:'
+    LAST_PREFIX = 'task-event-last:'
+
+    def __init__(self, client, ttl=3600):
+        self._client = client
+        self._ttl = ttl
+
+    def publish(self, task_id, event):
+        payload = json.dumps(event, default=str)
+        pipe = self._client.pipeline(transaction=False)
+        pipe.set(self.LAST_PREFIX + task_id, payload, ex=self._ttl)
+        pipe.publish(self.CHANNEL_PREFIX + task_id, payload)
+        pipe.execute()
+
+    def last(self, task_id):
+        payload = self._client.get(self.LAST_PREFIX + task_id)
+        return json.loads(payload) if payload else None
+
+    @contextmanager
+    def subscribe(self, task_id):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.CHANNEL_PREFIX + task_id)
+        try:
+            yield _PubSubSubscription(pubsub)
+        finally:
+            pubsub.close()
+
+
+class _PubSubSubscription:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = self._pubsub.get_message(timeout=remaining)
+            if message and message['type'] == 'message':
+                return json.loads(message['data'])
+        return None
+
+
+def init_task_events(app):
+    """Attach the configured task event broker and this worker's stream slots to `app.extensions`."""
+    url = app.config.get('REDIS_URL')
+    if url and redis is not None:
+        events = RedisTaskEvents(redis.Redis.from_url(url), ttl=app.config.get('TASK_EVENTS_TTL', 3600))
+    else:
+        events = InMemoryTaskEvents()
+    app.extensions['task_events'] = events
+    app.extensions['task_event_streams'] = threading.BoundedSemaphore(
+        max(app.config.get('TASK_EVENTS_MAX_STREAMS', 8), 1))
+    return events
+
+
+def task_event(task_id, status, info=None):
+    """Event record in the shape of /api/tasks/task-status responses."""
+    event = {'task_id': task_id, 'status': status, 'current': info if status == 'PROGRESS' else None}
+    if status in TERMINAL_STATES:
+        event['result'] = info
+    elif status not in ('PROGRESS', 'STARTED') and info is not None:
+        event['info'] = info
+    return event
+
+
+def publish_task_event(task_id, status, info=None):
+    current_app.extensions['task_events'].publish(task_id, task_event(task_id, status, info))
+
+
+def _sse(data, event=None):
+    lines = [f'event: {event}'] if event else []
+    lines.append(f'data: {current_app.json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def task_event_stream(task_id, current_state):
+    """Yield SSE frames for `task_id` until it reaches a terminal state.
+
+    `current_state()` reads the result backend; it seeds the stream when no
+    event has been published yet and is re-checked on every heartbeat, so
+    a missed message cannot stall the stream. The stream ends with an `end`
+    event (clients should close their EventSource on it), or after
+    TASK_EVENTS_MAX_STREAM seconds, when clients reconnect.
+    """
+    config = current_app.config
+    heartbeat = config.get('TASK_EVENTS_HEARTBEAT', 15)
+    deadline = time.monotonic() + config.get('TASK_EVENTS_MAX_STREAM', 300)
+    store = current_app.extensions['task_events']
+    with store.subscribe(task_id) as subscription:
+        event = store.last(task_id) or current_state()
+        yield f'retry: {heartbeat * 1000}\n' + _sse(event)
+        while event['status'] not in TERMINAL_STATES and time.monotonic() < deadline:
+            update = subscription.get(heartbeat)
+            if update is None:
+                update = current_state()
+                if update['status'] == event['status'] and update.get('current') == event.get('current'):
+                    yield ': keep-alive\n\n'
+                    continue
+            event = update
+            yield _sse(event)
+        if event['status'] in TERMINAL_STATES:
+            yield _sse({'task_id': task_id}, event='end')
@@ -1,26 +1,215 @@
 from celery_app import celery
-import time
+from celery.signals import task_postrun, task_prerun
+import csv
+import os
 import logging
+from contextlib import contextmanager
+from datetime import date, datetime
+from itertools import islice
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
 
 logger = logging.getLogger(__name__)
 
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+
+def app_context():
+    """Push a Flask app context for tasks that touch the database.
+
+    Workers started with `celery -A celery_app worker` never import app.py,
+    so tasks cannot rely on make_celery's ContextTask being installed.
+    """
+    from app import app
+    return app.app_context()
+
+
+def publish_state(task_id, state, info=None):
+    """Push a state transition to /api/tasks/task-events streams (see task_events.py)."""
+    from task_events import publish_task_event
+
+    try:
+        with app_context():
+            publish_task_event(task_id, state, info)
+    except Exception as e:
+        # Streams fall back to the result backend; never fail the task over it
+        logger.warning(f"Could not publish {state} for task {task_id}: {e}")
+
+
+def set_task_state(task, state, info=None):
+    """Record a state transition for task-status and publish it."""
+    task.update_state(state=state, meta=info)
+    publish_state(task.request.id, state, info)
+
+
+def report_progress(task, current, total):
+    """Publish a PROGRESS state that /api/tasks/task-status and task-events can surface."""
+    if not task.request.id:  # Called directly rather than through a worker
+        return
+    set_task_state(task, 'PROGRESS', {
+        'current': current,
+        'total': total,
+        'percent': round(100 * current / total) if total else 100,
+    })
+
+
+@task_prerun.connect
+def publish_task_started(task_id=None, **kwargs):
+    publish_state(task_id, 'STARTED')
+
+
+@task_postrun.connect
+def publish_task_finished(task_id=None, retval=None, state=None, **kwargs):
+    if state in ('SUCCESS', 'FAILURE', 'RETRY'):
+        publish_state(task_id, state, str(retval) if isinstance(retval, BaseException) else retval)
+
+
+# Message header counting a task's fair-share deferrals, which must not use
+# up the retries it has for real failures (see `failure_retries`).
+DEFERRALS_HEADER = 'fair_share_deferrals'
+
+
+# Message header with a bulk import's committed rows and counts so far, so a
+# retry resumes after the last committed chunk.
+IMPORT_PROGRESS_HEADER = 'import_progress'
+
+
+def deferrals(task):
+    return task.request.get(DEFERRALS_HEADER) or 0
+
+
+def failure_retries(task):
+    """max_retries for a failure retry: the task's own, plus the retries spent on deferrals."""
+    return task.max_retries + deferrals(task)
+
+
+@contextmanager
+def tenant_job_slot(task, tenant_id):
+    """Hold one of the tenant's heavy-job slots (see fairshare.py) while the block runs.
+
+    When the tenant already has FAIR_SHARE_MAX_JOBS jobs running, the task is
+    marked DEFERRED and retried after FAIR_SHARE_DEFER_DELAY seconds, so the
+    worker moves on to other tenants' jobs. Deferrals are counted in the
+    DEFERRALS_HEADER header and never exhaust the task's max_retries.
+    """
+    from flask import current_app
+    from fairshare import defer_delay, tenant_key
+
+    job_id = task.request.id
+    if not job_id:  # Called directly rather than through a worker
+        yield
+        return
+    key = tenant_key(tenant_id)
+    with app_context():
+        store = current_app.extensions['fair_share']
+        delay = defer_delay(current_app.config.get('FAIR_SHARE_DEFER_DELAY', 30))
+        acquired = store.acquire(key, job_id)
+    if not acquired:
+        logger.info(f"Deferring {task.name} {job_id}: tenant {key} is at {store.max_jobs} running jobs")
+        set_task_state(task, 'DEFERRED', {'reason': 'tenant job limit', 'retry_in': round(delay)})
+        headers = {**(task.request.headers or {}), DEFERRALS_HEADER: deferrals(task) + 1}
+        raise task.retry(countdown=delay, max_retries=task.request.retries + 1, headers=headers)
+    try:
+        yield
+    finally:
+        store.release(key, job_id)
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_import_rows(path):
+    """Yield each data row of a CSV or XLSX file as a dict keyed by header."""
+    if os.path.splitext(path)[1].lower() == '.xlsx':
+        if load_workbook is None:
+            raise ValueError('openpyxl is required to import .xlsx files')
+        workbook = load_workbook(path, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else '' for h in next(rows, ())]
+            for values in rows:
+                yield {k: _cell_text(v) for k, v in zip(header, values)}
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def count_import_rows(path):
+    """Cheap row count used as the progress denominator."""
+    if os.path.splitext(path)[1].lower() == '.xlsx':
+        if load_workbook is None:
+            raise ValueError('openpyxl is required to import .xlsx files')
+        workbook = load_workbook(path, read_only=True)
+        try:
+            return max((workbook.active.max_row or 1) - 1, 0)
+        finally:
+            workbook.close()
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+def send_emails(messages):
+    """Deliver `messages` with the app's mailer (see mailer.py)."""
+    from flask import current_app
+
+    with app_context():
+        return current_app.extensions['mailer'].send(messages)
+
+
+def queue_email_batches(messages, batch_size=None):
+    """Queue {recipient, subject, body[, sender]} messages as send_email_batch tasks.
+
+    Messages are grouped by sender and split into MAIL_BATCH_SIZE batches, so
+    a blast to thousands of recipients becomes a handful of tasks that each
+    reuse pooled SMTP connections. Returns the queued task ids.
+    """
+    from config import Config
+
+    batch_size = batch_size or Config.MAIL_BATCH_SIZE
+    by_sender = {}
+    for message in messages:
+        by_sender.setdefault(message.get('sender'), []).append(message)
+    return [
+        send_email_batch.delay(batch).id
+        for group in by_sender.values()
+        for batch in iter_chunks(group, batch_size)
+    ]
+
 @celery.task(bind=True)
 def send_email_notification(self, recipient, subject, body):
     """
-    Example task for sending email notifications asynchronously.
-    Replace with your actual email sending logic.
+    Send one email notification through the pooled mailer.
+
+    For more than a few recipients use queue_email_batches instead.
     """
     try:
         logger.info(f"Sending email to {recipient}: {subject}")
 
-        # Simulate email sending (replace with actual implementation)
-        time.sleep(1)  # Simulate processing time
-
-        # Here you would integrate with an email service like:
-        # - SendGrid
-        # - Amazon SES
-        # - SMTP
-        # - etc.
+        result = send_emails([{'recipient': recipient, 'subject': subject, 'body': body}])
+        if result['failed']:
+            failure = result['failed'][0]
+            if not failure['temporary']:
+                logger.error(f"Email to {recipient} rejected: {failure['error']}")
+                return {"status": "rejected", "recipient": recipient, "error": failure['error']}
+            raise RuntimeError(failure['error'])
 
         logger.info(f"Email sent successfully to {recipient}")
         return {"status": "success", "recipient": recipient}
@@ -29,71 +218,151 @@ def send_email_notification(self, recipient, subject, body):
         logger.error(f"Failed to send email to {recipient}: {str(e)}")
         raise self.retry(countdown=60, exc=e)
 
-@celery.task(bind=True)
-def process_bulk_data_import(self, data_file_path, user_id):
+@celery.task(bind=True, max_retries=3)
+def send_email_batch(self, messages):
     """
-    Example task for processing bulk data imports asynchronously.
+    Send a batch of email messages over pooled SMTP connections.
+
+    Messages that failed temporarily (4xx replies, lost connections) are
+    retried as a smaller batch; permanent rejections are reported only.
     """
-    try:
-        logger.info(f"Processing bulk import: {data_file_path} for user {user_id}")
+    logger.info(f"Sending batch of {len(messages)} emails")
+    result = send_emails(messages)
+    retryable = {f['recipient'] for f in result['failed'] if f['temporary']}
+    rejected = [f for f in result['failed'] if not f['temporary']]
+    logger.info(f"Email batch sent ({result['sent']} sent, {len(rejected)} rejected, {len(retryable)} to retry)")
+    if retryable and self.request.retries < self.max_retries:
+        raise self.retry(args=([m for m in messages if m['recipient'] in retryable],), countdown=60)
+    return {
+        "status": "sent",
+        "sent": result['sent'],
+        "failed": result['failed'][:MAX_REPORTED_ERRORS],
+    }
 
-        # Simulate processing
-        time.sleep(2)
+@celery.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def process_bulk_data_import(self, data_file_path, user_id, tenant_id=None):
+    """
+    Import students from a CSV or XLSX file.
 
-        # Here you would:
-        # - Read the file
-        # - Validate data
-        # - Import to database
-        # - Send completion notification
+    The file is read as a stream and written in IMPORT_CHUNK_SIZE chunks, each
+    in its own transaction, with PROGRESS updates after every chunk. A retry
+    resumes after the last committed chunk, with the counts so far carried in
+    the IMPORT_PROGRESS_HEADER header, so rows already imported are not
+    reported as existing. Counts against the tenant's heavy-job limit (see
+    tenant_job_slot).
+    """
+    from services import StudentService
+    from tenancy import set_current_tenant
 
-        logger.info(f"Bulk import completed: {data_file_path}")
-        return {"status": "completed", "file": data_file_path, "user_id": user_id}
+    # request.headers rather than request.get(): eager runs only fill the former
+    progress = (self.request.headers or {}).get(IMPORT_PROGRESS_HEADER) or {
+        'processed': 0, 'created': 0, 'error_count': 0, 'errors': [],
+    }
+    with tenant_job_slot(self, tenant_id):
+        try:
+            logger.info(f"Processing bulk import: {data_file_path} for user {user_id}"
+                        + (f" from row {progress['processed'] + 1}" if progress['processed'] else ""))
 
-    except Exception as e:
-        logger.error(f"Bulk import failed: {str(e)}")
-        raise self.retry(countdown=300, exc=e)  # Retry after 5 minutes
+            with app_context():
+                set_current_tenant(tenant_id)
+                total = count_import_rows(data_file_path)
+                rows = islice(enumerate(iter_import_rows(data_file_path), 1), progress['processed'], None)
+                for chunk in iter_chunks(rows, IMPORT_CHUNK_SIZE):
+                    chunk_created, chunk_errors = StudentService.import_students(chunk)
+                    progress = {
+                        'processed': progress['processed'] + len(chunk),
+                        'created': progress['created'] + chunk_created,
+                        'error_count': progress['error_count'] + len(chunk_errors),
+                        'errors': (progress['errors'] + chunk_errors)[:MAX_REPORTED_ERRORS],
+                    }
+                    report_progress(self, progress['processed'], total)
 
-@celery.task(bind=True)
-def generate_report(self, report_type, parameters):
+            logger.info(f"Bulk import completed: {data_file_path} "
+                        f"({progress['created']} created, {progress['error_count']} errors)")
+            return {
+                "status": "completed",
+                "file": data_file_path,
+                "user_id": user_id,
+                "total": progress['processed'],
+                "created": progress['created'],
+                "error_count": progress['error_count'],
+                "errors": progress['errors'],
+            }
+
+        except Exception as e:
+            logger.error(f"Bulk import failed after row {progress['processed']}: {str(e)}")
+            headers = {**(self.request.headers or {}), IMPORT_PROGRESS_HEADER: progress}
+            # Retry after 5 minutes
+            raise self.retry(countdown=300, exc=e, max_retries=failure_retries(self), headers=headers)
+
+@celery.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def generate_report(self, report_type, parameters, output_format='csv', tenant_id=None, cache_key=None):
     """
-    Example task for generating reports asynchronously.
+    Generate a report (see reports.py) as CSV, XLSX or PDF.
+
+    Rows are read and written REPORT_CHUNK_SIZE at a time, with PROGRESS
+    updates after every chunk; the finished file is stored under
+    REPORT_FOLDER and served by /api/tasks/reports/<filename>. With a
+    `cache_key` (see report_cache.py) the file is named after it, so
+    identical requests are served from it, and the in-flight claim on the
+    key is released when the run ends. Counts against the tenant's heavy-job
+    limit (see tenant_job_slot).
     """
-    try:
-        logger.info(f"Generating {report_type} report with params: {parameters}")
+    from reports import get_report_type, run_report
+    from report_cache import evict_reports, release_report
+    from tenancy import set_current_tenant
 
-        # Simulate report generation
-        time.sleep(3)
+    with tenant_job_slot(self, tenant_id):
+        try:
+            logger.info(f"Generating {report_type} report with params: {parameters}")
 
-        # Here you would:
-        # - Query database
-        # - Process data
-        # - Generate PDF/Excel
-        # - Save to storage
-        # - Send download link
+            with app_context():
+                set_current_tenant(tenant_id)
+                try:
+                    params = get_report_type(report_type).normalize(parameters or {})
+                    path, rows = run_report(
+                        report_type, params, output_format, name=cache_key or self.request.id,
+                        progress=lambda current, total: report_progress(self, current, total),
+                    )
+                finally:
+                    if cache_key and self.request.id:
+                        release_report(cache_key, self.request.id)
+                evict_reports(keep=path)
 
-        logger.info(f"Report generated: {report_type}")
-        return {"status": "generated", "report_type": report_type, "url": "download_url"}
+            filename = os.path.basename(path)
+            logger.info(f"Report generated: {report_type} ({rows} rows, {filename})")
+            return {
+                "status": "generated",
+                "report_type": report_type,
+                "format": output_format,
+                "rows": rows,
+                "file": filename,
+                "url": f"/api/tasks/reports/{filename}",
+            }
 
-    except Exception as e:
-        logger.error(f"Report generation failed: {str(e)}")
-        raise
+        except Exception as e:
+            logger.error(f"Report generation failed: {str(e)}")
+            raise
 
 @celery.task(bind=True)
 def cleanup_expired_data(self):
     """
     Periodic task to clean up expired data.
+
+    Moves attendance from closed school years to the cold archive (see
+    archive.py) and makes sure partitions exist for the current and next
+    school year.
     """
+    from archive import archive_closed_years
+
     try:
         logger.info("Starting cleanup of expired data")
 
-        # Here you would:
-        # - Delete old logs
-        # - Remove expired sessions
-        # - Clean up temporary files
-        # - Archive old data
+        with app_context():
+            attendance = archive_closed_years()
 
-        logger.info("Cleanup completed")
-        return {"status": "cleaned"}
+        logger.info(f"Cleanup completed ({attendance['archived_rows']} attendance rows archived)")
+        return {"status": "cleaned", "attendance": attendance}
 
     except Exception as e:
         logger.error(f"Cleanup failed: {str(e)}")
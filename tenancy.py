@@ -0,0 +1,178 @@
+"""Request-scoped tenant context and automatic tenant scoping.
+
+The tenant is resolved once per request from the X-Tenant-ID header against
+a per-process map of known tenants, refreshed every TENANT_CACHE_TTL
+seconds, and kept on `flask.g`. Access tokens carry their user's tenant:
+with the header they must match it, and without it the request is scoped
+to the token's tenant. While a tenant is set:
+
+- every ORM SELECT/UPDATE/DELETE gets `tenant_id = :tenant` added for each
+  tenant-owned model it touches (through `with_loader_criteria`, so joined
+  and lazy relationship loads issued from it are scoped too);
+- new objects flushed without a tenant_id are stamped with it.
+
+Without a tenant (a super admin's cross-tenant request, or a task run for
+no tenant), the session instead records the tenants of the rows it flushes
+(see `written_tenant_ids`), so caches keyed by tenant can be invalidated
+for the tenants that own the written rows.
+
+Core `insert()` statements bypass the flush, so services writing with
+executemany set `tenant_id` on their rows explicitly. Tokens of users
+outside any tenant are only accepted for super admins (active admins
+without a tenant); their requests without the header are the only unscoped
+authenticated ones (see `is_cross_tenant_request`). Anonymous requests
+without the header stay unscoped unless TENANT_REQUIRED is set. Code that
+must see every tenant passes the `all_tenants=True` execution option.
+"""
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event, select
+from sqlalchemy.orm import with_loader_criteria
+from models import db, Tenant, User, Student, Course, Class, Attendance, Grade, AttendanceMonthly, AttendanceClassDaily
+
+TENANT_HEADER = 'X-Tenant-ID'
+TENANT_SCOPED_MODELS = (User, Student, Course, Class, Attendance, Grade, AttendanceMonthly, AttendanceClassDaily)
+# Minimum seconds between reloads triggered by unknown tenant ids, so a
+# client sending bogus ids cannot turn every request into a tenants query.
+TENANT_MISS_RELOAD_INTERVAL = 1.0
+
+TenantInfo = namedtuple('TenantInfo', 'id name schema_name')
+
+
+class TenantMap:
+    """Per-process id -> TenantInfo map, loaded with one query."""
+
+    def __init__(self, ttl):
+        self._ttl = ttl
+        self._tenants = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id):
+        now = time.monotonic()
+        with self._lock:
+            age = now - self._loaded_at if self._loaded_at is not None else None
+            if age is None or age >= self._ttl or (
+                    tenant_id not in self._tenants and age >= TENANT_MISS_RELOAD_INTERVAL):
+                rows = db.session.execute(select(Tenant.id, Tenant.name, Tenant.schema_name)).all()
+                self._tenants = {row.id: TenantInfo(*row) for row in rows}
+                self._loaded_at = now
+            return self._tenants.get(tenant_id)
+
+    def clear(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+def current_tenant_id():
+    """Id of the tenant the current request or task is scoped to, or None."""
+    return g.get('tenant_id') if has_app_context() else None
+
+
+def current_tenant():
+    return g.get('tenant') if has_app_context() else None
+
+
+def set_current_tenant(tenant_id):
+    """Scope the current app context (e.g. a Celery task) to `tenant_id`."""
+    g.tenant_id = tenant_id
+    g.tenant = current_app.extensions['tenant_map'].get(tenant_id) if tenant_id is not None else None
+
+
+def is_cross_tenant_request():
+    """Whether the current request is a super admin's, unscoped by any tenant."""
+    return bool(g.get('all_tenants')) if has_app_context() else False
+
+
+def _is_super_admin(user_id):
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return False
+    row = db.session.execute(
+        select(User.user_type, User.is_active).where(User.id == user_id, User.tenant_id.is_(None)),
+        execution_options={'all_tenants': True},
+    ).first()
+    return row is not None and row.user_type == 1 and bool(row.is_active)
+
+
+def token_matches_tenant(jwt_data):
+    """Check a token against the request's tenant, scoping the request by the token.
+
+    A token is only valid for the tenant it was issued for; a request without
+    X-Tenant-ID is scoped to that tenant. Tokens issued without a tenant are
+    only valid for super admins.
+    """
+    token_tenant_id = jwt_data.get('tenant_id')
+    if token_tenant_id is None:
+        if not _is_super_admin(jwt_data.get(current_app.config['JWT_IDENTITY_CLAIM'])):
+            return False
+        g.all_tenants = current_tenant_id() is None
+        return True
+    if current_tenant_id() is None:
+        set_current_tenant(token_tenant_id)
+    return token_tenant_id == current_tenant_id()
+
+
+def _resolve_request_tenant():
+    from utils import error_response
+
+    g.tenant_id = g.tenant = None
+    g.all_tenants = False
+    if request.method == 'OPTIONS':
+        return None
+    raw = request.headers.get(TENANT_HEADER, '').strip()
+    if not raw:
+        if current_app.config.get('TENANT_REQUIRED') and request.path.startswith('/api/'):
+            return error_response(f'{TENANT_HEADER} header is required', 400)
+        return None
+    tenant = current_app.extensions['tenant_map'].get(int(raw)) if raw.isdigit() else None
+    if tenant is None:
+        return error_response('Unknown tenant', 404)
+    g.tenant_id = tenant.id
+    g.tenant = tenant
+    return None
+
+
+def _scope_to_tenant(state):
+    tenant_id = current_tenant_id()
+    if tenant_id is None or state.execution_options.get('all_tenants', False):
+        return
+    if not (state.is_select or state.is_update or state.is_delete):
+        return
+    if state.is_column_load or state.is_relationship_load:
+        return  # Refreshes and lazy loads inherit criteria from the statement that loaded the parent
+    state.statement = state.statement.options(*(
+        with_loader_criteria(model, lambda cls: cls.tenant_id == tenant_id, include_aliases=True)
+        for model in TENANT_SCOPED_MODELS
+    ))
+
+
+def _stamp_new_objects(session, flush_context, instances):
+    tenant_id = current_tenant_id()
+    if tenant_id is None:
+        written = session.info.setdefault('written_tenants', set())
+        written.update(
+            obj.tenant_id for obj in (*session.new, *session.dirty, *session.deleted)
+            if isinstance(obj, TENANT_SCOPED_MODELS) and obj.tenant_id is not None
+        )
+        return
+    for obj in session.new:
+        if isinstance(obj, TENANT_SCOPED_MODELS) and obj.tenant_id is None:
+            obj.tenant_id = tenant_id
+
+
+def written_tenant_ids():
+    """Tenants owning rows this session flushed while no tenant was set."""
+    return db.session.info.get('written_tenants', set())
+
+
+def init_tenancy(app):
+    """Install tenant resolution and the ORM scoping hooks on `app`."""
+    app.extensions['tenant_map'] = TenantMap(app.config.get('TENANT_CACHE_TTL', 60))
+    app.before_request(_resolve_request_tenant)
+    if not event.contains(db.session, 'do_orm_execute', _scope_to_tenant):
+        event.listen(db.session, 'do_orm_execute', _scope_to_tenant)
+        event.listen(db.session, 'before_flush', _stamp_new_objects)
@@ -0,0 +1,134 @@
+"""Fixtures shared by the test suite.
+
+app.py configures the app from the environment when it is imported, so the
+test settings are exported first: an in-memory SQLite database, no Redis
+(every shared store uses its in-process fallback), no Celery broker and
+inline password hashing.
+"""
+import os
+from contextlib import contextmanager
+
+os.environ.update({
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'SQLALCHEMY_REPLICA_URIS': '',
+    'REDIS_URL': '',
+    'CELERY_BROKER_URL': '',
+    'PASSWORD_HASH_WORKERS': '0',
+    'TENANT_REQUIRED': 'false',
+})
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+import utils
+from app import app as flask_app
+from entity_cache import init_entity_cache
+from grade_stats import init_grade_stats
+from models import db, Class, Student, Tenant, User
+from replicas import InMemoryPinStore
+from versions import init_version_store
+
+
+@pytest.fixture
+def app():
+    """The app over an empty schema, with every per-process cache reset."""
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.create_all()
+    init_version_store(flask_app)
+    init_entity_cache(flask_app)
+    init_grade_stats(flask_app)
+    flask_app.extensions['tenant_map'].clear()
+    utils._role_cache.clear()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create a user (and its tenant, if new); returns the user's id."""
+    def make(email, user_type=1, tenant_id=None, **fields):
+        with app.app_context():
+            if tenant_id is not None and db.session.get(Tenant, tenant_id) is None:
+                db.session.add(Tenant(id=tenant_id, name=f'Tenant {tenant_id}', schema_name=f'tenant_{tenant_id}'))
+            user = User(email=email, user_type=user_type, tenant_id=tenant_id, **fields)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Authorization headers for a user id, as issued by /api/auth/login."""
+    def headers(user_id, tenant_header=None):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            token = create_access_token(identity=str(user.id), additional_claims={'tenant_id': user.tenant_id})
+        result = {'Authorization': f'Bearer {token}'}
+        if tenant_header is not None:
+            result['X-Tenant-ID'] = str(tenant_header)
+        return result
+    return headers
+
+
+@pytest.fixture
+def school(app, make_user, auth_headers):
+    """An admin's headers, a class id and two student ids in tenant 1."""
+    admin = make_user('admin@one.test', tenant_id=1)
+    with app.app_context():
+        class_obj = Class(name='7A', tenant_id=1)
+        students = [Student(student_id=f'S{i}', tenant_id=1) for i in range(2)]
+        db.session.add_all([class_obj, *students])
+        db.session.commit()
+        return auth_headers(admin), class_obj.id, [s.id for s in students]
+
+
+@pytest.fixture
+def lagging_replica(app, monkeypatch):
+    """Route reads to a replica that only sees the primary as of its last `sync()`."""
+    replica = create_engine('sqlite://', poolclass=StaticPool)
+    with app.app_context():
+        primary = db.engine
+        engines = db.engines
+
+    def sync():
+        with primary.connect() as source, replica.connect() as target:
+            source.connection.driver_connection.backup(target.connection.driver_connection)
+
+    sync()
+    engines['replica_0'] = replica
+    monkeypatch.setitem(app.extensions, 'replica_keys', ['replica_0'])
+    monkeypatch.setitem(app.extensions, 'replica_pins', InMemoryPinStore())
+    yield sync
+    del engines['replica_0']
+    replica.dispose()
+
+
+@pytest.fixture
+def count_statements(app):
+    """Context manager collecting the SQL statements the primary executes."""
+    @contextmanager
+    def count():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+    return count
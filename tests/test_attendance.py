@@ -0,0 +1,62 @@
+import pytest
+
+from models import AttendanceMonthly
+
+
+def monthly_counts(app):
+    with app.app_context():
+        return sorted((r.student_id, r.present, r.absent, r.late) for r in AttendanceMonthly.query.all())
+
+
+def roll_call(client, headers, class_id, records, date='2024-09-02'):
+    return client.post('/api/attendance/attendance/roll-call', headers=headers,
+                       json={'class_id': class_id, 'date': date, 'records': records})
+
+
+@pytest.mark.parametrize('records', [
+    ['not a record'],
+    [{'student_id': 'abc'}],
+    [{'student_id': 1, 'status': 'sick'}],
+    {'student_id': 1},
+])
+def test_roll_call_rejects_malformed_records(client, school, records):
+    headers, class_id, _ = school
+    response = roll_call(client, headers, class_id, records)
+    assert response.status_code == 400
+
+
+def test_roll_call_rejects_unknown_students_and_classes(client, school):
+    headers, class_id, (student, _) = school
+    assert roll_call(client, headers, class_id, [{'student_id': student}, {'student_id': 999}]).status_code == 400
+    assert roll_call(client, headers, 999, [{'student_id': student}]).status_code == 400
+
+
+def test_roll_call_with_string_ids_updates_instead_of_double_counting(app, client, school):
+    headers, class_id, (first, second) = school
+    assert roll_call(client, headers, class_id, [{'student_id': first}, {'student_id': second}]).status_code == 200
+    response = roll_call(client, headers, str(class_id), [{'student_id': str(first), 'status': 'absent'}])
+    assert response.status_code == 200
+
+    assert monthly_counts(app) == [(first, 0, 1, 0), (second, 1, 0, 0)]
+
+
+def test_create_attendance_maps_only_duplicates_to_conflict(client, school):
+    headers, class_id, (student, _) = school
+    record = {'student_id': student, 'class_id': class_id, 'date': '2024-09-02'}
+    assert client.post('/api/attendance/attendance', json=record, headers=headers).status_code == 201
+    assert client.post('/api/attendance/attendance', json=record, headers=headers).status_code == 409
+    missing_date = {'student_id': student, 'class_id': class_id}
+    assert client.post('/api/attendance/attendance', json=missing_date, headers=headers).status_code == 400
+
+
+def test_update_attendance_onto_existing_date_conflicts(app, client, school):
+    headers, class_id, (student, _) = school
+    roll_call(client, headers, class_id, [{'student_id': student}], date='2024-09-02')
+    created = client.post('/api/attendance/attendance', headers=headers,
+                          json={'student_id': student, 'class_id': class_id, 'date': '2024-09-03'})
+    attendance_id = created.get_json()['data']['attendance']['id']
+
+    response = client.put('/api/attendance/attendance', json={'id': attendance_id, 'date': '2024-09-02'},
+                          headers=headers)
+    assert response.status_code == 409
+    assert monthly_counts(app) == [(student, 2, 0, 0)]
@@ -0,0 +1,84 @@
+"""Bulk student import through process_bulk_data_import."""
+import csv
+
+import pytest
+
+import services
+import tasks
+from models import db, Student, User
+from tasks import process_bulk_data_import
+
+FIELDS = ['email', 'first_name', 'last_name', 'student_id', 'dob', 'parents']
+ROWS = [
+    {'email': 'ada@one.test', 'student_id': 'S1'},
+    {'email': '', 'student_id': 'S2'},
+    {'email': 'bob@one.test', 'student_id': 'S3', 'dob': '03/04/2010'},
+    {'email': 'ada@one.test', 'student_id': 'S4'},
+    {'email': 'taken@two.test', 'student_id': 'S5'},
+    {'email': 'cy@one.test', 'student_id': 'S6', 'dob': '2010-04-03'},
+]
+ERRORS = [
+    {'row': 2, 'error': 'email is required'},
+    {'row': 3, 'error': 'dob must be in YYYY-MM-DD format'},
+    {'row': 4, 'error': 'Duplicate email or student_id in file'},
+    {'row': 5, 'error': 'Email already exists'},
+]
+
+
+@pytest.fixture
+def import_file(app, make_user, tmp_path):
+    make_user('admin@one.test', tenant_id=1)
+    make_user('taken@two.test', user_type=3, tenant_id=2)
+    path = tmp_path / 'students.csv'
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(ROWS)
+    return str(path)
+
+
+def imported_student_ids(app):
+    with app.app_context():
+        return db.session.execute(
+            db.select(Student.student_id).join(User).where(User.tenant_id == 1).order_by(Student.student_id)
+        ).scalars().all()
+
+
+def test_import_reports_invalid_and_duplicate_rows(app, import_file):
+    result = process_bulk_data_import(import_file, 1, tenant_id=1)
+
+    assert (result['total'], result['created'], result['error_count']) == (6, 2, 4)
+    assert result['errors'] == ERRORS
+    assert imported_student_ids(app) == ['S1', 'S6']
+
+
+def test_retry_resumes_after_last_committed_chunk(app, import_file, monkeypatch):
+    monkeypatch.setattr(tasks, 'IMPORT_CHUNK_SIZE', 2)
+    import_students = services.StudentService.import_students
+    calls = []
+
+    def fail_third_chunk(rows):
+        calls.append([number for number, _ in rows])
+        if len(calls) == 3:
+            raise RuntimeError('database went away')
+        return import_students(rows)
+
+    monkeypatch.setattr(services.StudentService, 'import_students', staticmethod(fail_third_chunk))
+    result = process_bulk_data_import.apply((import_file, 1), {'tenant_id': 1}).get()
+
+    assert calls == [[1, 2], [3, 4], [5, 6], [5, 6]]
+    assert (result['total'], result['created'], result['error_count']) == (6, 2, 4)
+    # Row 4 repeats row 1 from an earlier (committed) chunk
+    assert result['errors'] == ERRORS[:2] + [{'row': 4, 'error': 'Email already exists'}] + ERRORS[3:]
+    assert imported_student_ids(app) == ['S1', 'S6']
+
+
+def test_rows_taken_by_a_concurrent_write_fail_alone(app, import_file, monkeypatch):
+    # The existence check misses a row another request inserts before the chunk commits
+    monkeypatch.setattr(services, 'taken_values', lambda column, values: set())
+
+    result = process_bulk_data_import(import_file, 1, tenant_id=1)
+
+    assert result['created'] == 2
+    assert result['errors'] == ERRORS[:3] + [{'row': 5, 'error': 'Email or student_id already exists'}]
+    assert imported_student_ids(app) == ['S1', 'S6']
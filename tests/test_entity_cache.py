@@ -0,0 +1,127 @@
+import pytest
+
+import entity_cache
+from entity_cache import EntityCache, LRUTier, RedisTier, cached_get
+from models import db, Course
+from services import CourseService
+
+
+class FakeRedis:
+    """The few Redis commands the entity cache's shared tier uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self._commands.append((name, args, kwargs))
+
+    def execute(self):
+        for name, args, kwargs in self._commands:
+            getattr(self._client, name)(*args, **kwargs)
+
+
+def worker_cache(redis_client):
+    """One worker's cache: its own local tier over the shared Redis tier."""
+    return EntityCache(LRUTier(100, 30), RedisTier(redis_client, 300))
+
+
+@pytest.fixture
+def shared_redis(app, monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setitem(app.extensions, 'entity_cache', worker_cache(client))
+    return client
+
+
+@pytest.fixture
+def course_id(app):
+    with app.app_context():
+        course = Course(name='Algebra', code='ALG', tenant_id=1)
+        db.session.add(course)
+        db.session.commit()
+        return course.id
+
+
+def course_response(client, course_id, headers):
+    return client.get(f'/api/courses/course/{course_id}', headers=headers)
+
+
+@pytest.mark.parametrize('tiers', ['local', 'shared'])
+def test_update_and_delete_invalidate_cached_entity(app, client, school, course_id, request, tiers):
+    if tiers == 'shared':
+        request.getfixturevalue('shared_redis')
+    headers = school[0]
+    assert course_response(client, course_id, headers).get_json()['data']['course']['name'] == 'Algebra'
+    assert course_response(client, course_id, headers).status_code == 200
+    assert app.extensions['entity_cache'].stats['local_hits'] == 1
+
+    assert client.put('/api/courses/course', json={'id': course_id, 'name': 'Algebra II'},
+                      headers=headers).status_code == 200
+    assert course_response(client, course_id, headers).get_json()['data']['course']['name'] == 'Algebra II'
+
+    assert client.delete(f'/api/courses/course/{course_id}', headers=headers).status_code == 200
+    assert course_response(client, course_id, headers).status_code == 404
+
+
+def test_redis_tier_ignores_fill_read_before_invalidation():
+    redis_client = FakeRedis()
+    reader, writer, other = (worker_cache(redis_client) for _ in range(3))
+
+    # The reader takes its token and reads the old row; meanwhile another
+    # worker commits a write and invalidates; only then does the fill land.
+    token = reader.fill_token(Course, 1)
+    writer.invalidate(Course, 1)
+    reader.set_state(Course, 1, {'id': 1, 'name': 'Algebra'}, token)
+
+    assert other.get_state(Course, 1) is None
+    assert writer.get_state(Course, 1) is None
+
+    other.set_state(Course, 1, {'id': 1, 'name': 'Algebra II'}, other.fill_token(Course, 1))
+    assert worker_cache(redis_client).get_state(Course, 1) == {'id': 1, 'name': 'Algebra II'}
+
+
+@pytest.mark.parametrize('tiers', ['local', 'shared'])
+def test_write_during_in_flight_read_is_not_overwritten(app, course_id, monkeypatch, request, tiers):
+    if tiers == 'shared':
+        request.getfixturevalue('shared_redis')
+    column_state = entity_cache._column_state
+
+    def snapshot_then_write(obj):
+        # The miss has read the old row; a write commits and invalidates
+        # before the fill is stored.
+        state = column_state(obj)
+        monkeypatch.setattr(entity_cache, '_column_state', column_state)
+        CourseService.update_course({'id': course_id, 'name': 'Algebra II'})
+        return state
+
+    monkeypatch.setattr(entity_cache, '_column_state', snapshot_then_write)
+    with app.app_context():
+        cached_get(Course, course_id)
+        cache = app.extensions['entity_cache']
+        assert cache.get_state(Course, course_id) is None
+
+    with app.app_context():
+        assert cached_get(Course, course_id).name == 'Algebra II'
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.mark.parametrize('url', [
+    '/api/students/students?class_id=abc',
+    '/api/classes/classes?course_id=1.5',
+    '/api/classes/classes?teacher_id=x',
+    '/api/grades/grades?student_id=abc',
+    '/api/grades/grades?course_id=abc',
+    '/api/grades/grades/stats?course_id=abc&term=Fall',
+    '/api/grades/grades/gpa?term=Fall&student_id=abc',
+    '/api/grades/grades/export?course_id=abc',
+    '/api/attendance/attendance?class_id=abc',
+    '/api/attendance/attendance/export?student_id=abc',
+    '/api/attendance/attendance/analytics?class_id=abc',
+    '/api/attendance/attendance/archive?year=abc',
+    '/api/auth/users?user_type=admin',
+])
+def test_malformed_integer_filter_is_rejected(client, school, url):
+    response = client.get(url, headers=school[0])
+    assert response.status_code == 400
+    assert 'must be an integer' in response.get_json()['error']
+
+
+def test_blank_filter_means_unfiltered(client, school):
+    response = client.get('/api/students/students?class_id=', headers=school[0])
+    assert response.status_code == 200
+    assert len(response.get_json()['data']['students']) == 2
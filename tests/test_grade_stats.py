@@ -0,0 +1,84 @@
+"""Grade statistics against hand-computed values, and their invalidation."""
+import pytest
+
+from models import db, Course, Grade, Student
+
+pytest.importorskip('numpy')
+
+TERM = 'Fall 2026'
+# Per-student scores in course 1: the mean of each student's grades
+SCORES = {'G1': (80, 90), 'G2': (70,), 'G3': (60,), 'G4': (100,)}
+SECOND_COURSE = {'G1': 95, 'G2': 85}
+
+
+@pytest.fixture
+def graded(app, school):
+    """Admin headers, the two course ids and student ids by student number."""
+    headers = school[0]
+    with app.app_context():
+        courses = [Course(name='Algebra', code='ALG', tenant_id=1), Course(name='Biology', code='BIO', tenant_id=1)]
+        students = {number: Student(student_id=number, tenant_id=1) for number in SCORES}
+        db.session.add_all([*courses, *students.values()])
+        db.session.flush()
+        db.session.add_all([
+            Grade(student_id=students[number].id, course_id=courses[0].id, grade=grade, term=TERM, tenant_id=1)
+            for number, grades in SCORES.items() for grade in grades
+        ] + [
+            Grade(student_id=students[number].id, course_id=courses[1].id, grade=grade, term=TERM, tenant_id=1)
+            for number, grade in SECOND_COURSE.items()
+        ])
+        db.session.commit()
+        return headers, [c.id for c in courses], {number: s.id for number, s in students.items()}
+
+
+def stats(client, headers, course_id):
+    response = client.get(f'/api/grades/grades/stats?course_id={course_id}&term={TERM}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['data']
+
+
+def test_course_term_stats(client, graded):
+    headers, (course_id, _), ids = graded
+    result = stats(client, headers, course_id)
+
+    # scores 85, 70, 60, 100
+    assert (result['grade_count'], result['student_count']) == (5, 4)
+    assert (result['mean'], result['median'], result['stddev']) == (78.75, 77.5, 15.16)
+    assert (result['min'], result['max']) == (60, 100)
+    assert result['percentiles'] == {'p10': 63.0, 'p25': 67.5, 'p75': 88.75, 'p90': 95.5}
+    assert result['histogram'] == {
+        'bin_edges': [float(edge) for edge in range(0, 101, 10)],
+        'counts': [0, 0, 0, 0, 0, 0, 1, 1, 1, 1],
+    }
+    assert sorted((r['student_id'], r['score'], r['percentile_rank']) for r in result['percentile_ranks']) == sorted([
+        (ids['G1'], 85.0, 62.5), (ids['G2'], 70.0, 37.5), (ids['G3'], 60.0, 12.5), (ids['G4'], 100.0, 87.5),
+    ])
+
+
+def test_term_gpa(client, graded):
+    headers, _, ids = graded
+    response = client.get(f'/api/grades/grades/gpa?term={TERM}', headers=headers)
+    result = response.get_json()['data']
+
+    # G1: 85 -> 3.0 and 95 -> 4.0; G2: 70 -> 2.0 and 85 -> 3.0; G3: 60 -> 1.0; G4: 100 -> 4.0
+    assert (result['student_count'], result['mean_gpa']) == (4, 2.75)
+    assert sorted((s['student_id'], s['gpa'], s['courses']) for s in result['students']) == sorted([
+        (ids['G1'], 3.5, 2), (ids['G2'], 2.5, 2), (ids['G3'], 1.0, 1), (ids['G4'], 4.0, 1),
+    ])
+
+
+@pytest.mark.parametrize('writer', ['tenant admin', 'super admin'])
+def test_grade_write_invalidates_cached_stats(client, make_user, auth_headers, graded, writer):
+    headers, (course_id, _), ids = graded
+    assert stats(client, headers, course_id)['mean'] == 78.75
+    with client.application.app_context():
+        grade_id = db.session.execute(db.select(Grade.id).where(
+            Grade.student_id == ids['G3'], Grade.course_id == course_id)).scalar_one()
+
+    # A super admin writes without X-Tenant-ID, so the request has no tenant
+    write_headers = headers if writer == 'tenant admin' else auth_headers(make_user('root@platform.test'))
+    response = client.put('/api/grades/grade', json={'id': grade_id, 'value': 80}, headers=write_headers)
+    assert response.status_code == 200
+
+    # scores 85, 70, 80, 100
+    assert stats(client, headers, course_id)['mean'] == 83.75
@@ -0,0 +1,71 @@
+import os
+import signal
+import time
+
+from flask import Flask
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from hashing import HashingBusyError, HashingPool, init_hashing
+from models import db, User
+from services import AuthService
+
+
+def test_pod_budget_is_split_across_gunicorn_workers():
+    app = Flask(__name__)
+    app.config.update(WEB_CONCURRENCY=4, PASSWORD_HASH_WORKERS=8, PASSWORD_HASH_QUEUE_DEPTH=32)
+    pool = init_hashing(app)
+    assert pool.processes == 2
+    assert app.extensions['hashing'] is pool
+
+    app.config.update(WEB_CONCURRENCY=16)
+    assert init_hashing(app).processes == 1
+    app.config.update(PASSWORD_HASH_WORKERS=0)
+    assert init_hashing(app).processes == 0
+
+
+def test_busy_pool_does_not_fail_login_that_needs_rehash(app, make_user, monkeypatch):
+    user_id = make_user('old@one.test', tenant_id=1)
+    with app.app_context():
+        old_hash = generate_password_hash('secret', 'pbkdf2:sha256:1000')
+        db.session.get(User, user_id).password_hash = old_hash
+        db.session.commit()
+
+    def busy_hash(password):
+        raise HashingBusyError('Password hashing queue is full')
+
+    monkeypatch.setattr('models.hash_password', busy_hash)
+    with app.app_context():
+        user = AuthService.authenticate_user('old@one.test', 'secret')
+        assert user is not None and user.id == user_id
+        assert db.session.get(User, user_id).password_hash == old_hash
+
+
+def test_pool_is_rebuilt_after_a_worker_process_dies():
+    pool = HashingPool(1, 4, 'pbkdf2:sha256:1000')
+    try:
+        assert check_password_hash(pool.run(generate_password_hash, 'a', pool.method), 'a')
+        broken = pool.executor()
+        for process in list(broken._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        time.sleep(0.2)
+        assert check_password_hash(pool.run(generate_password_hash, 'b', pool.method), 'b')
+        assert pool.executor() is not broken
+    finally:
+        pool.executor().shutdown()
+
+
+def test_busy_pool_answers_password_writes_with_503(app, client, school, monkeypatch):
+    def busy_hash(password):
+        raise HashingBusyError('Password hashing queue is full')
+
+    monkeypatch.setattr('models.hash_password', busy_hash)
+    requests = [
+        ('/api/auth/register', {'email': 'new@one.test', 'password': 'secret'}, {}),
+        ('/api/students/students', {'user': {'email': 'pupil@one.test', 'password': 'secret'}}, school[0]),
+    ]
+    for url, payload, headers in requests:
+        response = client.post(url, json=payload, headers=headers)
+        assert response.status_code == 503, url
+        assert response.headers['Retry-After'] == '1'
+    with app.app_context():
+        assert User.query.filter(User.email.in_(['new@one.test', 'pupil@one.test'])).count() == 0
@@ -0,0 +1,94 @@
+"""Pooled batch mailer against a local aiosmtpd server."""
+import socket
+import threading
+import time
+
+import pytest
+
+from mailer import BatchMailer, DomainRateLimiter, SMTPConnectionPool
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+
+
+class Recorder:
+    """aiosmtpd handler keeping (client address, recipients, time) per message."""
+
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.messages.append((session.peer, envelope.rcpt_tos, time.monotonic()))
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    recorder = Recorder()
+    controller = aiosmtpd_controller.Controller(recorder, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    try:
+        yield recorder, controller.port
+    finally:
+        controller.stop()
+
+
+def make_mailer(port, size=2, rate=0, overrides=None, burst_size=5):
+    pool = SMTPConnectionPool('127.0.0.1', port, size=size, timeout=5)
+    return BatchMailer(pool, DomainRateLimiter(rate, overrides), 'school@one.test', burst_size), pool
+
+
+def messages(count, domain):
+    return [{'recipient': f'user{i}@{domain}', 'subject': 'Hi', 'body': 'Hello'} for i in range(count)]
+
+
+def test_bursts_reuse_pooled_connections(smtp_server):
+    recorder, port = smtp_server
+    mailer, pool = make_mailer(port, size=2)
+    try:
+        assert mailer.send(messages(20, 'a.test') + messages(20, 'b.test')) == {'sent': 40, 'failed': []}
+        assert mailer.send(messages(10, 'c.test'))['sent'] == 10
+    finally:
+        mailer.close()
+
+    assert len(recorder.messages) == 50
+    assert pool.opened <= pool.size
+    assert len({peer for peer, _, _ in recorder.messages}) == pool.opened
+
+
+def test_deliveries_are_rate_limited_per_domain(smtp_server):
+    recorder, port = smtp_server
+    # slow.test: a bucket of 10, then one message per 0.1 s; fast.test is unlimited
+    mailer, _ = make_mailer(port, size=1, overrides={'slow.test': 10}, burst_size=100)
+    try:
+        assert mailer.send(messages(15, 'slow.test') + messages(10, 'fast.test'))['sent'] == 25
+    finally:
+        mailer.close()
+
+    arrivals = {domain: [t for _, (rcpt,), t in recorder.messages if rcpt.endswith(domain)]
+                for domain in ('slow.test', 'fast.test')}
+    assert arrivals['slow.test'][-1] - arrivals['slow.test'][0] >= 0.4
+    assert arrivals['fast.test'][-1] - arrivals['fast.test'][0] < 0.4
+
+
+def test_broken_connection_is_discarded(smtp_server):
+    recorder, port = smtp_server
+    mailer, pool = make_mailer(port, size=1)
+    try:
+        assert mailer.send(messages(3, 'a.test'))['sent'] == 3
+        _, stale = pool._idle.queue[-1]
+        stale.close()  # the server dropped it while idle
+
+        assert mailer.send(messages(3, 'b.test')) == {'sent': 3, 'failed': []}
+        assert pool.opened == 2
+        assert [conn for _, conn in pool._idle.queue if conn is stale] == []
+    finally:
+        mailer.close()
+    assert len(recorder.messages) == 6
@@ -0,0 +1,14 @@
+def test_metrics_disabled_without_token(client):
+    assert client.get('/metrics').status_code == 404
+
+
+def test_metrics_require_the_token(app, client, make_user, auth_headers, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 's3cret')
+    admin = auth_headers(make_user('admin@one.test', tenant_id=1))
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers=admin).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert 'db_pool' in response.get_json()['data']
@@ -0,0 +1,60 @@
+"""The list endpoints eager-load what their serializers read.
+
+Each test counts the statements one page costs, then adds more rows and
+checks the count did not grow with them: a lazy load per row would.
+"""
+import pytest
+
+from models import db, Class, Course, Grade, Student, User
+
+
+@pytest.fixture
+def admin_headers(make_user, auth_headers):
+    return auth_headers(make_user('admin@one.test', user_type=1, tenant_id=1))
+
+
+@pytest.fixture
+def seed(app, admin_headers):
+    """Add `n` students, each with a user, a class (course + teacher) and a grade."""
+    created = {'n': 0}
+
+    def add(n):
+        with app.app_context():
+            for _ in range(n):
+                i = created['n'] = created['n'] + 1
+                user = User(email=f'student{i}@one.test', first_name='S', last_name=str(i), user_type=3, tenant_id=1)
+                teacher = User(email=f'teacher{i}@one.test', first_name='T', last_name=str(i), user_type=2, tenant_id=1)
+                course = Course(name=f'Course {i}', code=f'C{i}', tenant_id=1)
+                student = Student(user=user, student_id=f'N{i}', tenant_id=1)
+                db.session.add_all([
+                    user, teacher, course, student,
+                    Class(name=f'Class {i}', course=course, teacher=teacher, tenant_id=1),
+                    Grade(student=student, course=course, grade=90, term='Fall 2023', tenant_id=1),
+                ])
+            db.session.commit()
+    return add
+
+
+@pytest.mark.parametrize('url, key', [
+    ('/api/students/students', 'students'),
+    ('/api/classes/classes', 'classes'),
+    ('/api/grades/grades', 'grades'),
+])
+def test_list_page_statement_count_is_independent_of_rows(client, admin_headers, seed, count_statements, url, key):
+    headers = admin_headers
+    seed(2)
+    client.get(url, headers=headers)  # warm any per-user caches
+
+    with count_statements() as few:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    small = len(response.get_json()['data'][key])
+
+    seed(8)
+    with count_statements() as many:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()['data'][key]) > small
+
+    assert len(many) == len(few), many
+    assert len(few) <= 2, few
@@ -0,0 +1,135 @@
+"""Report result cache: single-flight claims, cache hits, age limit and eviction."""
+import os
+import time
+
+import pytest
+
+import app as app_module
+from report_cache import InMemoryInflightStore, RedisInflightStore, evict_reports, report_cache_key
+from tasks import celery
+from tenancy import set_current_tenant
+
+
+@pytest.fixture
+def queue(app, monkeypatch, tmp_path):
+    """Celery over the in-memory broker and result backend; nothing consumes the queue."""
+    previous = {key: celery.conf[key] for key in ('broker_url', 'result_backend')}
+    celery.conf.update(broker_url='memory://', result_backend='cache+memory://')
+    celery.close()
+    # The backend is cached per thread; replace one an earlier test created
+    monkeypatch.setattr(celery._local, 'backend', celery._get_backend(), raising=False)
+    monkeypatch.setattr(app_module, 'celery', celery)
+    monkeypatch.setitem(app.config, 'REPORT_FOLDER', str(tmp_path))
+    monkeypatch.setitem(app.extensions, 'report_inflight', InMemoryInflightStore())
+    yield
+    celery.control.purge()  # the memory broker outlives the test; later workers must not run these
+    celery.conf.update(previous)
+    celery.close()
+
+
+@pytest.fixture
+def request_report(client, school):
+    def post():
+        response = client.post('/api/tasks/test-report', json={'report_type': 'class_roster'}, headers=school[0])
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()['data']
+    return post
+
+
+def roster_path(app):
+    with app.app_context():
+        set_current_tenant(1)
+        key = report_cache_key('class_roster', {'class_id': None}, 'csv')
+    return os.path.join(app.config['REPORT_FOLDER'], 'tenant=1', f'{key}.csv')
+
+
+def test_identical_request_returns_running_task(queue, request_report):
+    first = request_report()
+    second = request_report()
+
+    assert second['task_id'] == first['task_id']
+    assert second['message'] == 'Identical report is already being generated'
+
+
+def test_claim_of_finished_task_is_taken_over(queue, request_report):
+    failed = request_report()['task_id']
+    celery.backend.mark_as_failure(failed, RuntimeError('worker crashed'))
+
+    retried = request_report()
+    assert retried['task_id'] != failed
+    assert retried['message'] == 'Report generation task queued successfully'
+    assert request_report()['task_id'] == retried['task_id']
+
+
+def test_finished_report_is_served_until_max_age(app, queue, request_report, monkeypatch):
+    path = roster_path(app)
+    os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write('roster\n')
+
+    hit = request_report()
+    assert (hit['cached'], hit['file']) == (True, os.path.basename(path))
+
+    monkeypatch.setitem(app.config, 'REPORT_CACHE_MAX_AGE', 60)
+    stale = time.time() - 120
+    os.utime(path, (stale, stale))
+    assert 'task_id' in request_report()
+
+
+def test_eviction_removes_least_recently_used_files(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'REPORT_FOLDER', str(tmp_path))
+    monkeypatch.setitem(app.config, 'REPORT_CACHE_MAX_BYTES', 250)
+    now = time.time()
+    paths = {}
+    for age, name in ((400, 'oldest'), (300, 'kept'), (200, 'old'), (100, 'newer'), (0, 'newest')):
+        paths[name] = tmp_path / 'tenant=1' / f'{name}.csv'
+        paths[name].parent.mkdir(exist_ok=True)
+        paths[name].write_bytes(b'x' * 100)
+        os.utime(paths[name], (now - age, now - age))
+    (tmp_path / 'tenant=1' / 'running.csv.incomplete').write_bytes(b'x' * 1000)
+
+    with app.app_context():
+        assert evict_reports(keep=str(paths['kept'])) == 3
+
+    assert sorted(p.name for p in (tmp_path / 'tenant=1').iterdir()) == ['kept.csv', 'newest.csv',
+                                                                          'running.csv.incomplete']
+
+
+class FakeRedis:
+    """SET NX/EX, GET and the in-flight store's release script."""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode()
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def register_script(self, script):
+        assert script == RedisInflightStore.RELEASE_SCRIPT
+
+        def release(keys, args):
+            if self.data.get(keys[0]) == str(args[0]).encode():
+                del self.data[keys[0]]
+                return 1
+            return 0
+        return release
+
+
+def test_redis_store_claims_once_and_releases_only_its_own_claim():
+    client = FakeRedis()
+    worker_a, worker_b = RedisInflightStore(client), RedisInflightStore(client)
+
+    assert worker_a.claim('key', 'task-a', 60) is None
+    assert worker_b.claim('key', 'task-b', 60) == 'task-a'
+
+    worker_b.release('key', 'task-b')  # not the holder: the claim stays
+    assert worker_b.claim('key', 'task-b', 60) == 'task-a'
+
+    worker_a.release('key', 'task-a')
+    assert worker_b.claim('key', 'task-b', 60) is None
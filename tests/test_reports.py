@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from report_cache import report_cache_key
+from services import AuthService
+from tenancy import set_current_tenant
+
+
+@pytest.fixture
+def report_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'REPORT_FOLDER', str(tmp_path))
+    for tenant in (1, 2):
+        os.makedirs(tmp_path / f'tenant={tenant}')
+        (tmp_path / f'tenant={tenant}' / f'roster-{tenant}.csv').write_text(f'tenant {tenant}\n')
+    return tmp_path
+
+
+def test_students_cannot_generate_or_download_reports(client, make_user, auth_headers, report_folder):
+    student = auth_headers(make_user('student@one.test', user_type=3, tenant_id=1))
+
+    assert client.post('/api/tasks/test-report', json={}, headers=student).status_code == 403
+    assert client.get('/api/tasks/reports/roster-1.csv', headers=student).status_code == 403
+
+
+def test_download_is_confined_to_token_tenant(client, make_user, auth_headers, report_folder):
+    make_user('admin2@two.test', tenant_id=2)
+    teacher = auth_headers(make_user('teacher@one.test', user_type=2, tenant_id=1))
+
+    response = client.get('/api/tasks/reports/roster-1.csv', headers=teacher)
+    assert response.status_code == 200
+    assert response.data == b'tenant 1\n'
+    assert client.get('/api/tasks/reports/roster-2.csv', headers=teacher).status_code == 404
+    assert client.get('/api/tasks/reports/..%2Ftenant=2%2Froster-2.csv', headers=teacher).status_code == 404
+
+
+def test_reports_require_a_tenant(client, make_user, auth_headers, report_folder):
+    make_user('admin1@one.test', tenant_id=1)
+    root = auth_headers(make_user('root@platform.test'))
+
+    assert client.post('/api/tasks/test-report', json={}, headers=root).status_code == 400
+    assert client.get('/api/tasks/reports/roster-1.csv', headers=root).status_code == 400
+    assert client.get('/api/tasks/reports/roster-1.csv', headers={**root, 'X-Tenant-ID': '1'}).status_code == 200
+
+
+@pytest.mark.parametrize('report_type, params', [
+    ('class_roster', {'class_id': None}),
+    ('attendance_summary', {'class_id': None, 'date_from': None, 'date_to': None}),
+    ('term_grades', {'term': 'Fall 2023', 'course_id': None}),
+])
+def test_user_changes_invalidate_cached_reports(app, make_user, report_type, params):
+    user_id = make_user('teacher@one.test', user_type=2, tenant_id=1)
+    with app.app_context():
+        set_current_tenant(1)
+        before = report_cache_key(report_type, params, 'csv')
+        AuthService.update_user(user_id, {'last_name': 'Renamed'})
+        renamed = report_cache_key(report_type, params, 'csv')
+        AuthService.delete_user(user_id)
+        deleted = report_cache_key(report_type, params, 'csv')
+    assert len({before, renamed, deleted}) == 3
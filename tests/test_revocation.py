@@ -0,0 +1,98 @@
+"""The shared Redis revocation store, against a fake Redis client."""
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+import revocation
+from revocation import RedisRevocationStore
+
+
+class FakeRedis:
+    """The Redis commands the revocation store uses, with expiry on a fake clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}  # key -> expires at (clock.time())
+        self.down = False
+
+    def set(self, key, value, ex=None):
+        self.data[key] = self.clock.now + ex
+
+    def exists(self, key):
+        if self.down:
+            raise revocation.redis.RedisError('Connection refused')
+        return int(self.data.get(key, 0) > self.clock.now)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(revocation, 'time', clock)
+    if revocation.redis is None:  # redis-py not installed: only its exception type is needed
+        monkeypatch.setattr(revocation, 'redis', SimpleNamespace(RedisError=type('RedisError', (Exception,), {})))
+    return clock
+
+
+@pytest.fixture
+def redis_client(clock):
+    return FakeRedis(clock)
+
+
+def test_token_revoked_on_one_worker_is_rejected_on_another(clock, redis_client):
+    worker_a, worker_b = RedisRevocationStore(redis_client), RedisRevocationStore(redis_client)
+
+    worker_a.revoke('jti-1', expires_at=clock.now + 900)
+
+    assert worker_b.is_revoked('jti-1')
+    assert not worker_b.is_revoked('jti-2')
+    clock.now += 901  # the key expires with the token
+    assert not worker_b.is_revoked('jti-1')
+
+
+def test_negative_answer_is_cached_until_its_ttl_expires(clock, redis_client):
+    worker_a, worker_b = RedisRevocationStore(redis_client), RedisRevocationStore(redis_client, negative_ttl=5)
+    assert not worker_b.is_revoked('jti-1')
+
+    worker_a.revoke('jti-1', expires_at=clock.now + 900)
+    clock.now += 4
+    assert not worker_b.is_revoked('jti-1')  # served from the local negative cache
+    clock.now += 1
+    assert worker_b.is_revoked('jti-1')
+
+
+def test_revoking_locally_clears_the_negative_cache(clock, redis_client):
+    worker = RedisRevocationStore(redis_client)
+    assert not worker.is_revoked('jti-1')
+
+    worker.revoke('jti-1', expires_at=clock.now + 900)
+    assert worker.is_revoked('jti-1')
+
+
+def test_expired_token_is_not_stored(clock, redis_client):
+    RedisRevocationStore(redis_client).revoke('jti-1', expires_at=clock.now - 1)
+    assert redis_client.data == {}
+
+
+def test_redis_outage_fails_open_without_caching(clock, redis_client, caplog):
+    worker = RedisRevocationStore(redis_client)
+    worker.revoke('jti-1', expires_at=clock.now + 900)
+    redis_client.down = True
+
+    with caplog.at_level(logging.WARNING, logger='revocation'):
+        assert not worker.is_revoked('jti-1')
+    assert 'Revocation lookup failed' in caplog.text
+
+    redis_client.down = False
+    assert worker.is_revoked('jti-1')  # the outage's answer was not cached
@@ -0,0 +1,31 @@
+import utils
+from models import User
+from services import AuthService
+
+
+def role_lookups(statements):
+    return [s for s in statements if 'FROM users' in s and 'users.id = ' in s]
+
+
+def test_warm_protected_request_skips_role_query(app, client, make_user, auth_headers, count_statements):
+    headers = auth_headers(make_user('admin@one.test', tenant_id=1))
+    client.get('/api/auth/users', headers=headers)  # load the tenant map
+    utils._role_cache.clear()
+    with count_statements() as cold:
+        assert client.get('/api/courses/courses', headers=headers).status_code == 200
+    with count_statements() as warm:
+        assert client.get('/api/courses/courses', headers=headers).status_code == 200
+
+    assert len(role_lookups(cold)) == 1
+    assert role_lookups(warm) == []
+    assert len(warm) == len(cold) - 1
+
+
+def test_demotion_applies_on_next_request(app, client, make_user, auth_headers):
+    admin_id = make_user('admin@one.test', tenant_id=1)
+    headers = auth_headers(admin_id)
+    assert client.get('/api/courses/courses', headers=headers).status_code == 200
+
+    with app.app_context():
+        AuthService.update_user(admin_id, {'user_type': 2})
+    assert client.get('/api/courses/courses', headers=headers).status_code == 403
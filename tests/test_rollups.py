@@ -0,0 +1,55 @@
+from datetime import date
+
+from archive import archive_closed_years, hot_cutoff
+from models import db, Attendance, AttendanceMonthly
+from rollups import apply_attendance_changes
+from services import AttendanceService
+
+
+def monthly_counts(app):
+    with app.app_context():
+        return sorted((r.student_id, r.present, r.absent, r.late) for r in AttendanceMonthly.query.all())
+
+
+def test_roll_call_racing_another_insert_counts_the_row_once(app, client, school, monkeypatch):
+    headers, class_id, (student, _) = school
+    lock_existing = AttendanceService._lock_existing
+    raced = []
+
+    def lock_then_lose_race(class_id, day, student_ids):
+        found = lock_existing(class_id, day, student_ids)
+        if not raced:
+            # Another roll-call inserts (and counts) the row right after ours looked
+            raced.append(True)
+            db.session.add(Attendance(student_id=student, class_id=class_id, date=day, status='present', tenant_id=1))
+            db.session.flush()
+            apply_attendance_changes([(1, student, class_id, day, 'present', 1)])
+        return found
+
+    monkeypatch.setattr(AttendanceService, '_lock_existing', staticmethod(lock_then_lose_race))
+    response = client.post('/api/attendance/attendance/roll-call', headers=headers, json={
+        'class_id': class_id, 'date': '2024-09-02', 'records': [{'student_id': student, 'status': 'absent'}],
+    })
+    assert response.status_code == 200
+    assert monthly_counts(app) == [(student, 0, 1, 0)]
+
+
+def test_rates_over_archived_partial_months_come_from_rollups(app, client, school, monkeypatch, tmp_path):
+    headers, class_id, (student, _) = school
+    monkeypatch.setitem(app.config, 'ARCHIVE_FOLDER', str(tmp_path))
+    with app.app_context():
+        year = hot_cutoff().year - 2
+    for day in (10, 20):
+        client.post('/api/attendance/attendance/roll-call', headers=headers, json={
+            'class_id': class_id, 'date': f'{year}-09-{day}', 'records': [{'student_id': student}],
+        })
+    with app.app_context():
+        assert archive_closed_years()['archived_rows'] == 2
+        assert Attendance.query.count() == 0
+
+    response = client.get('/api/attendance/attendance/analytics', headers=headers, query_string={
+        'group_by': 'student', 'date_from': date(year, 9, 15).isoformat(), 'date_to': date(year, 10, 20).isoformat(),
+    })
+    assert response.status_code == 200
+    (rates,) = response.get_json()['data']['rates']
+    assert (rates['student_id'], rates['present'], rates['total']) == (student, 2, 2)
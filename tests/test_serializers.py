@@ -0,0 +1,87 @@
+"""Compiled serializers against the hand-written dicts the routes used to build."""
+from datetime import date
+
+import pytest
+
+from models import db, Attendance, Class, Course, Grade, Student, User
+from serializers import ATTENDANCE, CLASS, COURSE, GRADE, STUDENT, USER, dumps_bytes, get_serializer
+from utils import success_response
+
+
+def full_name(user):
+    return f'{user.first_name or ""} {user.last_name or ""}'.strip() if user else None
+
+
+HAND_WRITTEN = {
+    User: lambda u: {'id': u.id, 'email': u.email, 'first_name': u.first_name, 'last_name': u.last_name,
+                     'user_type': u.user_type},
+    Student: lambda s: {'id': s.id, 'first_name': s.user.first_name if s.user else None,
+                        'last_name': s.user.last_name if s.user else None,
+                        'email': s.user.email if s.user else None},
+    Course: lambda c: {'id': c.id, 'name': c.name, 'description': c.description},
+    Class: lambda c: {'id': c.id, 'name': c.name, 'course_id': c.course_id,
+                      'course_name': c.course.name if c.course else None, 'teacher_id': c.teacher_id,
+                      'teacher_name': full_name(c.teacher), 'schedule': c.schedule},
+    Attendance: lambda a: {'id': a.id, 'class_id': a.class_id, 'student_id': a.student_id, 'status': a.status},
+    Grade: lambda g: {'id': g.id, 'student_id': g.student_id, 'course_id': g.course_id,
+                      'course_name': g.course.name if g.course else None, 'term': g.term, 'value': g.grade},
+}
+SERIALIZERS = [USER, STUDENT, COURSE, CLASS, ATTENDANCE, GRADE]
+
+
+@pytest.fixture
+def rows(app):
+    with app.app_context():
+        teacher = User(email='t@one.test', first_name='Tess', last_name=None, user_type=2)
+        user = User(email='s@one.test', first_name='Sam', last_name='Ng', user_type=3)
+        course = Course(name='Algebra', code='ALG', description='Équations')
+        student = Student(user=user, student_id='S1')
+        orphan = Student(student_id='S2')
+        class_ = Class(name='7A', course=course, teacher=teacher, schedule='Mon 9:00')
+        bare_class = Class(name='7B')
+        db.session.add_all([teacher, user, course, student, orphan, class_, bare_class])
+        db.session.flush()
+        db.session.add_all([
+            Attendance(student_id=student.id, class_id=class_.id, date=date(2024, 9, 2), status='present'),
+            Grade(student=student, course=course, grade=91.5, term='Fall 2023'),
+            Grade(student=student, grade=70, term='Fall 2023'),
+        ])
+        db.session.commit()
+    yield
+    with app.app_context():
+        db.session.remove()
+
+
+@pytest.mark.parametrize('serializer', SERIALIZERS, ids=lambda s: s.model.__name__)
+def test_dump_matches_hand_written_dict(app, rows, serializer):
+    with app.app_context():
+        objs = serializer.model.query.all()
+        assert objs
+        expected = [HAND_WRITTEN[serializer.model](obj) for obj in objs]
+        assert serializer.dump_many(objs) == expected
+        assert [list(d) for d in serializer.dump_many(objs)] == [list(d) for d in expected]
+
+
+@pytest.mark.parametrize('serializer', [s for s in SERIALIZERS if s.columns], ids=lambda s: s.model.__name__)
+def test_dump_rows_matches_dump(app, rows, serializer):
+    with app.app_context():
+        objs = serializer.model.query.order_by(serializer.model.id).all()
+        tuples = db.session.query(*serializer.columns).order_by(serializer.model.id).all()
+        assert serializer.dump_rows(tuples) == serializer.dump_many(objs)
+
+
+@pytest.mark.parametrize('serializer', SERIALIZERS, ids=lambda s: s.model.__name__)
+def test_registry_returns_model_serializer(serializer):
+    assert get_serializer(serializer.model) is serializer
+
+
+def test_pre_encoded_response_matches_jsonify(app):
+    payload = {'items': [{'id': 1, 'name': 'Équations', 'date': date(2024, 9, 2), 'score': 91.5}],
+               'next_cursor': None}
+    with app.test_request_context():
+        encoded, status = success_response(dumps_bytes(payload), 201)
+        jsonified, _ = success_response(payload)
+    assert status == 201
+    assert encoded.mimetype == 'application/json'
+    assert encoded.content_length == len(encoded.get_data())
+    assert encoded.get_json() == jsonified.get_json()
@@ -0,0 +1,38 @@
+import pytest
+
+import app as app_module
+from tasks import celery
+from task_events import init_task_events
+
+
+@pytest.fixture
+def task_id(app, monkeypatch):
+    """A running task on a worker that holds at most two streams."""
+    monkeypatch.setattr(app_module, 'celery', celery)
+    monkeypatch.setitem(app.config, 'TASK_EVENTS_MAX_STREAMS', 2)
+    for name in ('task_events', 'task_event_streams'):
+        monkeypatch.setitem(app.extensions, name, app.extensions[name])
+    # Streams only read the result backend when no event was published yet.
+    init_task_events(app).publish('task-1', {'task_id': 'task-1', 'status': 'STARTED', 'current': None})
+    return 'task-1'
+
+
+def test_streams_beyond_worker_cap_get_503(app, client, school, task_id):
+    def open_stream():
+        return client.get(f'/api/tasks/task-events/{task_id}', headers=school[0], buffered=False)
+
+    # Each stream keeps its request context pushed until it closes, so this
+    # single-threaded client has to close them in reverse order.
+    streams = [open_stream(), open_stream()]
+    assert [stream.status_code for stream in streams] == [200, 200]
+
+    rejected = open_stream()
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == str(app.config['TASK_EVENTS_HEARTBEAT'])
+
+    streams.pop().close()
+    reopened = open_stream()
+    assert reopened.status_code == 200
+    app.extensions['task_events'].publish(task_id, {'task_id': task_id, 'status': 'SUCCESS', 'current': None})
+    assert b'event: end' in reopened.get_data()
+    streams[0].close()
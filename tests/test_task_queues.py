@@ -0,0 +1,83 @@
+"""Queue routing and per-tenant fair share, run through a real in-process worker."""
+import threading
+import time
+
+import pytest
+from celery.contrib.testing.worker import start_worker
+
+from fairshare import InMemoryFairShare
+from tasks import celery, failure_retries, tenant_job_slot
+
+runs = []  # (tenant_id, retries, max retries left for failures, started, finished)
+runs_lock = threading.Lock()
+
+
+@celery.task(bind=True, name='tests.heavy_job', max_retries=3)
+def heavy_job(self, tenant_id, seconds):
+    with tenant_job_slot(self, tenant_id):
+        started = time.monotonic()
+        time.sleep(seconds)
+        with runs_lock:
+            runs.append((tenant_id, self.request.retries, failure_retries(self), started, time.monotonic()))
+
+
+@pytest.mark.parametrize('task_name, queue', [
+    ('tasks.send_email_notification', 'email'),
+    ('tasks.generate_report', 'bulk'),
+    ('tasks.send_email_batch', 'bulk'),
+    ('tasks.process_bulk_data_import', 'bulk'),
+    ('tasks.cleanup_expired_data', 'bulk'),
+    ('tests.heavy_job', 'default'),
+])
+def test_tasks_are_routed_to_their_queue(task_name, queue):
+    assert celery.amqp.router.route({}, task_name)['queue'].name == queue
+
+
+@pytest.fixture
+def worker(app, monkeypatch):
+    """A four-thread worker consuming `bulk` over the in-memory broker."""
+    previous = {key: celery.conf[key] for key in ('broker_url', 'result_backend')}
+    celery.conf.update(broker_url='memory://', result_backend='cache+memory://')
+    celery.close()
+    monkeypatch.setitem(app.extensions, 'fair_share', InMemoryFairShare(2, 60))
+    monkeypatch.setitem(app.config, 'FAIR_SHARE_DEFER_DELAY', 0.05)
+    runs.clear()
+    try:
+        with start_worker(celery, pool='threads', concurrency=4, queues=['bulk'],
+                          perform_ping_check=False, loglevel='WARNING'):
+            yield
+    finally:
+        celery.conf.update(previous)
+        celery.close()
+
+
+def wait_for_runs(count, timeout=20):
+    deadline = time.monotonic() + timeout
+    while len(runs) < count:
+        assert time.monotonic() < deadline, runs
+        time.sleep(0.02)
+
+
+def test_tenant_over_its_cap_does_not_block_other_tenants(worker):
+    for _ in range(4):
+        heavy_job.apply_async((1, 0.4), queue='bulk')
+    time.sleep(0.05)  # tenant 1's jobs fill the queue first
+    for _ in range(2):
+        heavy_job.apply_async((2, 0.4), queue='bulk')
+    wait_for_runs(6)
+
+    # No more than FAIR_SHARE_MAX_JOBS of one tenant ever ran at once
+    for tenant in (1, 2):
+        spans = [(start, end) for t, _, _, start, end in runs if t == tenant]
+        for start, _ in spans:
+            assert sum(1 for s, e in spans if s <= start < e) <= 2
+
+    # Tenant 2 did not wait for tenant 1's backlog: both its jobs started
+    # before tenant 1's third job, which had to be deferred.
+    tenant1_starts = sorted(start for t, _, _, start, _ in runs if t == 1)
+    tenant2_starts = sorted(start for t, _, _, start, _ in runs if t == 2)
+    assert tenant2_starts[-1] < tenant1_starts[2]
+
+    # Deferrals went through retry() but left every failure retry intact
+    deferred = [(retries, allowed) for _, retries, allowed, _, _ in runs if retries]
+    assert deferred and all(allowed == heavy_job.max_retries + retries for retries, allowed in deferred)
@@ -0,0 +1,105 @@
+"""Batch task-status lookups against a key/value result backend."""
+import pytest
+from celery.backends.base import KeyValueStoreBackend
+
+import app as app_module
+from routes.tasks import MAX_BATCH_TASK_IDS
+from tasks import celery
+
+
+class DictBackend(KeyValueStoreBackend):
+    """Key/value result backend over a dict, counting round trips.
+
+    `mget_returns` picks what MGET answers: a list in key order (redis-py),
+    a mapping of the keys found (memcached-style clients), or None when the
+    backend has no MGET.
+    """
+
+    def __init__(self, mget_returns='list', **kwargs):
+        super().__init__(app=celery, **kwargs)
+        self.data = {}
+        self.mget_returns = mget_returns
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(('get', key))
+        return self.data.get(key)
+
+    def mget(self, keys):
+        if self.mget_returns is None:
+            raise NotImplementedError
+        self.calls.append(('mget', list(keys)))
+        if self.mget_returns == 'mapping':
+            return {key: self.data[key] for key in keys if key in self.data}
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture(params=['list', 'mapping'])
+def backend(request, monkeypatch):
+    backend = DictBackend(request.param)
+    monkeypatch.setattr(celery._local, 'backend', backend, raising=False)
+    monkeypatch.setattr(app_module, 'celery', celery)
+    backend.store_result('done', {'rows': 3}, 'SUCCESS')
+    backend.store_result('broken', ValueError('bad row'), 'FAILURE')
+    backend.store_result('running', {'current': 2, 'total': 4}, 'PROGRESS')
+    backend.calls.clear()
+    return backend
+
+
+@pytest.fixture
+def statuses(client, school):
+    def post(task_ids, **options):
+        return client.post('/api/tasks/task-status', json={'task_ids': task_ids, **options}, headers=school[0])
+    return post
+
+
+def tasks(response):
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['data']['tasks']
+
+
+def test_states_come_from_one_mget(backend, statuses):
+    assert tasks(statuses(['done', 'broken', 'running', 'unknown'])) == [
+        {'task_id': 'done', 'status': 'SUCCESS'},
+        {'task_id': 'broken', 'status': 'FAILURE'},
+        {'task_id': 'running', 'status': 'PROGRESS', 'current': {'current': 2, 'total': 4}},
+        {'task_id': 'unknown', 'status': 'PENDING'},
+    ]
+    assert [call for call, _ in backend.calls] == ['mget']
+
+
+def test_include_result_adds_finished_results(backend, statuses):
+    records = tasks(statuses(['done', 'broken', 'unknown'], include_result=True))
+    assert records[0] == {'task_id': 'done', 'status': 'SUCCESS', 'result': {'rows': 3}}
+    assert records[1]['status'] == 'FAILURE' and 'bad row' in records[1]['result']
+    assert records[2] == {'task_id': 'unknown', 'status': 'PENDING'}
+
+
+def test_duplicate_ids_are_looked_up_once(backend, statuses):
+    assert [r['task_id'] for r in tasks(statuses(['done', 'unknown', 'done']))] == ['done', 'unknown']
+    assert len(backend.calls[0][1]) == 2
+
+
+def test_at_most_max_batch_distinct_ids(backend, statuses):
+    ids = [f'task-{i}' for i in range(MAX_BATCH_TASK_IDS)]
+    assert len(tasks(statuses(ids + ids[:10]))) == MAX_BATCH_TASK_IDS
+    response = statuses(ids + ['one-too-many'])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f'At most {MAX_BATCH_TASK_IDS} task_ids per request'
+
+
+@pytest.mark.parametrize('task_ids', [None, 'done', [''], ['done', 7]])
+def test_task_ids_must_be_a_list_of_ids(backend, statuses, task_ids):
+    assert statuses(task_ids).status_code == 400
+
+
+def test_backend_without_mget_reads_each_task(backend, statuses):
+    backend.mget_returns = None
+    assert [r['status'] for r in tasks(statuses(['done', 'unknown']))] == ['SUCCESS', 'PENDING']
+    assert [call for call, _ in backend.calls] == ['get', 'get']
@@ -0,0 +1,94 @@
+def emails(response):
+    assert response.status_code == 200, response.get_json()
+    return {user['email'] for user in response.get_json()['data']['users']}
+
+
+def test_request_without_header_is_scoped_to_token_tenant(client, make_user, auth_headers):
+    admin = make_user('admin1@one.test', tenant_id=1)
+    make_user('teacher1@one.test', user_type=2, tenant_id=1)
+    make_user('admin2@two.test', tenant_id=2)
+
+    assert emails(client.get('/api/auth/users', headers=auth_headers(admin))) == {
+        'admin1@one.test', 'teacher1@one.test',
+    }
+    assert emails(client.get('/api/auth/users', headers=auth_headers(admin, tenant_header=1))) == {
+        'admin1@one.test', 'teacher1@one.test',
+    }
+
+
+def test_token_rejected_for_other_tenant(client, make_user, auth_headers):
+    admin = make_user('admin1@one.test', tenant_id=1)
+    make_user('admin2@two.test', tenant_id=2)
+
+    response = client.get('/api/auth/users', headers=auth_headers(admin, tenant_header=2))
+    assert response.status_code in (400, 401, 422)
+
+
+def test_tenantless_token_requires_super_admin(client, make_user, auth_headers):
+    make_user('admin1@one.test', tenant_id=1)
+    student = make_user('student@nowhere.test', user_type=3)
+
+    response = client.get('/api/students/students', headers=auth_headers(student))
+    assert response.status_code in (400, 401, 422)
+
+
+def test_super_admin_sees_all_tenants_only_without_header(client, make_user, auth_headers):
+    make_user('admin1@one.test', tenant_id=1)
+    make_user('admin2@two.test', tenant_id=2)
+    root = make_user('root@platform.test')
+
+    assert emails(client.get('/api/auth/users', headers=auth_headers(root))) == {
+        'admin1@one.test', 'admin2@two.test', 'root@platform.test',
+    }
+    assert emails(client.get('/api/auth/users', headers=auth_headers(root, tenant_header=2))) == {'admin2@two.test'}
+
+
+def test_archived_years_scoped_without_header(app, client, make_user, auth_headers, monkeypatch):
+    import services
+
+    calls = []
+    monkeypatch.setattr(services, 'archived_years', lambda tenant_id, all_tenants: calls.append(
+        (tenant_id, all_tenants)) or [])
+    admin = make_user('admin1@one.test', tenant_id=1)
+
+    client.get('/api/attendance/attendance/archive', headers=auth_headers(admin))
+    assert calls == [(1, False)]
+
+
+def test_values_unique_across_tenants_are_checked_across_tenants(app, client, make_user, auth_headers):
+    from models import db, Course, Student
+
+    admin = make_user('admin1@one.test', tenant_id=1)
+    other = make_user('taken@two.test', user_type=3, tenant_id=2)
+    with app.app_context():
+        db.session.add_all([Student(student_id='S-2', user_id=other, tenant_id=2),
+                            Course(name='Algebra', code='ALG', tenant_id=2)])
+        db.session.commit()
+    headers = auth_headers(admin)
+
+    cases = [
+        ('/api/students/students', {'user': {'email': 'taken@two.test'}}, 'Email already exists'),
+        ('/api/students/students', {'user': {'email': 'new@one.test'}, 'student_id': 'S-2'},
+         'Student ID already exists'),
+        ('/api/courses/courses', {'name': 'Algebra', 'code': 'ALG'}, 'Course code already exists'),
+        ('/api/auth/register', {'email': 'taken@two.test', 'password': 'secret'}, 'Email already exists'),
+    ]
+    for url, payload, error in cases:
+        response = client.post(url, json=payload, headers={**headers, 'X-Tenant-ID': '1'})
+        assert (response.status_code, response.get_json()['error']) == (400, error), url
+
+
+def test_import_reports_rows_taken_in_other_tenants(app, make_user):
+    from services import StudentService
+    from tenancy import set_current_tenant
+
+    make_user('admin1@one.test', tenant_id=1)
+    make_user('taken@two.test', user_type=3, tenant_id=2)
+    with app.app_context():
+        set_current_tenant(1)
+        created, errors = StudentService.import_students([
+            (2, {'email': 'taken@two.test'}),
+            (3, {'email': 'new@one.test', 'student_id': 'S-1'}),
+        ])
+    assert created == 1
+    assert errors == [{'row': 2, 'error': 'Email already exists'}]
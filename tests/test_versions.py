@@ -0,0 +1,48 @@
+"""Collection version counters behind the catalog ETags."""
+import pytest
+
+
+@pytest.fixture
+def catalog(app, client, make_user, auth_headers):
+    """A tenant admin's headers, a super admin's headers and a course of tenant 1."""
+    admin = auth_headers(make_user('admin1@one.test', tenant_id=1))
+    root = auth_headers(make_user('root@platform.test'))
+    created = client.post('/api/courses/courses', json={'name': 'Algebra', 'code': 'ALG'}, headers=admin)
+    return admin, root, created.get_json()['data']['course']['id']
+
+
+def revalidate(client, headers, etag):
+    return client.get('/api/courses/courses', headers={**headers, 'If-None-Match': etag})
+
+
+@pytest.mark.parametrize('write', ['update', 'delete'])
+def test_super_admin_write_bumps_owning_tenant(client, catalog, write):
+    admin, root, course_id = catalog
+    etag = client.get('/api/courses/courses', headers=admin).headers['ETag']
+    assert revalidate(client, admin, etag).status_code == 304
+
+    # No X-Tenant-ID: the request has no tenant, the course belongs to tenant 1
+    if write == 'update':
+        response = client.put('/api/courses/course', json={'id': course_id, 'name': 'Algebra II'}, headers=root)
+    else:
+        response = client.delete(f'/api/courses/course/{course_id}', headers=root)
+    assert response.status_code == 200
+
+    response = revalidate(client, admin, etag)
+    assert response.status_code == 200
+    expected = ['Algebra II'] if write == 'update' else []
+    assert [c['name'] for c in response.get_json()['data']['courses']] == expected
+
+
+def test_every_write_bumps_cross_tenant_listing(client, catalog):
+    admin, root, course_id = catalog
+    etag = client.get('/api/courses/courses', headers=root).headers['ETag']
+
+    client.put('/api/courses/course', json={'id': course_id, 'name': 'Algebra II'}, headers=admin)
+    response = revalidate(client, root, etag)
+    assert response.status_code == 200
+    assert [c['name'] for c in response.get_json()['data']['courses']] == ['Algebra II']
+
+    client.put('/api/courses/course', json={'id': course_id, 'name': 'Algebra III'},
+               headers=root)
+    assert revalidate(client, root, response.headers['ETag']).status_code == 200
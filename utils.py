@@ -1,10 +1,29 @@
-from flask import jsonify, request
+import base64
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from flask import Response, current_app, jsonify, make_response, request, stream_with_context
 from functools import wraps
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from models import User, Tenant
+from models import User
+from replicas import primary_reads
+from tenancy import current_tenant, init_tenancy
+from versions import collection_etag, collection_settling
 
 def success_response(data, status_code=200):
-    """Standardized success response"""
+    """Standardized success response.
+
+    `data` may also be bytes that are already JSON-encoded (e.g. a list page
+    from `serializers.dumps_bytes`); they are spliced into the envelope
+    without re-encoding.
+    """
+    if isinstance(data, (bytes, bytearray)):
+        body = (b'{"success":true,"data":', data, b'}\n')  # sent in turn, never copied into one buffer
+        response = current_app.response_class(body, mimetype='application/json')
+        response.content_length = sum(map(len, body))
+        return response, status_code
     return jsonify({
         'success': True,
         'data': data
@@ -17,14 +36,141 @@ def error_response(message, status_code=400):
         'error': message
     }), status_code
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(last_id):
+    """Encode the last id of a page into an opaque keyset cursor"""
+    payload = json.dumps({'id': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a keyset cursor back into the last id it points past"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))['id']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(last_id, int):
+        raise ValueError('Invalid cursor')
+    return last_id
+
+def get_page_args():
+    """Read the `limit`/`after` keyset pagination contract from the query string.
+
+    Raises ValueError when either argument is malformed.
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (ValueError, TypeError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    after = request.args.get('after')
+    return limit, decode_cursor(after) if after else None
+
+def get_int_arg(name):
+    """Parse an optional integer query string argument"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+
+def get_date_arg(name):
+    """Parse an optional YYYY-MM-DD query string argument"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_FLUSH_ROWS = 500
+
+
+def stream_export(rows, fields, filename, fmt='csv'):
+    """Stream an iterable of row tuples as a CSV or NDJSON download.
+
+    Rows are encoded in small batches as they arrive from the database, so
+    the first bytes go out as soon as the first batch is read.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % EXPORT_FLUSH_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_ndjson():
+        chunk = []
+        for row in rows:
+            chunk.append(json.dumps(dict(zip(fields, row)), default=str))
+            if len(chunk) == EXPORT_FLUSH_ROWS:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+
+    generate = generate_csv if fmt == 'csv' else generate_ndjson
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}.{fmt}'},
+    )
+
+# user id -> (expires_at, user_type, is_active); user_type is None for unknown ids
+_role_cache = {}
+ROLE_CACHE_MAX_ENTRIES = 50000
+
+
+def get_user_role(user_id):
+    """Return (user_type, is_active) for a user, cached per process for ROLE_CACHE_TTL seconds"""
+    key = str(user_id)
+    now = time.monotonic()
+    entry = _role_cache.get(key)
+    if entry and entry[0] > now:
+        return entry[1], entry[2]
+
+    # The token was already checked against the request's tenant; a super
+    # admin addressing a tenant must still find their own (tenant-less) row.
+    user = User.query.execution_options(all_tenants=True).get(user_id)
+    role = (user.user_type, user.is_active) if user else (None, False)
+    if len(_role_cache) >= ROLE_CACHE_MAX_ENTRIES:
+        _role_cache.clear()
+    _role_cache[key] = (now + current_app.config.get('ROLE_CACHE_TTL', 60), *role)
+    return role
+
+def invalidate_user_role(user_id):
+    """Drop a cached role so the next request re-reads it from the database"""
+    _role_cache.pop(str(user_id), None)
+
 def admin_required(fn):
     """Decorator to restrict access to admins"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        if not user or user.user_type != 1:
+        user_type, is_active = get_user_role(get_jwt_identity())
+        if user_type != 1 or not is_active:
             return error_response('Admin access required', 403)
         return fn(*args, **kwargs)
     return wrapper
@@ -34,25 +180,43 @@ def teacher_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        if not user or user.user_type not in [1, 2]:
+        user_type, is_active = get_user_role(get_jwt_identity())
+        if user_type not in [1, 2] or not is_active:
             return error_response('Teacher access required', 403)
         return fn(*args, **kwargs)
     return wrapper
 
+def conditional_get(collection):
+    """Answer If-None-Match with 304 when `collection` has not changed.
+
+    The ETag is computed from the collection's version counter before the
+    view runs, so a 304 never reaches the database; a write racing with the
+    view only makes the ETag stale, which costs the client one extra 200.
+    While the last write may still be replicating, the view reads from the
+    primary so a lagging replica's body is never served under the new ETag.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            etag = collection_etag(collection)
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                with primary_reads(collection_settling(collection)):
+                    response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
 def get_current_tenant():
-    """Get the current tenant from the request"""
-    tenant_id = request.headers.get('X-Tenant-ID')
-    if not tenant_id:
-        return None
-    try:
-        return Tenant.query.get(int(tenant_id))
-    except (ValueError, TypeError):
-        return None
+    """Get the tenant the current request is scoped to (resolved once per request)"""
+    return current_tenant()
 
 def init_tenants(app):
-    """Initialize multi-tenancy (basic implementation)"""
-    # This is a basic initialization for multi-tenancy support
-    # For production, consider using a dedicated library
+    """Initialize multi-tenancy; see tenancy.py"""
+    init_tenancy(app)
     return True
@@ -0,0 +1,137 @@
+"""Per-tenant collection version counters for conditional GETs.
+
+Every write to a collection bumps its counter; read endpoints derive their
+ETag from the counter, so an unchanged collection can be answered with
+304 Not Modified without querying its tables. Production uses the Redis
+store so all workers agree on the version; the in-memory store is the
+fallback for local development when REDIS_URL is not set.
+
+Counters are kept per tenant, plus `default` ones for requests without a
+tenant. A write bumps the tenants that own the rows it wrote (see
+`bump_collection_version`), even when a super admin makes it without
+X-Tenant-ID.
+
+With read replicas, a bump also marks the collection as settling for
+REPLICA_PIN_SECONDS: a replica may not have the write yet, so anything
+cached under the new version is read from the primary until then.
+"""
+import hashlib
+import itertools
+import time
+import uuid
+from flask import current_app, request
+from tenancy import current_tenant_id, written_tenant_ids
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class InMemoryVersionStore:
+    """Per-process counters; only correct with a single worker.
+
+    Counters restart at zero with the process, so they are prefixed with a
+    random epoch to keep ETags from an earlier process from matching.
+    """
+
+    def __init__(self):
+        self._epoch = uuid.uuid4().hex[:8]
+        self._versions = {}
+        self._settling = {}  # key -> monotonic time the last bump has replicated by
+        self._counter = itertools.count(1)
+
+    def get(self, key):
+        return f'{self._epoch}.{self._versions.get(key, 0)}'
+
+    def bump(self, key, settle=0):
+        self._versions[key] = next(self._counter)
+        if settle:
+            self._settling[key] = time.monotonic() + settle
+
+    def settling(self, key):
+        return self._settling.get(key, 0) > time.monotonic()
+
+
+class RedisVersionStore:
+    KEY_PREFIX = 'collection-version:'
+    SETTLING_PREFIX = 'collection-settling:'
+
+    def __init__(self, client):
+        self._client = client
+
+    def get(self, key):
+        version = self._client.get(self.KEY_PREFIX + key)
+        return version.decode() if version else '0'
+
+    def bump(self, key, settle=0):
+        pipe = self._client.pipeline(transaction=False)
+        pipe.incr(self.KEY_PREFIX + key)
+        if settle:
+            pipe.set(self.SETTLING_PREFIX + key, 1, px=int(settle * 1000))
+        pipe.execute()
+
+    def settling(self, key):
+        return bool(self._client.exists(self.SETTLING_PREFIX + key))
+
+
+def init_version_store(app):
+    """Attach the configured version store to `app.extensions`."""
+    url = app.config.get('REDIS_URL')
+    if url and redis is not None:
+        store = RedisVersionStore(redis.Redis.from_url(url))
+    else:
+        store = InMemoryVersionStore()
+    app.extensions['version_store'] = store
+    return store
+
+
+def _tenant_key():
+    tenant_id = current_tenant_id()
+    return str(tenant_id) if tenant_id is not None else 'default'
+
+
+def _replication_lag():
+    """Seconds a write may take to reach the read replicas (0 without replicas)."""
+    if not current_app.extensions.get('replica_keys'):
+        return 0
+    return current_app.config.get('REPLICA_PIN_SECONDS', 5)
+
+
+def collection_version(collection):
+    return current_app.extensions['version_store'].get(f'{_tenant_key()}:{collection}')
+
+
+def collection_settling(collection):
+    """Whether the last write to `collection` may not have reached the replicas yet."""
+    if not _replication_lag():
+        return False
+    return current_app.extensions['version_store'].settling(f'{_tenant_key()}:{collection}')
+
+
+def _written_tenant_keys():
+    """Tenants whose versions a write in the current context must bump.
+
+    The unscoped `default` versions cover cross-tenant reads, which include
+    every tenant's rows, so they are always bumped. A request scoped to a
+    tenant only writes that tenant's rows; without one (a super admin's
+    cross-tenant request) the tenants owning the written rows are bumped.
+    """
+    tenant_id = current_tenant_id()
+    tenant_ids = [tenant_id] if tenant_id is not None else sorted(written_tenant_ids())
+    return ['default', *(str(t) for t in tenant_ids)]
+
+
+def bump_collection_version(*collections):
+    """Invalidate ETags for `collections` in the written tenants; call after commit."""
+    store = current_app.extensions['version_store']
+    settle = _replication_lag()
+    for tenant in _written_tenant_keys():
+        for collection in collections:
+            store.bump(f'{tenant}:{collection}', settle)
+
+
+def collection_etag(collection):
+    """Strong ETag for the current request's representation of `collection`."""
+    seed = f'{collection_version(collection)}:{request.full_path}'
+    return hashlib.sha1(seed.encode()).hexdigest()[:20]